@@ -0,0 +1,168 @@
+"""Compare frame tables with per sprite timers for sprite animations.
+
+Run from the repository root:
+
+    python benchmarks/animation.py [--ticks N] [--repeat N]
+
+For growing numbers of explosions burning at once, the time per sprite
+and tick is measured for SpriteAnimationSystem, which looks the frame up
+by the ticks since an animation started, and for the timer every sprite
+used to carry. Walking sprites are compared the same way: AnimationSystem
+only swaps a texture when a sprite turns, the old code assigned it on
+every tick.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from boomber.animation import EXPLOSION  # noqa: E402
+from boomber.clock import Clock  # noqa: E402
+from boomber.components import (  # noqa: E402
+    AnimationData,
+    DestroyData,
+    SpriteAnimationData,
+    Velocity,
+)
+from boomber.sprites import MutableTextureSprite  # noqa: E402
+from boomber.systems import AnimationSystem, SpriteAnimationSystem  # noqa
+
+
+class Game:
+    def __init__(self):
+        self.clock = Clock()
+
+    @property
+    def time(self):
+        return self.clock.time
+
+
+class Cache:
+    """TextureCache stand-in counting nothing, so sprites can hold fake
+    textures."""
+
+    def acquire(self, texture):
+        pass
+
+    def release(self, texture):
+        pass
+
+
+class TimerData:
+    """Component of an explosion before frame tables."""
+
+    __slots__ = ("current_frame", "previous_tick", "delta")
+
+    def __init__(self):
+        self.current_frame = 0
+        self.previous_tick = None
+        self.delta = 25
+
+
+def timers(game, componentsets):
+    ticks = game.time * 1000
+    for sprite, animdata, destroydata in componentsets:
+        if animdata.previous_tick is None:
+            animdata.previous_tick = ticks
+            sprite.frame = animdata.current_frame
+        elif animdata.current_frame == 11:
+            destroydata.is_alive = False
+            animdata.current_frame = 0
+        else:
+            if (ticks - animdata.previous_tick) > animdata.delta:
+                animdata.current_frame += 1
+                animdata.previous_tick = ticks
+            sprite.frame = animdata.current_frame
+
+
+def every_tick(componentsets):
+    for velocity, sprite, animdata in componentsets:
+        if velocity.vx > 0:
+            sprite.texture = animdata.right
+        if velocity.vx < 0:
+            sprite.texture = animdata.left
+        if velocity.vy > 0:
+            sprite.texture = animdata.down
+        if velocity.vy < 0:
+            sprite.texture = animdata.up
+
+
+def explosions(count, animdata):
+    return [(MutableTextureSprite(None), animdata(), DestroyData())
+            for _ in range(count)]
+
+
+def walkers(count, rng):
+    cache = Cache()
+    textures = AnimationData(object(), object(), object(), object())
+    result = []
+    for _ in range(count):
+        velocity = Velocity()
+        velocity.vx, velocity.vy = rng.choice(((3, 0), (0, 3),
+                                               (-3, 0), (0, -3)))
+        result.append((velocity, MutableTextureSprite(None, cache),
+                       textures))
+    return result
+
+
+def measure(ticks, repeat, step):
+    """Return the best seconds of calling step for ticks ticks."""
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(ticks):
+            step()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    game = Game()
+    system = SpriteAnimationSystem()
+    system.game = game
+    walking = AnimationSystem()
+
+    def ticking(process):
+        def step():
+            game.clock.step()
+            process()
+        return step
+
+    print("%8s %10s %14s %14s %8s" % ("sprites", "kind", "before ns",
+                                      "after ns", "speedup"))
+    for count in (100, 500, 2000, 10000):
+        old = explosions(count, TimerData)
+        new = explosions(count, lambda: SpriteAnimationData(EXPLOSION))
+        slow = measure(args.ticks, args.repeat,
+                       ticking(lambda: timers(game, old)))
+        fast = measure(args.ticks, args.repeat,
+                       ticking(lambda: system.process(None, new)))
+        scale = 1e9 / (count * args.ticks)
+        print("%8d %10s %14.0f %14.0f %7.1fx" % (
+            count, "explosion", slow * scale, fast * scale, slow / fast))
+
+        sprites = walkers(count, rng)
+        slow = measure(args.ticks, args.repeat,
+                       lambda: every_tick(sprites))
+        fast = measure(args.ticks, args.repeat,
+                       lambda: walking.process(None, sprites))
+        print("%8d %10s %14.0f %14.0f %7.1fx" % (
+            count, "walking", slow * scale, fast * scale, slow / fast))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Compare the grid based collision lookup with the linear `_overlap` scan.
+
+Run from the repository root:
+
+    python benchmarks/collision.py [--repeat N] [--ticks N]
+
+A second table times CollisionSystem per tick on generated levels with
+more and more enemies, with the players and enemies in the grid (list)
+and in the NumPy ComponentStore (store), when NumPy is installed.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from boomber import headless  # noqa: E402
+from boomber import levels  # noqa: E402
+from boomber.spatial import SpatialGrid  # noqa: E402
+from boomber.sprites import MutableTextureSprite, tile_size  # noqa: E402
+from boomber.store import numpy  # noqa: E402
+from boomber.systems import CollisionSystem  # noqa: E402
+
+
+class Subject:
+    def __init__(self, sprite):
+        self.sprite = sprite
+
+
+def scatter(count, columns, rng):
+    sprites = []
+    for _ in range(count):
+        sprite = MutableTextureSprite(None)
+        sprite.position = (rng.randrange(columns * tile_size),
+                           rng.randrange(columns * tile_size))
+        sprites.append(sprite)
+    return sprites
+
+
+def linear(system, collidables, explosions, enemies):
+    for sprite in collidables:
+        system._overlap(sprite, explosions)
+        system._overlap(sprite, enemies)
+
+
+def grid_lookup(grid, collidables):
+    for sprite in collidables:
+        left, top, right, bottom = area = sprite.area
+        for subject in grid.query(area):
+            if subject is sprite:
+                continue
+            pleft, ptop, pright, pbottom = subject.area
+            (pleft < right and pright > left and
+             ptop < bottom and pbottom > top)
+
+
+def measure(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def collision_tick(enemies, store, ticks):
+    """Return the seconds CollisionSystem took per tick over ticks of a
+    61×41 level with enemies, the player walking and planting bombs."""
+
+    game = headless.create_game(levels.generate(61, 41, enemies),
+                                store=store, seed=0, quiet=True)
+    game.player.destroydata.is_destroyable = False
+    system = game.systems["collision_system"]
+    process = system.process
+    spent = 0.0
+
+    def timed(world, componentsets):
+        nonlocal spent
+        start = time.perf_counter()
+        process(world, componentsets)
+        spent += time.perf_counter() - start
+    system.process = timed
+    game.simulate(ticks, headless.patrol_script(ticks))
+    return spent / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ticks", type=int, default=200,
+                        help="ticks of every CollisionSystem run")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    system = CollisionSystem()
+    print("%8s %12s %12s %8s" % ("entities", "linear ms", "grid ms",
+                                 "speedup"))
+    for count in (25, 50, 100, 200, 400, 800, 1600):
+        # The map grows with the population, keeping the density constant.
+        columns = max(4, int((count * 2) ** 0.5))
+        collidables = scatter(count, columns, rng)
+        explosions = [Subject(s) for s in scatter(count, columns, rng)]
+        enemies = [Subject(s) for s in scatter(count // 4, columns, rng)]
+
+        grid = SpatialGrid(tile_size)
+        for subject in explosions + enemies:
+            grid.insert(subject.sprite, subject)
+
+        slow = measure(lambda: linear(system, collidables,
+                                      explosions, enemies), args.repeat)
+        fast = measure(lambda: grid_lookup(grid, collidables), args.repeat)
+        print("%8d %12.3f %12.3f %7.1fx" % (count, slow * 1000,
+                                            fast * 1000, slow / fast))
+
+    if numpy is None:
+        return 0
+    print()
+    print("%8s %12s %12s %8s" % ("enemies", "list ms", "store ms",
+                                 "speedup"))
+    for enemies in (50, 200, 800):
+        listed = min(collision_tick(enemies, False, args.ticks)
+                     for _ in range(args.repeat))
+        stored = min(collision_tick(enemies, True, args.ticks)
+                     for _ in range(args.repeat))
+        print("%8d %12.3f %12.3f %7.1fx" % (enemies, listed * 1000,
+                                            stored * 1000, listed / stored))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
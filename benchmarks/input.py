@@ -0,0 +1,129 @@
+"""Measure the time from a key press to the frame that shows it.
+
+Run from the repository root:
+
+    python benchmarks/input.py [--seconds 10] [--rate 20]
+                               [--frame-rate N]
+
+The real game loop of `Game.start` plays a generated level without
+enemies under the dummy video driver, drawing into an offscreen
+software renderer. A thread pushes arrow key presses into the SDL event
+queue at random, about --rate per second, and holds every key for a
+random time before releasing it. The presses pushed are compared with
+the ones the game applied and the latency from the timestamp of every
+press to the present of the first frame showing its effect is reported
+as percentiles.
+"""
+
+import argparse
+import ctypes
+import os
+import random
+import sys
+import threading
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sdl2  # noqa: E402
+import sdl2.ext  # noqa: E402
+
+from boomber import Game  # noqa: E402
+from boomber import headless  # noqa: E402
+from boomber import levels  # noqa: E402
+from boomber import systems  # noqa: E402
+from boomber.controls import MOVES  # noqa: E402
+from boomber.profiling import Profiler  # noqa: E402
+
+
+def push(kind, key=None):
+    """Put an event of type kind for key into the SDL event queue, SDL
+    stamps it with the current time."""
+
+    event = sdl2.SDL_Event()
+    event.type = kind
+    if key is not None:
+        event.key.state = (sdl2.SDL_PRESSED if kind == sdl2.SDL_KEYDOWN
+                           else sdl2.SDL_RELEASED)
+        event.key.keysym.sym = key
+    if sdl2.SDL_PushEvent(ctypes.byref(event)) < 0:
+        raise RuntimeError(sdl2.SDL_GetError().decode())
+
+
+class Typist(threading.Thread):
+    """Press and release random arrow keys once game runs, then quit
+    it."""
+
+    def __init__(self, game, seconds, rate, seed=0):
+        super().__init__(daemon=True)
+        self.game = game
+        self.seconds = seconds
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.pressed = 0
+
+    def run(self):
+        while not getattr(self.game, "running", False):
+            time.sleep(0.01)
+        end = time.perf_counter() + self.seconds
+        held = None
+        while time.perf_counter() < end:
+            time.sleep(self.rng.expovariate(self.rate))
+            if held is not None:
+                push(sdl2.SDL_KEYUP, held)
+                held = None
+            key = self.rng.choice(MOVES)
+            push(sdl2.SDL_KEYDOWN, key)
+            self.pressed += 1
+            # Some keys are only tapped, others held long enough to
+            # walk on.
+            if self.rng.random() < 0.7:
+                time.sleep(self.rng.uniform(0.0, 0.05))
+                push(sdl2.SDL_KEYUP, key)
+            else:
+                held = key
+        if held is not None:
+            push(sdl2.SDL_KEYUP, held)
+        # Let the last press show before the game ends.
+        time.sleep(0.1)
+        push(sdl2.SDL_QUIT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--rate", type=float, default=20.0,
+                        help="key presses per second")
+    parser.add_argument("--frame-rate", type=int, default=None,
+                        help="frames per second, one per tick by default")
+    args = parser.parse_args()
+
+    sdl2.ext.init()
+    window = sdl2.ext.Window("input benchmark", size=(1335, 900))
+    profiler = Profiler(capacity=1 << 16)
+    game = Game(window=window,
+                systems=systems.create_systems(headless.offscreen_renderer()),
+                frame_rate=args.frame_rate, profiler=profiler, seed=0,
+                quiet=True)
+    game.level = levels.generate(19, 11, 0)
+
+    typist = Typist(game, args.seconds, args.rate)
+    typist.start()
+    game.start()
+    typist.join()
+
+    latency = profiler.summary().get("latency")
+    shown = latency["count"] if latency else 0
+    print("%d presses pushed, %d shown, %d ticks, %d frames" % (
+        typist.pressed, shown, game.clock.ticks,
+        profiler.series["spriterenderer"].count))
+    if latency:
+        print("latency ms: mean %.1f, p50 %.1f, p90 %.1f, p99 %.1f, "
+              "max %.1f" % (latency["mean"], latency["p50"], latency["p90"],
+                            latency["p99"], latency["max"]))
+    return 0 if shown == typist.pressed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Measure how long levels take to parse, load from the cache and build.
+
+Run from the repository root:
+
+    python benchmarks/levels.py [--size 301] [--enemies 2000] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from boomber import headless  # noqa: E402
+from boomber import levels  # noqa: E402
+
+
+def best(repeat, function):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=301)
+    parser.add_argument("--enemies", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    level = levels.generate(args.size, args.size, args.enemies)
+    print("generate %d×%d: %.2f ms" % (args.size, args.size,
+                                       (time.perf_counter() - start) * 1000))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "level")
+        with open(path, "w") as f:
+            f.write(level.totext())
+
+        def parse():
+            with open(path) as f:
+                levels.parse(f.read())
+
+        def cached():
+            cache = levels.LevelCache(os.path.join(directory, "cache"))
+            cache.get(path)
+
+        cached()
+        print("parse text:         %.2f ms" %
+              (best(args.repeat, parse) * 1000))
+        print("load compiled:      %.2f ms" %
+              (best(args.repeat, cached) * 1000))
+
+        cache = levels.LevelCache(os.path.join(directory, "cache"))
+        cache.get(path)
+        print("memory cache hit:   %.4f ms" %
+              (best(args.repeat, lambda: cache.get(path)) * 1000))
+
+    start = time.perf_counter()
+    game = headless.create_game(level)
+    print("create_map:         %.2f ms, %d entities" %
+          ((time.perf_counter() - start) * 1000, len(game.world.entities)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Measure the memory a large level takes once it is built.
+
+Run from the repository root:
+
+    python benchmarks/memory.py [--blocks 100000] [--enemies 100000]
+                                [--sample 10000]
+
+A level with about the given numbers of destructible blocks and enemies
+is generated and built headless, and the resident memory it added is
+reported per entity. The bytes an entity of every kind costs, with its
+components, sprite and its place in the World, are then measured with
+tracemalloc on levels of --sample blocks or enemies that differ from
+each other only in that kind. Walls are measured on a level with
+nothing else, so they also carry the per tile cost of the level, like
+its flow field.
+"""
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from boomber import headless  # noqa: E402
+from boomber import levels  # noqa: E402
+
+
+def free_cells(size):
+    """Return how many tiles `levels.generate` fills with blocks or
+    enemies in a level of size×size."""
+
+    return sum(1 for y in range(1, size - 1) for x in range(1, size - 1)
+               if (x % 2 or y % 2) and x + y > 4)
+
+
+def level_with(blocks, enemies, seed=0):
+    """Return the smallest generated square level with at least the
+    given numbers of blocks and enemies."""
+
+    size = 7
+    while free_cells(size) < (blocks + enemies) * 1.05:
+        size = int(size * 1.2) | 1
+    free = free_cells(size) - enemies
+    return levels.generate(size, size, enemies, seed, blocks / free)
+
+
+def resident():
+    """Return the resident memory of the process in bytes."""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # The peak is the best there is elsewhere, in KiB on Linux and
+        # in bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def counts(level):
+    return {name: sum(1 for _ in level.cells(code)) for name, code in
+            (("walls", levels.WALL), ("blocks", levels.BLOCK),
+             ("enemies", levels.ENEMY))}
+
+
+def traced(function):
+    """Return the bytes still allocated after calling function, and its
+    result."""
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = function()
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+
+def per_kind(sample):
+    """Return the bytes per wall, block, enemy, bomb and explosion."""
+
+    size = 7
+    while free_cells(size) < sample * 1.05:
+        size = int(size * 1.2) | 1
+    fraction = sample / free_cells(size)
+    empty = levels.generate(size, size, 0, blocks=0)
+    walls = counts(empty)["walls"]
+
+    result = {}
+    base, game = traced(lambda: headless.create_game(empty))
+    del game
+    result["wall"] = base / walls
+    for kind, level in (
+            ("block", levels.generate(size, size, 0, blocks=fraction)),
+            ("enemy", levels.generate(size, size, sample, blocks=0))):
+        used, game = traced(lambda: headless.create_game(level))
+        del game
+        number = counts(level)["blocks" if kind == "block" else "enemies"]
+        result[kind] = (used - base) / number
+
+    game = headless.create_game(levels.generate(5, 5, 0))
+    for kind, pool in (("bomb", game.bomb_pool),
+                       ("explosion", game.explosion_pool)):
+        used, entities = traced(
+            lambda: [pool.factory() for _ in range(sample)])
+        result[kind] = used / sample
+        del entities
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=100000)
+    parser.add_argument("--enemies", type=int, default=100000)
+    parser.add_argument("--sample", type=int, default=10000,
+                        help="entities of every kind measured on their own")
+    args = parser.parse_args()
+
+    level = level_with(args.blocks, args.enemies)
+    number = counts(level)
+    gc.collect()
+    before = resident()
+    start = time.perf_counter()
+    game = headless.create_game(level)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    used = resident() - before
+    entities = len(game.world.entities)
+    print("%d×%d level: %d walls, %d blocks, %d enemies" % (
+        level.columns, level.rows, number["walls"], number["blocks"],
+        number["enemies"]))
+    print("built in %.2f s, %d entities, %.1f MiB resident "
+          "(%.0f bytes per entity)" % (elapsed, entities, used / 2 ** 20,
+                                       used / entities))
+    del game
+    gc.collect()
+
+    for kind, size in per_kind(args.sample).items():
+        print("%-10s %6.0f bytes" % (kind, size))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
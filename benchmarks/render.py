@@ -0,0 +1,303 @@
+"""Measure TextureRenderer and check its frames against golden ones.
+
+Run from the repository root:
+
+    python benchmarks/render.py [--scene NAME] [--mode NAME] [--update]
+
+Every scene is played headless with a fixed seed and script and drawn
+after every tick by the software renderer into an offscreen surface,
+once for every render mode. A mode reports the draw calls, sprites and
+milliseconds per frame, frames per second and the time per sprite.
+
+Some frames of every scene are compared with the golden frames in
+benchmarks/golden, which --update writes from the plain mode. A pixel
+differs when one of its channels is off by more than --tolerance, and a
+mode fails when more than --max-differing of the pixels of a frame do,
+so a faster render path is only good once it passes here.
+"""
+
+import argparse
+import contextlib
+import ctypes
+import lzma
+import os
+import struct
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sdl2  # noqa: E402
+
+from boomber import headless  # noqa: E402
+from boomber import levels  # noqa: E402
+from boomber import systems  # noqa: E402
+from boomber.sprites import tile_size  # noqa: E402
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+_HEADER = struct.Struct("<4sHII")
+_MAGIC = b"BMGF"
+_VERSION = 1
+
+
+def chain(game):
+    """Cover the level in bombs of a long range, for a screen full of
+    explosions a few ticks into the frames."""
+
+    player = game.player
+    player.playerdata.max_bombs = 1000
+    player.playerdata.max_range = 100
+    for x, y in game.level_data.cells(levels.EMPTY):
+        if (x + y) % 4 == 0:
+            game.plant_bomb(game.origin + x * tile_size,
+                            game.origin + y * tile_size)
+
+
+def follow(game):
+    """Point the camera at the enemy nearest the centre of the level,
+    which walks about, so the view scrolls."""
+
+    level = game.level_data
+    cx = game.origin + level.columns * tile_size // 2
+    cy = game.origin + level.rows * tile_size // 2
+    game.camera.target = min(
+        game.enemies, key=lambda e: (abs(e.sprite.x - cx) +
+                                     abs(e.sprite.y - cy), e.sprite.position))
+
+
+SCENES = {
+    "level-1": dict(level=1, warmup=240, frames=60, golden=(0, 30)),
+    "stress-61x41": dict(level=(61, 41, 200), camera=True, warmup=60,
+                         frames=60, golden=(59,)),
+    "scroll-61x41": dict(level=(61, 41, 200), camera=True, setup=follow,
+                         warmup=60, frames=60, golden=(30, 59)),
+    "explosions": dict(level=(19, 11, 0, 0, 0), setup=chain, warmup=190,
+                       frames=40, golden=(15,)),
+}
+"""Scene name to the level, generated from (columns, rows, enemies, seed,
+blocks) when a tuple, an optional setup run before the first tick, the
+ticks played before drawing, the frames drawn and the indices of the
+frames compared with golden ones."""
+
+MODES = {
+    "plain": {},
+    "atlas": {"atlas": True},
+    "layers": {"layers": True},
+    "dirty-rects": {"layers": True, "dirty_rects": True},
+    "atlas+layers": {"atlas": True, "layers": True},
+}
+"""Render mode name to the Game options that select it."""
+
+
+def build(name, mode):
+    scene = SCENES[name]
+    level = scene["level"]
+    if isinstance(level, tuple):
+        level = levels.generate(*level)
+    game = headless.create_game(level, render=True, seed=0, quiet=True,
+                                camera=scene.get("camera", False),
+                                **MODES[mode])
+    # The player must survive, otherwise the scene ends early.
+    game.player.destroydata.is_destroyable = False
+    if "setup" in scene:
+        scene["setup"](game)
+    return game
+
+
+class Counter:
+    """Count the SDL draw calls made while it is active."""
+
+    names = ("SDL_RenderCopy", "SDL_RenderCopyEx", "SDL_RenderGeometry")
+
+    def __init__(self):
+        self.calls = 0
+
+    def _wrap(self, function):
+        def counted(*args):
+            self.calls += 1
+            return function(*args)
+        return counted
+
+    @contextlib.contextmanager
+    def active(self):
+        saved = {name: getattr(sdl2.render, name, None)
+                 for name in self.names}
+        geometry = systems._render_geometry
+        for name, function in saved.items():
+            if function is not None:
+                setattr(sdl2.render, name, self._wrap(function))
+        if geometry is not None:
+            systems._render_geometry = self._wrap(geometry)
+        try:
+            yield self
+        finally:
+            for name, function in saved.items():
+                if function is not None:
+                    setattr(sdl2.render, name, function)
+            systems._render_geometry = geometry
+
+
+def pixels(game):
+    """Return the size and RGBA bytes of what game last drew."""
+
+    w, h = game.renderer.output_size()
+    data = ctypes.create_string_buffer(w * h * 4)
+    if sdl2.render.SDL_RenderReadPixels(
+            game.renderer.sdlrenderer, None,
+            sdl2.pixels.SDL_PIXELFORMAT_RGBA32, data, w * 4) != 0:
+        raise RuntimeError(sdl2.SDL_GetError().decode())
+    return (w, h), data.raw
+
+
+def play(name, mode, counted=False):
+    """Draw the frames of scene name in mode.
+
+    Return the seconds every frame took, the draw calls and sprites of
+    all frames, counted only with counted, and the golden frames.
+    """
+
+    scene = SCENES[name]
+    game = build(name, mode)
+    script = headless.patrol_script(scene["warmup"] + scene["frames"])
+    game.simulate(scene["warmup"], script)
+
+    counter = Counter()
+    sprites = 0
+    if counted:
+        render = game.renderer.render
+
+        def counting(drawn):
+            nonlocal sprites
+            sprites += len(drawn)
+            render(drawn)
+        game.renderer.render = counting
+
+    times = []
+    frames = {}
+    with counter.active() if counted else contextlib.nullcontext():
+        for index in range(scene["frames"]):
+            game.simulate(1, script)
+            start = time.perf_counter()
+            game.render()
+            times.append(time.perf_counter() - start)
+            if index in scene["golden"]:
+                frames[index] = pixels(game)
+    return times, counter.calls, sprites, frames
+
+
+def golden_path(name, index):
+    return os.path.join(GOLDEN, "%s-%d.rgba.xz" % (name, index))
+
+
+def write_golden(path, size, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, *size))
+        f.write(lzma.compress(data))
+
+
+def read_golden(path):
+    """Return the size and pixels of a golden frame, None if missing."""
+
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            data = lzma.decompress(f.read())
+    except FileNotFoundError:
+        return None
+    magic, version, w, h = _HEADER.unpack(header)
+    if magic != _MAGIC or version != _VERSION or len(data) != w * h * 4:
+        raise ValueError("%s is not a golden frame" % path)
+    return (w, h), data
+
+
+def differing(data, golden, tolerance):
+    """Return how many pixels of data differ from golden and the largest
+    difference of a channel."""
+
+    if data == golden:
+        return 0, 0
+    if numpy is not None:
+        a = numpy.frombuffer(data, numpy.uint8).astype(numpy.int16)
+        b = numpy.frombuffer(golden, numpy.uint8).astype(numpy.int16)
+        diff = numpy.abs(a - b).reshape(-1, 4).max(axis=1)
+        return int((diff > tolerance).sum()), int(diff.max())
+    count = largest = 0
+    for i in range(0, len(data), 4):
+        diff = max(abs(x - y) for x, y in zip(data[i:i + 4],
+                                               golden[i:i + 4]))
+        largest = max(largest, diff)
+        count += diff > tolerance
+    return count, largest
+
+
+def check(name, frames, tolerance, max_differing):
+    """Return a list of problems of frames against the golden frames."""
+
+    problems = []
+    for index, (size, data) in sorted(frames.items()):
+        path = golden_path(name, index)
+        golden = read_golden(path)
+        if golden is None:
+            problems.append("frame %d: no golden frame, run with --update"
+                            % index)
+            continue
+        if golden[0] != size:
+            problems.append("frame %d: %d×%d instead of %d×%d"
+                            % ((index,) + size + golden[0]))
+            continue
+        count, largest = differing(data, golden[1], tolerance)
+        if count > max_differing * size[0] * size[1]:
+            problems.append("frame %d: %d pixels differ, by up to %d"
+                            % (index, count, largest))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scene", action="append", choices=sorted(SCENES),
+                        help="run only this scene, can be repeated")
+    parser.add_argument("--mode", action="append", choices=list(MODES),
+                        help="run only this render mode, can be repeated")
+    parser.add_argument("--tolerance", type=int, default=2,
+                        help="largest channel difference of equal pixels")
+    parser.add_argument("--max-differing", type=float, default=0.0,
+                        help="fraction of pixels a frame may have differ")
+    parser.add_argument("--update", action="store_true",
+                        help="write the golden frames from the plain mode")
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.scene or SCENES:
+        if args.update:
+            for index, (size, data) in play(name, "plain")[3].items():
+                write_golden(golden_path(name, index), size, data)
+            print("%s: golden frames written" % name)
+
+        print("%s:" % name)
+        for mode in args.mode or MODES:
+            times, _, _, frames = play(name, mode)
+            _, calls, sprites, _ = play(name, mode, counted=True)
+            total = sum(times)
+            count = len(times)
+            print("  %-13s %6.1f draws, %6.1f sprites, %7.3f ms/frame, "
+                  "%7.1f fps, %6.2f us/sprite" % (
+                      mode, calls / count, sprites / count,
+                      total / count * 1000, count / total,
+                      total / max(sprites, 1) * 1e6))
+            for problem in check(name, frames, args.tolerance,
+                                 args.max_differing):
+                print("    MISMATCH %s" % problem)
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
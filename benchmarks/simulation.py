@@ -0,0 +1,151 @@
+"""Measure headless simulation throughput on standard and stress levels.
+
+Run from the repository root:
+
+    python benchmarks/simulation.py [--ticks N] [--json out.json]
+                                    [--baseline old.json]
+
+Every scenario reports ticks per second, the mean and 99th percentile
+time spent in each system and the memory blocks allocated while
+ticking. With --baseline the run fails when a scenario lost more than
+--tolerance of its throughput, which is meant for tracking regressions
+in CI.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from boomber import headless  # noqa: E402
+from boomber import levels  # noqa: E402
+from boomber.profiling import Profiler  # noqa: E402
+
+
+SCENARIOS = {
+    "level-1": None,
+    "stress-31x21": (31, 21, 40),
+    "stress-61x41": (61, 41, 200),
+}
+"""Scenario name to (columns, rows, enemies) of a generated level."""
+
+
+def level_for(name):
+    spec = SCENARIOS[name]
+    if spec is None:
+        return 1
+    return levels.generate(*spec)
+
+
+def run(name, level, ticks, trace, store, ai):
+    profiler = Profiler(capacity=ticks)
+    game = headless.create_game(level, store=store, ai=ai,
+                                profiler=profiler)
+    # The player must survive, otherwise the run ends early.
+    game.player.destroydata.is_destroyable = False
+    script = headless.patrol_script(ticks)
+
+    if trace:
+        tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    done = game.simulate(ticks, script)
+    elapsed = time.perf_counter() - start
+    blocks = sys.getallocatedblocks() - blocks
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    summary = profiler.summary()
+
+    return {
+        "scenario": name,
+        "ticks": done,
+        "seconds": elapsed,
+        "ticks_per_second": done / elapsed if elapsed else 0.0,
+        "entities": len(game.world.entities),
+        "allocated_blocks": blocks,
+        "peak_traced_bytes": peak,
+        "systems_ms_per_tick": {k: v["mean"] for k, v in summary.items()
+                                if k != "tick"},
+        "systems_p99_ms": {k: v["p99"] for k, v in summary.items()
+                           if k != "tick"},
+        "pools": {"bombs": game.bomb_pool.stats(),
+                  "explosions": game.explosion_pool.stats()},
+    }
+
+
+def report(result):
+    print("%s: %d ticks in %.2fs, %.0f ticks/s, %d entities, "
+          "%+d blocks" % (result["scenario"], result["ticks"],
+                          result["seconds"], result["ticks_per_second"],
+                          result["entities"], result["allocated_blocks"]))
+    if result["peak_traced_bytes"] is not None:
+        print("    peak traced memory %d bytes" %
+              result["peak_traced_bytes"])
+    for name, stats in result["pools"].items():
+        print("    %s pool: %d created, %d reused, high water %d" %
+              (name, stats["created"], stats["reused"], stats["high_water"]))
+    systems = result["systems_ms_per_tick"]
+    p99 = result["systems_p99_ms"]
+    for system in sorted(systems, key=systems.get, reverse=True):
+        print("    %-24s %8.4f ms/tick, p99 %8.4f ms" %
+              (system, systems[system], p99[system]))
+
+
+def regressions(results, baseline, tolerance):
+    old = {r["scenario"]: r["ticks_per_second"] for r in baseline}
+    failed = []
+    for result in results:
+        previous = old.get(result["scenario"])
+        if previous and result["ticks_per_second"] < previous * (1 - tolerance):
+            failed.append((result["scenario"], previous,
+                           result["ticks_per_second"]))
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--scenario", action="append",
+                        choices=sorted(SCENARIOS),
+                        help="run only this scenario, can be repeated")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also record peak memory, slows ticking down")
+    parser.add_argument("--store", action="store_true",
+                        help="use the NumPy component store")
+    parser.add_argument("--ai", choices=("random", "flow"), default="random",
+                        help="enemy AI to simulate")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = []
+    for name in args.scenario or SCENARIOS:
+        result = run(name, level_for(name), args.ticks, args.tracemalloc,
+                     args.store, args.ai)
+        report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failed = regressions(results, json.load(f), args.tolerance)
+        for scenario, previous, current in failed:
+            print("REGRESSION %s: %.0f -> %.0f ticks/s" %
+                  (scenario, previous, current))
+        if failed:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Time taking and restoring snapshots while a level is played.
+
+Run from the repository root:
+
+    python benchmarks/snapshot.py [--ticks N] [--store] [--ai flow]
+
+Every scenario takes a snapshot after every tick, then rolls a game
+back to a few of them and plays on, failing if the state it reaches
+differs from the snapshots taken the first time.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from boomber import headless  # noqa: E402
+from boomber import levels  # noqa: E402
+from boomber import snapshot  # noqa: E402
+
+
+SCENARIOS = {
+    "level-1": None,
+    "stress-31x21": (31, 21, 40),
+}
+"""Scenario name to (columns, rows, enemies) of a generated level."""
+
+
+def level_for(name):
+    spec = SCENARIOS[name]
+    if spec is None:
+        return 1
+    return levels.generate(*spec)
+
+
+def run(name, level, ticks, store, ai):
+    game = headless.create_game(level, store=store, ai=ai, seed=0,
+                                quiet=True)
+    # The player must survive, otherwise the run ends early.
+    game.player.destroydata.is_destroyable = False
+    script = headless.patrol_script(ticks)
+
+    snapshots = [snapshot.take(game)]
+    takes = []
+    for _ in range(ticks):
+        game.simulate(1, script)
+        start = time.perf_counter()
+        snapshots.append(snapshot.take(game))
+        takes.append(time.perf_counter() - start)
+        if not game.running:
+            break
+
+    played = len(snapshots) - 1
+    restores = []
+    diverged = []
+    for start in range(0, played, max(1, played // 8)):
+        mark = time.perf_counter()
+        snapshot.restore(game, snapshots[start])
+        restores.append(time.perf_counter() - mark)
+        for tick in range(start, played):
+            game.simulate(1, script)
+            if snapshot.take(game) != snapshots[tick + 1]:
+                diverged.append((start, tick + 1))
+                break
+
+    sizes = [len(data) for data in snapshots]
+    return {
+        "scenario": name,
+        "ticks": played,
+        "take_us": statistics.mean(takes) * 1e6,
+        "take_max_us": max(takes) * 1e6,
+        "restore_us": statistics.mean(restores) * 1e6,
+        "bytes": statistics.mean(sizes),
+        "bytes_max": max(sizes),
+        "diverged": diverged,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--scenario", action="append",
+                        choices=sorted(SCENARIOS),
+                        help="run only this scenario, can be repeated")
+    parser.add_argument("--store", action="store_true",
+                        help="use the NumPy component store")
+    parser.add_argument("--ai", choices=("random", "flow"), default="random",
+                        help="enemy AI to simulate")
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.scenario or SCENARIOS:
+        result = run(name, level_for(name), args.ticks, args.store, args.ai)
+        print("%s: %d ticks, take %.0f us (max %.0f), restore %.0f us, "
+              "%.0f bytes (max %d)" % (
+                  result["scenario"], result["ticks"], result["take_us"],
+                  result["take_max_us"], result["restore_us"],
+                  result["bytes"], result["bytes_max"]))
+        for start, tick in result["diverged"]:
+            print("    DIVERGED rolled back to %d, differs at %d"
+                  % (start, tick))
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Measure the time to the first frame with and without the AssetLoader.
+
+Run from the repository root:
+
+    python benchmarks/startup.py [--level 1] [--atlas] [--repeat N]
+
+Every start runs in a fresh process, so no texture or image decoder is
+warm. "eager" decodes every image on the main thread as before, "cold"
+decodes them on the loader's threads into an empty cache directory and
+"warm" reads them back from it.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def first_frame(level, atlas, mode, directory):
+    """Start a game offscreen and return its startup timings."""
+
+    started = time.perf_counter()
+    from boomber import headless
+    from boomber.assets import AssetLoader
+    from boomber.levels import LevelCache
+    from boomber.sprites import SpriteFactory
+
+    assets = None
+    if mode != "eager":
+        level_data = LevelCache().get(level)
+        assets = AssetLoader(SpriteFactory.textures_for(level_data),
+                             directory=directory)
+    imported = time.perf_counter()
+    game = headless.create_game(level, render=True, atlas=atlas,
+                                assets=assets)
+    mapped = time.perf_counter()
+    game.render()
+    end = time.perf_counter()
+
+    result = {
+        "start": (imported - started) * 1000,
+        "game": (mapped - imported) * 1000,
+        "first_frame": (end - mapped) * 1000,
+        "upload": game.sfactory.tfactory.uploaded * 1000,
+        "total": (end - started) * 1000,
+    }
+    if assets is not None:
+        result["decode_wait"] = assets.waited * 1000
+        assets.close()
+    return result
+
+
+def run(level, atlas, mode, directory):
+    command = [sys.executable, __file__, "--child", mode,
+               "--level", str(level), "--directory", directory]
+    if atlas:
+        command.append("--atlas")
+    output = subprocess.run(command, check=True, capture_output=True,
+                            text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--level", default="1")
+    parser.add_argument("--atlas", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    level = int(args.level) if args.level.isdigit() else args.level
+
+    if args.child:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        print(json.dumps(first_frame(level, args.atlas, args.child,
+                                     args.directory)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ("eager", "cold", "warm"):
+            results = []
+            for _ in range(args.repeat):
+                if mode == "cold":
+                    for name in os.listdir(directory):
+                        os.remove(os.path.join(directory, name))
+                results.append(run(level, args.atlas, mode, directory))
+            best = min(results, key=lambda r: r["total"])
+            print("%-5s " % mode + ", ".join(
+                "%s %.1f ms" % item for item in best.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,14 @@
-import os
+import random
+import time
 
 import sdl2
 import sdl2.ext
 
+from boomber import snapshot
+from boomber.atlas import build_atlas
+from boomber.clock import Clock
+from boomber.components import AnimationData
+from boomber.controls import Input
 from boomber.entities import (
     Block,
     Bomb,
@@ -10,133 +16,671 @@ from boomber.entities import (
     Explosion,
     Player,
     Tile,
+    Viewport,
 )
-from boomber.sprites import SpriteFactory, tile_size
+from boomber.flowfield import FlowField
+from boomber.levels import (
+    BLOCK,
+    EMPTY,
+    ENEMY as ENEMY_TILE,
+    ENEMY_VELOCITIES,
+    PLAYER as PLAYER_TILE,
+    WALL,
+    Level,
+    LevelCache,
+)
+from boomber.pool import EntityPool
+from boomber.profiling import Overlay, ProfiledWorld
+from boomber.registry import Registry
+from boomber.scheduler import Scheduler
+from boomber.spatial import SpatialGrid
+from boomber.store import (
+    ENEMY,
+    PLAYER,
+    ComponentStore,
+    StoredSprite,
+    StoreHolder,
+)
+from boomber.sprites import (
+    BLOCKS,
+    STATIC,
+    MutableTextureSprite,
+    SpriteFactory,
+    tile_size,
+)
+from boomber.world import World
 
 
 class Game:
     """Main class, contains information about all systems and states."""
 
-    def __new__(cls, *args, **kwargs):
-        if not hasattr(cls, "instance"):
-            cls.instance = super().__new__(cls)
-        return cls.instance
-
-    def __init__(self, window=None, systems=None):
+    def __init__(self, window=None, systems=None, atlas=False,
+                 tick_rate=100, frame_rate=None, interpolate=False,
+                 store=False, layers=False, dirty_rects=False,
+                 pool_size=8, pool_limit=None, window_size=(1335, 900),
+                 camera=False, profiler=None, overlay=False, seed=None,
+                 recorder=None, quiet=False, assets=None, autosave=None):
+        created = time.perf_counter()
         sdl2.ext.init()
 
         self.player = None
+        # Every player still alive, the game is over without any. player
+        # is the one played on this machine.
+        self.players = Registry(Player)
+        self.outcome = None
+        self.quiet = quiet
         self.level = 1
-        self.enemies = []
-        self.bombs = []
-        self.explosion_area = []
-        self.entities_to_delete = []
-
-        self.window = window or sdl2.ext.Window("OK, Boomber",
-                                                size=(1335, 900))
-        self.world = sdl2.ext.World()
+        self.level_data = None
+        self.levels = LevelCache()
+        self.enemies = Registry(Enemy)
+        self.bombs = Registry(Bomb)
+        self.explosion_area = Registry(Explosion)
+        self.entities_to_delete = Registry(sdl2.ext.Entity)
+        self.grid = SpatialGrid(tile_size)
+        self.origin = 0
+        self.tiles = {}
+        self.bomb_cells = {}
+        # PlayerData of the player that planted every bomb, which limits
+        # how many it has out and sets their range even after it died.
+        self.owners = {}
+        self.flames = {}
+        self.flowfield = None
+        # Textures shared by the enemies of the level.
+        self.walking = None
+        self.clock = Clock(tick_rate, frame_rate=frame_rate)
+        self.tick_rate = tick_rate
+        # Every random choice of the simulation comes from rng, so a run
+        # is repeated exactly from its seed and inputs.
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 63)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.recorder = recorder
+        # A snapshot is written to autosave, a path, once a second.
+        self.autosave = autosave
+        self.roster = None
+        self.scheduler = Scheduler(self.clock)
+        self.interpolate = interpolate
+        self._previous = {}
+        # Keyboard of the local player, read by `start`.
+        self.input = Input(self)
+
+        self.window = window
+        self.window_size = window_size
+        # A Profiler, when given, records every system, tick and frame.
+        self.profiler = profiler
+        if profiler is not None:
+            self.world = ProfiledWorld(profiler)
+        else:
+            self.world = World()
         self.systems = systems or {}
-        self.sfactory = SpriteFactory(self.systems.get("spriterenderer"))
+        self.renderer = self.systems.get("spriterenderer")
+        self.camera_system = self.systems.get("camera_system")
+        # With an AssetLoader the images are decoded in the background
+        # and uploaded when a sprite first needs them.
+        self.assets = assets
+        self.sfactory = SpriteFactory(self.renderer, assets=assets)
+
+        # Bombs and explosions are recycled, pool_size of each are built
+        # when a map is loaded.
+        self.pool_size = pool_size
+        self.bomb_pool = EntityPool(self.world, self._new_bomb, pool_limit)
+        self.explosion_pool = EntityPool(
+            self.world,
+            lambda: Explosion(self.world, self.sfactory.explosion(), 0, 0),
+            pool_limit)
+
+        # Players and enemies keep their data in NumPy arrays, which the
+        # systems built with create_systems(store=True) work on.
+        self.store = None
+        if store:
+            self.store = ComponentStore(seed=seed)
+            self.sfactory.moving = StoredSprite
+            StoreHolder(self.world, self.store)
+
+        if atlas and self.renderer is not None:
+            renderer = self.renderer
+            renderer.use_atlas(build_atlas(renderer, SpriteFactory.textures,
+                                           assets=assets),
+                               self.sfactory.tfactory.cache)
+
+        if layers and self.renderer is not None:
+            self.renderer.use_layers(dirty_rects)
+
+        # With a camera only the sprites in view are drawn. They are
+        # found through scene, an index of every sprite.
+        self.use_camera = camera
+        self.camera = None
+        self.scene = None
 
+        # The renderer and the camera run once per frame in `render`,
+        # not once per tick.
         for system in self.systems.values():
-            self.world.add_system(system)
-
-    def plant_bomb(self, x, y):
-        if len(self.bombs) < self.player.playerdata.max_bombs:
-            sprite = self.sfactory.bomb()
-            self.bombs.append(Bomb(self.world, sprite, x, y))
-
-    def explode(self, center_x, center_y):
-        for r in range(1, self.player.playerdata.max_range * 2 + 1):
-            r = r / 2.0
-            for x, y in ((-tile_size * r, 0), (0, -tile_size * r),
-                         (tile_size * r, 0), (0, tile_size * r), (0, 0)):
-                sprite = self.sfactory.explosion()
-                e = Explosion(self.world, sprite,
-                              center_x + round(x), center_y + round(y))
-                self.explosion_area.append(e)
+            system.game = self
+            if system not in (self.renderer, self.camera_system):
+                self.world.add_system(system)
+        if profiler is not None:
+            self.world.names = {id(system): name
+                                for name, system in self.systems.items()}
+            if overlay and self.renderer is not None:
+                self.renderer.overlay = Overlay(profiler, 1000 / tick_rate)
+
+        # Milliseconds spent in every phase up to the first frame, the
+        # rest is filled in by `start`.
+        self.created = created
+        self.startup = {"init": (time.perf_counter() - created) * 1000}
+
+    @property
+    def time(self):
+        """Simulation time in seconds."""
+
+        return self.clock.time
+
+    def cell(self, x, y):
+        """Return the (column, row) of the level tile nearest to x, y."""
+
+        half = tile_size // 2
+        return ((x - self.origin + half) // tile_size,
+                (y - self.origin + half) // tile_size)
+
+    def press(self, key, timestamp=None, player=None):
+        """Queue a key press of player, by default the local one, for the
+        next tick.
+
+        timestamp is the one of the SDL event in milliseconds, it lets
+        the profiler measure the latency until the press shows.
+        """
+
+        if player is None:
+            player = self.player
+        player.controldata.actions.append((key, timestamp))
+
+    def plant_bomb(self, x, y, player=None):
+        """Plant a bomb of player, by default the local one, at x, y."""
+
+        if player is None:
+            player = self.player
+        playerdata = player.playerdata
+        planted = sum(owner is playerdata for owner in self.owners.values())
+        if planted < playerdata.max_bombs:
+            cell = self.cell(x, y)
+            if cell in self.bomb_cells:
+                return
+            bomb = self.bomb_pool.acquire()
+            bomb.reset(x, y)
+            bomb.timer.handle = self.scheduler.schedule(
+                bomb.timer.delta, bomb.timer.callback, bomb)
+            self.bombs.add(bomb)
+            self.owners[bomb] = playerdata
+            self._show(bomb)
+            self.bomb_cells[cell] = bomb
+            self.flowfield.close(cell)
+
+    def _new_bomb(self):
+        bomb = Bomb(self.world, self.sfactory.bomb(), 0, 0)
+        bomb.timer.callback = self.detonate
+        return bomb
+
+    def detonate(self, bomb):
+        """Timer callback of a planted bomb."""
+
+        if bomb in self.bombs:
+            owner = self.owners.get(bomb, self.player.playerdata)
+            self.explode(bomb.sprite.x, bomb.sprite.y, owner.max_range)
+
+    def explode(self, center_x, center_y, max_range=None):
+        """Spread the blast of the bomb at center_x, center_y over the
+        level tiles.
+
+        The blast runs max_range tiles in every direction, by default the
+        range of the local player, stops in front of walls and on the
+        first destructible block, which is destroyed. Bombs it reaches go
+        off at once with the range of their own owner, so a whole chain
+        is resolved in this call and every cell gets at most one
+        explosion.
+        """
+
+        if max_range is None:
+            max_range = self.player.playerdata.max_range
+        # Chained bombs come with no range, theirs is looked up.
+        pending = [(self.cell(center_x, center_y), max_range)]
+        detonated = set()
+        # Cells in the order they caught fire, used as an ordered set.
+        burning = {}
+        while pending:
+            center, max_range = pending.pop()
+            if center in detonated:
+                continue
+            detonated.add(center)
+            burning[center] = True
+
+            bomb = self.bomb_cells.pop(center, None)
+            if bomb is not None:
+                owner = self.owners.pop(bomb, self.player.playerdata)
+                if max_range is None:
+                    max_range = owner.max_range
+                bomb.destroydata.is_alive = False
+                bomb.timer.handle.cancel()
+                self.bombs.discard(bomb)
+
+            for dx, dy in ((-1, 0), (0, -1), (1, 0), (0, 1)):
+                for r in range(1, max_range + 1):
+                    cell = center[0] + dx * r, center[1] + dy * r
+                    tile = self.tiles.get(cell)
+                    if tile is None:
+                        burning[cell] = True
+                    elif tile.destroydata.is_destroyable:
+                        burning[cell] = True
+                        tile.destroydata.is_alive = False
+                        break
+                    else:
+                        break
+                    if cell in self.bomb_cells:
+                        pending.append((cell, None))
+
+        for cell in burning:
+            self._ignite(cell)
+
+    def _ignite(self, cell):
+        flame = self.flames.get(cell)
+        if flame is not None and flame.destroydata.is_alive:
+            flame.spriteanimationdata.start = None
+            return
+
+        e = self.explosion_pool.acquire()
+        e.reset(self.origin + cell[0] * tile_size,
+                self.origin + cell[1] * tile_size)
+        self.explosion_area.add(e)
+        self.grid.insert(e.sprite, e)
+        self._show(e)
+        self.flames[cell] = e
 
     def process(self):
-        for e in self.entities_to_delete:
-            if e in self.explosion_area:
-                self.explosion_area.remove(e)
-            if e is self.player:
-                self.stop("game over!")
+        """Delete the entities queued for deletion during the tick."""
+
+        if not self.entities_to_delete:
+            return
+        doomed = self.entities_to_delete
+        self.entities_to_delete = Registry(sdl2.ext.Entity)
+
+        deleted = []
+        for e in doomed:
+            self.explosion_area.discard(e)
+            if e in self.players:
+                self.players.discard(e)
+                if not self.players:
+                    self.stop("game over!")
             if e in self.enemies:
-                self.enemies.remove(e)
+                self.enemies.discard(e)
                 if not self.enemies:
                     self.stop("you won!")
-            if e in self.bombs:
-                self.bombs.remove(e)
-            self.world.delete(e)
+            self.bombs.discard(e)
+            self.owners.pop(e, None)
+            cell = self.cell(*e.sprite.position)
+            if self.bomb_cells.get(cell) is e:
+                del self.bomb_cells[cell]
+            if self.flames.get(cell) is e:
+                del self.flames[cell]
+            if self.tiles.get(cell) is e:
+                del self.tiles[cell]
+                self.flowfield.open(cell)
+                if self.renderer is not None:
+                    self.renderer.invalidate(BLOCKS, e.sprite.area)
+            self.grid.remove(e.sprite)
+            if self.scene is not None:
+                self.scene.remove(e.sprite)
+            if self.store is not None:
+                self.store.remove(e)
+            if isinstance(e, Bomb):
+                if cell not in self.bomb_cells:
+                    self.flowfield.open(cell)
+                self.bomb_pool.release(e)
+            elif isinstance(e, Explosion):
+                self.explosion_pool.release(e)
+            else:
+                deleted.append(e)
+        if deleted:
+            self.world.delete_entities(deleted)
 
     def stop(self, message=None):
-        if message:
+        """End the game loop, message is kept as the outcome."""
+
+        self.outcome = message
+        if message and not self.quiet:
             print(message)
         self.running = False
 
-    def start(self):
-        self.create_map(self.level)
+    def start(self, resume=None):
+        """Open the window and play until the game ends.
+
+        The level loaded by `create_map` is played, `level` if none is.
+        resume is a snapshot of the level to continue from.
+        """
+
+        mark = time.perf_counter()
+        if self.window is None:
+            self.window = sdl2.ext.Window("OK, Boomber",
+                                          size=self.window_size)
+        mark = self._phase("window", mark)
+        if self.level_data is None:
+            self.create_map(self.level)
+        if resume is not None:
+            snapshot.restore(self, resume)
+        mark = self._phase("map", mark)
         self.window.show()
+        self.render()
+        self._phase("first_frame", mark)
+        self._started()
         self.running = True
 
+        clock = self.clock
+        clock.start()
         while self.running:
-            events = sdl2.ext.get_events()
-            for event in events:
-                if event.type == sdl2.SDL_QUIT:
-                    self.running = False
-                if event.type == sdl2.SDL_KEYDOWN:
-                    if event.key.keysym.sym in (sdl2.SDLK_UP, sdl2.SDLK_DOWN,
-                                                sdl2.SDLK_LEFT, sdl2.SDLK_RIGHT,
-                                                sdl2.SDLK_SPACE):
-                        self.player.controldata.event = event.key.keysym.sym
-            self.world.process()
+            self.input.poll()
+            for _ in range(clock.advance()):
+                self.input.repeat()
+                self.tick()
+                if not self.running:
+                    break
+            if clock.frame():
+                self.render(clock.alpha)
+            clock.wait()
+        return 0
+
+    def _phase(self, name, since):
+        now = time.perf_counter()
+        self.startup[name] = (now - since) * 1000
+        return now
+
+    def _started(self):
+        """Complete the startup timings once the first frame is out."""
+
+        startup = self.startup
+        tfactory = self.sfactory.tfactory
+        if tfactory is not None:
+            startup["upload"] = tfactory.uploaded * 1000
+        if self.assets is not None:
+            startup["decode_wait"] = self.assets.waited * 1000
+        startup["total"] = (time.perf_counter() - self.created) * 1000
+
+    def simulate(self, ticks, script=None, render=False):
+        """Run up to ticks simulation steps as fast as possible.
+
+        No SDL events are read and nothing is drawn unless render is set,
+        then one frame is drawn per tick. script maps a tick number to
+        the key symbol the player presses on that tick. Return the number
+        of ticks run, which is less than ticks if the game ended.
+        """
+
+        self.running = True
+        for tick in range(ticks):
+            if script:
+                key = script.get(self.clock.ticks)
+                if key is not None:
+                    self.press(key)
+            self.tick()
+            if render:
+                self.render()
+            if not self.running:
+                return tick + 1
+        return ticks
+
+    def tick(self):
+        """Advance the simulation by one fixed step."""
+
+        if self.recorder is not None:
+            self.recorder.tick(self)
+        if self.autosave is not None and \
+                self.clock.ticks % self.tick_rate == 0:
+            snapshot.save(self, self.autosave)
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.tick = self.clock.ticks
+            start = profiler.timer()
+        if self.interpolate:
+            self._previous = {s: s.position for s in self._moving_sprites()}
+        self.clock.step()
+        self.world.process()
+        if profiler is None:
             self.process()
+            return
 
-            sdl2.SDL_Delay(10)
-        return 0
+        processed = profiler.timer()
+        self.process()
+        end = profiler.timer()
+        profiler.record("process", processed, end)
+        profiler.record("tick", start, end)
+        profiler.count(self.world)
+
+    def _moving_sprites(self):
+        for player in self.players:
+            yield player.sprite
+        for enemy in self.enemies:
+            yield enemy.sprite
+
+    def render(self, alpha=1.0):
+        """Draw the current state.
+
+        With interpolation enabled, moving sprites are drawn alpha of the
+        way between their positions before and after the last tick.
+        With a camera, only the sprites near its view are passed to the
+        renderer.
+        """
+
+        if self.renderer is None:
+            return
+        current = {}
+        if self.interpolate:
+            for sprite, (px, py) in self._previous.items():
+                current[sprite] = x, y = sprite.position
+                sprite.position = (round(px + (x - px) * alpha),
+                                   round(py + (y - py) * alpha))
+
+        if self.camera is None:
+            sprites = self.world.get_components(MutableTextureSprite)
+        else:
+            if self.camera_system is not None:
+                self.camera_system.process(self.world, (self.camera,))
+            self.renderer.offset = self.camera.x, self.camera.y
+            sprites = self._visible()
+        if self.profiler is None:
+            self.renderer.process(self.world, sprites)
+        else:
+            start = self.profiler.timer()
+            self.renderer.process(self.world, sprites)
+            self.profiler.record("spriterenderer", start,
+                                 self.profiler.timer())
+            self.profiler.presented(self.clock.ticks)
+
+        for sprite, position in current.items():
+            sprite.position = position
+
+    def _visible(self):
+        """Return the sprites that may be inside the camera's view."""
+
+        scene = self.scene
+        for sprite in self._moving_sprites():
+            scene.update(sprite)
+        return list(scene.query(self.camera.area))
+
+    def _track(self, entity, kind):
+        """Index a new player or enemy for the collision checks."""
+
+        if self.store is not None:
+            self.store.add(entity, kind)
+        else:
+            self.grid.insert(entity.sprite, entity)
+
+    def _new_player(self, x, y):
+        player = Player(self.world, self.sfactory.player(), x, y)
+        self.players.add(player)
+        self._track(player, PLAYER)
+        self._show(player)
+        return player
+
+    def add_player(self):
+        """Put one more player into the level and return it.
+
+        It starts on the free tile furthest from the enemies and the
+        other players, which favours the player tiles of the level.
+        """
+
+        level = self.level_data
+        occupied = [self.cell(*e.sprite.position)
+                    for e in list(self.enemies) + list(self.players)]
+        best = None
+        for code in (PLAYER_TILE, EMPTY):
+            for cell in level.cells(code):
+                if cell in self.tiles or cell in self.bomb_cells:
+                    continue
+                distance = min((abs(cell[0] - c) + abs(cell[1] - r)
+                                for c, r in occupied), default=0)
+                if best is None or distance > best[0]:
+                    best = distance, cell
+        if best is None:
+            raise ValueError("no free tile for another player")
+        column, row = best[1]
+        player = self._new_player(self.origin + column * tile_size,
+                                  self.origin + row * tile_size)
+        return player
+
+    def _show(self, entity):
+        """Index a new entity for finding the sprites in view."""
+
+        if self.scene is not None:
+            self.scene.insert(entity.sprite, entity)
+
+    def _clear_map(self):
+        """Take the loaded level out of the world and the game."""
+
+        # Planted bombs and explosions go back to their pools, everything
+        # else of the level is deleted.
+        for bomb in self.bombs:
+            self.bomb_pool.release(bomb)
+        for explosion in self.explosion_area:
+            self.explosion_pool.release(explosion)
+        self.scheduler.clear()
+        if self.store is not None:
+            for entity in reversed(list(self.store.entities)):
+                self.store.remove(entity)
+        self.world.delete_entities(
+            [e for e in self.world.entities
+             if not isinstance(e, StoreHolder)])
+
+        self.player = None
+        self.players.clear()
+        self.enemies.clear()
+        self.bombs.clear()
+        self.explosion_area.clear()
+        self.entities_to_delete.clear()
+        self.grid.clear()
+        self.tiles = {}
+        self.bomb_cells.clear()
+        self.owners.clear()
+        self.flames.clear()
+        self.flowfield = None
+        if self.walking is not None:
+            for texture in (self.walking.right, self.walking.down,
+                            self.walking.left, self.walking.up):
+                self.sfactory.release(texture)
+            self.walking = None
+        self.outcome = None
+        self.roster = None
+        self.scene = None
+        self.camera = None
+        self._previous = {}
+        if self.renderer is not None:
+            self.renderer.invalidate(STATIC)
 
     def create_map(self, level):
-        velocity = [(3, 0), (0, 3), (3, 0), (0, 3), (3, 0), (0, 3)]
+        """Populate the world with level and return whether it exists.
+
+        level is a level number, the path of a text level or a Level. A
+        level loaded before is taken out first.
+        """
+
         start_position = 50
+        self.origin = start_position
+
+        if not isinstance(level, Level):
+            level = self.levels.get(level)
+            if level is None:
+                return False
+        if self.level_data is not None:
+            self._clear_map()
+        self.level_data = level
+
+        if self.assets is None:
+            self.sfactory.preload()
+        self.bomb_pool.warm(self.pool_size)
+        self.explosion_pool.warm(self.pool_size)
+
+        width = level.columns * tile_size
+        height = level.rows * tile_size
+        if self.use_camera:
+            self.scene = SpatialGrid(tile_size)
+            if self.renderer is not None:
+                size = self.renderer.output_size()
+            else:
+                size = self.window_size
+            self.camera = Viewport(self.world, *size).camera
+            self.camera.bounds = (0, 0, width + 2 * start_position,
+                                  height + 2 * start_position)
+
+        # The background is split into equal parts no larger than the
+        # image, so a big level is not drawn from one huge sprite.
+        bw, bh = self.sfactory.background_size
+        across, down = -(-width // bw), -(-height // bh)
+        for i in range(across):
+            left, right = width * i // across, width * (i + 1) // across
+            for j in range(down):
+                top, bottom = height * j // down, height * (j + 1) // down
+                sprite = self.sfactory.background((right - left,
+                                                   bottom - top))
+                sprite.layer = STATIC
+                self._show(Tile(self.world, sprite, start_position + left,
+                                start_position + top))
+
+        def positions(code):
+            for column, row in level.cells(code):
+                yield (column, row), (start_position + column * tile_size,
+                                      start_position + row * tile_size)
+
+        for cell, (x, y) in positions(WALL):
+            sprite = self.sfactory.wall()
+            sprite.layer = STATIC
+            self.tiles[cell] = Block(self.world, sprite, x, y, False)
+            self._show(self.tiles[cell])
+
+        for cell, (x, y) in positions(BLOCK):
+            sprite = self.sfactory.block()
+            sprite.layer = BLOCKS
+            self.tiles[cell] = Block(self.world, sprite, x, y, True)
+            self._show(self.tiles[cell])
+
+        for cell, (x, y) in positions(PLAYER_TILE):
+            self.player = self._new_player(x, y)
+
+        # Every enemy walks with the same textures.
+        walking = self.walking = AnimationData(
+            self.sfactory.texture("right.png"),
+            self.sfactory.texture("down.png"),
+            self.sfactory.texture("left.png"),
+            self.sfactory.texture("up.png"))
+        for i, (cell, (x, y)) in enumerate(positions(ENEMY_TILE)):
+            vx, vy = ENEMY_VELOCITIES[i % len(ENEMY_VELOCITIES)]
+            sprite = self.sfactory.enemy()
+            enemy = Enemy(self.world, sprite, x, y, walking)
+            enemy.velocity.vx, enemy.velocity.vy = vx, vy
+
+            self.enemies.add(enemy)
+            self._track(enemy, ENEMY)
+            self._show(enemy)
+
+        self.flowfield = FlowField(level.columns, level.rows, self.tiles)
 
-        path = os.path.join("boomber", "resources", "levels", str(level))
-        if not os.path.exists(path):
-            return False
-
-        sprite = self.sfactory.background()
-        Tile(self.world, sprite, start_position, start_position)
-
-        with open(path) as f:
-            y = start_position
-            for line in f:
-                x = start_position
-                for ch in line:
-                    if ch == "x":
-                        sprite = self.sfactory.wall()
-                        Block(self.world, sprite, x, y, False)
-                    elif ch == "b":
-                        sprite = self.sfactory.block()
-                        Block(self.world, sprite, x, y, True)
-                    elif ch == "p":
-                        sprite = self.sfactory.player()
-                        self.player = Player(self.world, sprite, x, y)
-                    elif ch == "e":
-                        vx, vy = velocity.pop(0)
-                        sprite = self.sfactory.enemy()
-                        enemy = Enemy(self.world, sprite, x, y)
-                        enemy.velocity.vx, enemy.velocity.vy = vx, vy
-
-                        right = self.sfactory.tfactory.get_texture("right.png")
-                        left = self.sfactory.tfactory.get_texture("left.png")
-                        down = self.sfactory.tfactory.get_texture("down.png")
-                        up = self.sfactory.tfactory.get_texture("up.png")
-                        enemy.animationdata.right = right
-                        enemy.animationdata.left = left
-                        enemy.animationdata.down = down
-                        enemy.animationdata.up = up
-
-                        self.enemies.append(enemy)
-                    x += tile_size
-                y += tile_size
+        if self.camera is not None:
+            self.camera.target = self.player
+        # What a restore needs to bring back deleted entities.
+        self.roster = snapshot.Roster(self)
         return True
@@ -0,0 +1,67 @@
+"""Describe sprite sheet animations as data.
+
+An Animation says how many frames a sheet has, how long each of them is
+shown and what happens after the last one. SpriteAnimationSystem plays
+it against the tick the animation started on: the frame for every tick
+since then is looked up in a table built once per tick length, so an
+animated sprite costs a subtraction and an index per tick, however many
+of them are running.
+"""
+
+
+class Animation:
+    """frames frames of a sprite sheet, shown duration seconds each.
+
+    Durations are rounded to whole ticks. A looping animation starts
+    over after its last frame. One that plays once is over as soon as
+    its last frame is up: that frame stays for a single tick, then
+    on_finish, if given, is called with the DestroyData of the entity.
+    """
+
+    __slots__ = ("frames", "duration", "loop", "on_finish", "_tables")
+
+    def __init__(self, frames, duration, loop=False, on_finish=None):
+        if frames < 1:
+            raise ValueError("an animation needs at least one frame")
+        self.frames = frames
+        self.duration = duration
+        self.loop = loop
+        self.on_finish = on_finish
+        self._tables = {}
+
+    def __repr__(self):
+        return "Animation(%d frames, %g s%s)" % (
+            self.frames, self.duration, ", loop" if self.loop else "")
+
+    def ticks(self, dt):
+        """Return the number of ticks of dt seconds a frame is shown."""
+
+        return max(1, round(self.duration / dt))
+
+    def table(self, dt):
+        """Return a tuple of the frame to show on every tick since the
+        start, for ticks of dt seconds.
+
+        A looping animation repeats the table, for one that plays once
+        a tick past its end means it is over.
+        """
+
+        table = self._tables.get(dt)
+        if table is None:
+            ticks = self.ticks(dt)
+            length = self.frames * ticks
+            if not self.loop:
+                length -= ticks - 1
+            table = self._tables[dt] = tuple(
+                tick // ticks for tick in range(length))
+        return table
+
+
+def destroy(destroydata):
+    """on_finish that lets the DestroySystem remove the entity."""
+
+    destroydata.is_alive = False
+
+
+EXPLOSION = Animation(12, 0.03, on_finish=destroy)
+"""The flames of a bomb, which burn as long as the animation runs."""
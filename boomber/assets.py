@@ -0,0 +1,203 @@
+"""Decode the images of the game in the background.
+
+Decoding the PNGs is the slow part of loading textures, and it does not
+need the renderer, so `AssetLoader` does it on a pool of threads while
+the window and the map are being set up. Decoded pixels are also kept
+in a cache directory, which turns the next start into a plain read.
+Only uploading a surface into a texture has to happen on the main
+thread; TextureFactory does that when a texture is first needed.
+"""
+
+import concurrent.futures
+import ctypes
+import hashlib
+import os
+import struct
+import threading
+import time
+
+import sdl2
+import sdl2.ext
+
+from sdl2.ext.common import SDLError
+
+from boomber.levels import cache_directory
+from boomber.sprites import RESOURCES
+
+try:
+    from sdl2 import sdlimage
+except ImportError:
+    sdlimage = None
+
+_HEADER = struct.Struct("<4sHIIII")
+_MAGIC = b"BMTX"
+_VERSION = 1
+
+
+class AssetLoader:
+    """Decode the images names into SDL_Surfaces on worker threads.
+
+    Decoding starts right away. `surface` waits for one image and
+    decodes names it was not given on the spot. The surfaces belong to
+    the loader and are freed by `close`.
+
+    Decoded pixels are written to directory, by default a `boomber`
+    directory in the user's cache, keyed by the path, modification time
+    and size of the image. Without a writable directory every start
+    decodes again.
+    """
+
+    def __init__(self, names=(), workers=None, directory=None):
+        if directory is None:
+            directory = cache_directory("textures")
+        self.directory = directory
+        self.created = time.perf_counter()
+
+        self.decoded = {}
+        """Milliseconds a worker spent on every image."""
+        self.cached = set()
+        """Names read from the cache directory instead of decoded."""
+        self.waited = 0.0
+        """Seconds `surface` blocked the caller."""
+
+        # SDL_image sets up its decoders on first use, which is done here
+        # rather than racing on several workers.
+        if sdlimage is not None:
+            sdlimage.IMG_Init(sdlimage.IMG_INIT_PNG)
+        self._lock = threading.Lock()
+        self._surfaces = {}
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            workers, thread_name_prefix="assets")
+        for name in names:
+            self._submit(name)
+
+    def __contains__(self, name):
+        return name in self._surfaces
+
+    def _submit(self, name):
+        with self._lock:
+            if name in self._surfaces:
+                return
+            if self._pool is None:
+                future = concurrent.futures.Future()
+                future.set_result(self._decode(name))
+            else:
+                future = self._pool.submit(self._decode, name)
+            self._surfaces[name] = future
+
+    def surface(self, name):
+        """Return the decoded SDL_Surface of name, waiting for it if it
+        is not ready yet."""
+
+        self._submit(name)
+        start = time.perf_counter()
+        surface = self._surfaces[name].result()
+        self.waited += time.perf_counter() - start
+        return surface
+
+    def wait(self):
+        """Block until every submitted image is decoded."""
+
+        for name in list(self._surfaces):
+            self.surface(name)
+
+    def _compiled(self, path):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        return os.path.join(
+            self.directory,
+            hashlib.sha1(repr(key).encode()).hexdigest() + ".tex")
+
+    def _decode(self, name):
+        start = time.perf_counter()
+        path = RESOURCES.get_path(name)
+        compiled = self._compiled(path)
+        try:
+            surface = _read(compiled)
+            self.cached.add(name)
+        except (OSError, ValueError):
+            surface = sdl2.ext.image.load_image(path)
+            fmt = surface.format.contents
+            if fmt.palette:
+                converted = sdl2.surface.SDL_ConvertSurfaceFormat(
+                    surface, sdl2.pixels.SDL_PIXELFORMAT_RGBA32, 0)
+                sdl2.surface.SDL_FreeSurface(surface)
+                if not converted:
+                    raise SDLError()
+                surface = converted.contents
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                _write(surface, compiled)
+            except OSError:
+                pass
+        self.decoded[name] = (time.perf_counter() - start) * 1000
+        return surface
+
+    def timings(self):
+        """Return the decode milliseconds of every finished image and
+        the total milliseconds the caller waited, under "wait"."""
+
+        result = dict(self.decoded)
+        result["wait"] = self.waited * 1000
+        return result
+
+    def close(self):
+        """Free every surface, names decoded later are decoded again."""
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        for future in self._surfaces.values():
+            if not future.cancelled() and future.exception() is None:
+                sdl2.surface.SDL_FreeSurface(future.result())
+        self._surfaces.clear()
+
+
+def _write(surface, path):
+    """Write the pixels of surface to path, row by row without the
+    padding of its pitch."""
+
+    fmt = surface.format.contents
+    row = surface.w * fmt.BytesPerPixel
+    pixels = ctypes.cast(surface.pixels, ctypes.c_void_p).value
+    tmp = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, surface.w, surface.h,
+                             fmt.BitsPerPixel, fmt.format))
+        sdl2.surface.SDL_LockSurface(surface)
+        try:
+            for y in range(surface.h):
+                f.write(ctypes.string_at(pixels + y * surface.pitch, row))
+        finally:
+            sdl2.surface.SDL_UnlockSurface(surface)
+    os.replace(tmp, path)
+
+
+def _read(path):
+    """Return a new SDL_Surface with the pixels written by `_write`."""
+
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError("%s is not a decoded texture" % path)
+        magic, version, w, h, depth, pixel_format = _HEADER.unpack(header)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("%s is not a decoded texture" % path)
+        row = w * (depth // 8)
+        if os.fstat(f.fileno()).st_size != _HEADER.size + row * h:
+            raise ValueError("%s is truncated" % path)
+
+        surface = sdl2.surface.SDL_CreateRGBSurfaceWithFormat(
+            0, w, h, depth, pixel_format)
+        if not surface:
+            raise SDLError()
+        surface = surface.contents
+        # The file is read straight into the pixels of the surface.
+        pixels = ctypes.cast(surface.pixels, ctypes.c_void_p).value
+        if surface.pitch == row:
+            f.readinto((ctypes.c_char * (row * h)).from_address(pixels))
+        else:
+            for y in range(h):
+                f.readinto((ctypes.c_char * row).from_address(
+                    pixels + y * surface.pitch))
+    return surface
@@ -0,0 +1,123 @@
+"""Pack several textures into one, so a frame can be drawn from a single
+SDL_Texture."""
+
+import ctypes
+
+import sdl2
+import sdl2.ext
+
+from sdl2.ext.common import SDLError
+
+from boomber.sprites import RESOURCES, tile_size
+
+
+padding = 1
+"""Empty pixels kept between two images to avoid filtering bleed."""
+
+
+class TextureAtlas:
+    """One SDL_Texture with a lookup table of image frames.
+
+    `frames` maps an image name to a list of (x, y, w, h) regions inside
+    the atlas texture, one region per animation frame.
+    """
+
+    def __init__(self, texture, size, frames):
+        self.texture = texture
+        self.size = size
+        self.frames = frames
+
+    def __del__(self):
+        if self.texture is not None:
+            sdl2.render.SDL_DestroyTexture(self.texture)
+        self.texture = None
+
+    def frame(self, name, index=0):
+        """Return the region of frame index of image name."""
+
+        return self.frames[name][index or 0]
+
+
+def _pack(sizes, width):
+    """Place sizes on shelves of the given width, tallest first.
+
+    Return a list of positions in the order of sizes and the total height.
+    """
+
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+    positions = [None] * len(sizes)
+    x = y = shelf = 0
+    for i in order:
+        w, h = sizes[i]
+        if x + w > width:
+            x = 0
+            y += shelf + padding
+            shelf = 0
+        positions[i] = x, y
+        x += w + padding
+        shelf = max(shelf, h)
+    return positions, y + shelf
+
+
+def _power_of_two(value):
+    size = 1
+    while size < value:
+        size *= 2
+    return size
+
+
+def _split(x, y, w, h, frame_size):
+    """Cut a horizontal strip of frame_size wide frames into regions."""
+
+    if h == frame_size and w > frame_size and w % frame_size == 0:
+        return [(x + i * frame_size, y, frame_size, frame_size)
+                for i in range(w // frame_size)]
+    return [(x, y, w, h)]
+
+
+def build_atlas(renderer, names, frame_size=tile_size, assets=None):
+    """Load the images names and pack them into a TextureAtlas.
+
+    Images that are exactly frame_size high and a multiple of it wide are
+    split into frames, like the explosion strip. With an AssetLoader as
+    assets the decoded images are taken from it and left to it.
+    """
+
+    if assets is not None:
+        surfaces = [assets.surface(name) for name in names]
+    else:
+        surfaces = [sdl2.ext.image.load_image(RESOURCES.get_path(name))
+                    for name in names]
+    sizes = [(s.w, s.h) for s in surfaces]
+    width = _power_of_two(max(w for w, _ in sizes))
+    positions, height = _pack(sizes, width)
+    height = _power_of_two(height)
+
+    target = sdl2.surface.SDL_CreateRGBSurfaceWithFormat(
+        0, width, height, 32, sdl2.pixels.SDL_PIXELFORMAT_RGBA32)
+    if not target:
+        raise SDLError()
+
+    frames = {}
+    rect = sdl2.rect.SDL_Rect()
+    blend = sdl2.blendmode.SDL_BlendMode()
+    for name, surface, (x, y), (w, h) in zip(names, surfaces,
+                                             positions, sizes):
+        sdl2.surface.SDL_GetSurfaceBlendMode(surface, ctypes.byref(blend))
+        sdl2.surface.SDL_SetSurfaceBlendMode(surface,
+                                             sdl2.blendmode.SDL_BLENDMODE_NONE)
+        rect.x, rect.y, rect.w, rect.h = x, y, w, h
+        sdl2.surface.SDL_BlitSurface(surface, None, target, rect)
+        if assets is not None:
+            # Textures uploaded from the surface take its blend mode.
+            sdl2.surface.SDL_SetSurfaceBlendMode(surface, blend)
+        else:
+            sdl2.surface.SDL_FreeSurface(surface)
+        frames[name] = _split(x, y, w, h, frame_size)
+
+    texture = sdl2.render.SDL_CreateTextureFromSurface(
+        renderer.sdlrenderer, target)
+    sdl2.surface.SDL_FreeSurface(target)
+    if not texture:
+        raise SDLError()
+    return TextureAtlas(texture, (width, height), frames)
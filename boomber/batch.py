@@ -0,0 +1,166 @@
+"""Play many independent games headless on all cores.
+
+Every job is one game of a level with a seed and an enemy AI, run
+without a window for up to a number of ticks in a pool of worker
+processes. Results come back one per game as soon as it ends:
+
+    python -m boomber.batch --level 1 --games 1000 --ai random flow
+
+The games run in this process's children through the dummy video
+driver, so import this module before anything else initialises SDL.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+import time
+
+from boomber import headless
+from boomber import levels
+from boomber.profiling import Profiler
+
+Job = collections.namedtuple(
+    "Job", "level seed ai ticks script store",
+    defaults=("random", 10000, None, False))
+Job.__doc__ = """One game to play.
+
+level is anything Game.create_map accepts that can be pickled, a level
+number, a path or a Level that is not mapped from a file. ai is as in
+create_systems. script is None for a player that stands still or
+"patrol" for headless.patrol_script.
+"""
+
+SCRIPTS = {
+    None: lambda ticks: None,
+    "patrol": headless.patrol_script,
+}
+"""Player inputs a Job can name, built for a number of ticks."""
+
+OUTCOMES = {"you won!": "won", "game over!": "lost"}
+"""Outcome of a result by the message the game stopped with."""
+
+
+def _describe(job):
+    """Return job as a dict that can be written as JSON."""
+
+    described = job._asdict()
+    if not isinstance(job.level, (int, str)):
+        described["level"] = repr(job.level)
+    return described
+
+
+def play(job):
+    """Play job and return its result as a dict.
+
+    The result holds the job, the outcome "won", "lost" or "timeout",
+    the ticks played, the wall time, and the mean and 99th percentile
+    of a tick and the mean of every system in milliseconds.
+    """
+
+    profiler = Profiler()
+    start = time.perf_counter()
+    game = headless.create_game(job.level, store=job.store, ai=job.ai,
+                                seed=job.seed, profiler=profiler,
+                                quiet=True)
+    loaded = time.perf_counter()
+    ticks = game.simulate(job.ticks, SCRIPTS[job.script](job.ticks))
+    end = time.perf_counter()
+
+    summary = profiler.summary()
+    tick = summary.get("tick", {})
+    return {
+        "job": _describe(job),
+        "outcome": OUTCOMES.get(game.outcome, "timeout"),
+        "ticks": ticks,
+        "enemies": len(game.enemies),
+        "load_seconds": loaded - start,
+        "seconds": end - loaded,
+        "tick_ms": tick.get("mean", 0.0),
+        "tick_p99_ms": tick.get("p99", 0.0),
+        "systems": {name: stats["mean"] for name, stats in summary.items()
+                    if name in game.systems},
+    }
+
+
+def run(jobs, workers=None):
+    """Play jobs in workers processes and yield the results as the
+    games end, in no particular order.
+
+    workers defaults to the number of CPUs. A job that raised yields
+    its job and the error instead of a result.
+    """
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(play, job): job for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as error:
+                yield {"job": _describe(futures[future]),
+                       "error": "%s: %s" % (type(error).__name__, error)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--level", type=levels.from_argument, action="append",
+                        help="level number, path or generate:CxRxENEMIES, "
+                             "may be repeated, 1 by default")
+    parser.add_argument("--games", type=int, default=100,
+                        help="games per level and AI, seeded from --seed")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game")
+    parser.add_argument("--ai", choices=("random", "flow"), nargs="+",
+                        default=["random"])
+    parser.add_argument("--ticks", type=int, default=10000,
+                        help="ticks after which a game is a timeout")
+    parser.add_argument("--script", choices=("patrol",),
+                        help="player input, the player stands still "
+                             "without it")
+    parser.add_argument("--store", action="store_true",
+                        help="use the NumPy component store")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes, one per CPU by default")
+    parser.add_argument("--output", metavar="PATH",
+                        help="write one JSON result per line to PATH "
+                             "instead of standard output")
+    args = parser.parse_args()
+
+    jobs = [Job(level, args.seed + game, ai, args.ticks, args.script,
+                args.store)
+            for level in args.level or [1]
+            for ai in args.ai
+            for game in range(args.games)]
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    totals = collections.defaultdict(collections.Counter)
+    start = time.perf_counter()
+    try:
+        for result in run(jobs, args.workers):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            total = totals[result["job"]["ai"]]
+            total[result.get("outcome", "error")] += 1
+            total["ticks"] += result.get("ticks", 0)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    print("%d games in %.2fs with %d workers, %.0f games/s"
+          % (len(jobs), elapsed, args.workers or os.cpu_count(),
+             len(jobs) / elapsed), file=sys.stderr)
+    for ai, total in sorted(totals.items()):
+        games = sum(total[o] for o in ("won", "lost", "timeout", "error"))
+        print("%-6s won %d, lost %d, timeout %d, error %d, "
+              "%.0f ticks/game, %.0f ticks/s"
+              % (ai, total["won"], total["lost"], total["timeout"],
+                 total["error"], total["ticks"] / games,
+                 total["ticks"] / elapsed), file=sys.stderr)
+    return 1 if any(total["error"] for total in totals.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Provide the fixed step simulation clock of the game loop."""
+
+import time
+
+
+class Clock:
+    """Fixed step clock driven by a monotonic high resolution timer.
+
+    `advance` tells how many simulation ticks of length dt are due since
+    the last call, `step` moves the simulation time by one tick and
+    `alpha` is the fraction of a tick left over for interpolation. When
+    the loop falls behind by more than max_ticks, the backlog is dropped
+    instead of being caught up.
+
+    Without frame_rate the loop draws one frame per tick, with it frames
+    are paced independently of the ticks: `frame` tells whether one is
+    due, below the tick rate the loop skips drawing on some ticks and
+    above it draws between them.
+    """
+
+    def __init__(self, tick_rate=100, max_ticks=5, frame_rate=None,
+                 timer=time.perf_counter):
+        self.dt = 1.0 / tick_rate
+        self.max_ticks = max_ticks
+        self.frame_time = 1.0 / frame_rate if frame_rate else None
+        self.timer = timer
+
+        self.time = 0.0
+        self.ticks = 0
+        self.dropped = 0
+
+        self._accumulator = 0.0
+        self._last = None
+        self._next_frame = None
+        self._oversleep = 0.0
+
+    def start(self):
+        self._accumulator = 0.0
+        self._last = self.timer()
+        self._next_frame = self._last
+
+    def advance(self):
+        """Return the number of ticks due since the last call."""
+
+        now = self.timer()
+        self._accumulator += now - self._last
+        self._last = now
+
+        ticks = int(self._accumulator / self.dt)
+        if ticks > self.max_ticks:
+            self.dropped += ticks - self.max_ticks
+            self._accumulator -= (ticks - self.max_ticks) * self.dt
+            ticks = self.max_ticks
+        self._accumulator -= ticks * self.dt
+        return ticks
+
+    def step(self):
+        """Move the simulation time forward by one tick."""
+
+        self.ticks += 1
+        self.time = self.ticks * self.dt
+
+    def frame(self):
+        """Return whether a frame is due and count it as drawn if so."""
+
+        if self.frame_time is None:
+            return True
+        now = self.timer()
+        if now < self._next_frame:
+            return False
+        self._next_frame += self.frame_time
+        # A loop that fell behind does not draw the missed frames.
+        if self._next_frame <= now:
+            self._next_frame = now + self.frame_time
+        return True
+
+    @property
+    def alpha(self):
+        return min(self._accumulator / self.dt, 1.0)
+
+    def wait(self):
+        """Sleep until the next tick or frame is due.
+
+        The sleep is shortened by the average oversleep seen so far and
+        the remainder is spent yielding, which keeps the wake-up close to
+        the deadline without burning a whole core.
+        """
+
+        deadline = self._last + self.dt - self._accumulator
+        if self.frame_time is not None:
+            deadline = min(deadline, self._next_frame)
+        remaining = deadline - self.timer()
+        if remaining <= 0:
+            return
+
+        if remaining > self._oversleep:
+            before = self.timer()
+            time.sleep(remaining - self._oversleep)
+            slept = self.timer() - before
+            error = slept - (remaining - self._oversleep)
+            self._oversleep = max(0.0, 0.9 * self._oversleep + 0.1 * error)
+
+        while self.timer() < deadline:
+            time.sleep(0)
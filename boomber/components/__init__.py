@@ -1,28 +1,36 @@
 """Provides all components of the game."""
 
-import time
+import collections
 
 
 class Velocity:
+    __slots__ = ("vx", "vy")
+
     def __init__(self):
         self.vx = 0
         self.vy = 0
 
 
 class CollisionData:
+    __slots__ = ("x_in_world", "y_in_world", "x", "y")
+
     def __init__(self, x, y):
         self.x_in_world = x
         self.y_in_world = y
 
 
 class Timer:
-    def __init__(self, delta):
-        self.start = time.time()
+    __slots__ = ("delta", "callback", "handle")
+
+    def __init__(self, delta, callback=None):
         self.delta = delta
-        self.callback = None
+        self.callback = callback
+        self.handle = None
 
 
 class DestroyData:
+    __slots__ = ("is_alive", "is_destroyable", "entity")
+
     def __init__(self, is_destroyable=True):
         self.is_alive = True
         self.is_destroyable = is_destroyable
@@ -30,33 +38,84 @@ class DestroyData:
 
 
 class PlayerData:
+    __slots__ = ("max_bombs", "max_range")
+
     def __init__(self):
         self.max_bombs = 1
         self.max_range = 1
 
 
 class AIData:
+    __slots__ = ("choose_direction", "collide_with", "waypoint")
+
+    available_directions = ((3, 0), (0, 3), (-3, 0), (0, -3))
+    """Directions an enemy picks from, shared by every enemy."""
+
     def __init__(self):
-        self.available_directions = [(3, 0), (0, 3), (-3, 0), (0, -3)]
         self.choose_direction = False
         self.collide_with = None
+        self.waypoint = None
 
 
 class ControlData:
+    """Key presses of a player waiting for the ControlSystem.
+
+    actions holds (key, timestamp) pairs, oldest first, the timestamp is
+    the SDL one in milliseconds or None for presses that did not come
+    from an SDL event. No press is dropped, the ControlSystem drains the
+    ones that are due every tick.
+    """
+
+    __slots__ = ("actions", "entity")
+
     def __init__(self):
-        self.event = None
+        self.actions = collections.deque()
+        self.entity = None
 
 
 class AnimationData:
-    def __init__(self):
-        self.right = None
-        self.down = None
-        self.left = None
-        self.up = None
+    """Textures of a walking sprite by direction.
+
+    They are the same for every enemy, so one AnimationData can be
+    shared by all of them.
+    """
+
+    __slots__ = ("right", "down", "left", "up")
+
+    def __init__(self, right=None, down=None, left=None, up=None):
+        self.right = right
+        self.down = down
+        self.left = left
+        self.up = up
 
 
 class SpriteAnimationData:
-    def __init__(self):
-        self.current_frame = 0
-        self.previous_tick = None
-        self.delta = 25
+    """An Animation and the tick it started on, None until it is first
+    shown."""
+
+    __slots__ = ("animation", "start")
+
+    def __init__(self, animation):
+        self.animation = animation
+        self.start = None
+
+
+class Camera:
+    __slots__ = ("x", "y", "width", "height", "target", "bounds")
+
+    def __init__(self, width, height):
+        self.x = 0
+        self.y = 0
+        self.width = width
+        self.height = height
+        self.target = None
+        self.bounds = None
+
+    @property
+    def area(self):
+        """Visible part of the world as left, top, right, bottom."""
+
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+    def to_screen(self, x, y):
+        return x - self.x, y - self.y
@@ -0,0 +1,94 @@
+"""Turn SDL keyboard events into the actions of the local player.
+
+Every key press goes into the player's ControlData.actions with the
+timestamp of its SDL event, so all presses between two ticks are
+applied instead of only the last one, and the Profiler can tell how
+long a press took to show on screen. A held arrow key walks on: after
+`repeat_delay` seconds it is pressed again every `repeat_interval`,
+counted in ticks, so the pace does not depend on the key repeat of the
+system, whose repeated events are ignored.
+"""
+
+import sdl2
+import sdl2.ext
+
+MOVES = (sdl2.SDLK_UP, sdl2.SDLK_DOWN, sdl2.SDLK_LEFT, sdl2.SDLK_RIGHT)
+KEYS = MOVES + (sdl2.SDLK_SPACE,)
+"""Keys the game reacts to."""
+
+
+def due(actions):
+    """Return how many of the queued actions the next tick applies.
+
+    A player moves at most once per tick, so the actions up to and
+    including the first move are due and the ones after it wait for the
+    following ticks.
+    """
+
+    count = 0
+    for key, _ in actions:
+        count += 1
+        if key in MOVES:
+            break
+    return count
+
+
+class Input:
+    """Read the SDL events of a Game into its local player's actions.
+
+    `poll` takes the events that came in, `repeat` presses held moves
+    again and is called before every tick.
+    """
+
+    def __init__(self, game, repeat_delay=0.2, repeat_interval=0.2):
+        self.game = game
+        self.repeat_delay = repeat_delay
+        self.repeat_interval = repeat_interval
+        # Moves held down, the newest last, which is the one that
+        # repeats.
+        self.held = []
+        self._next = None
+
+    def _ticks(self, seconds):
+        return max(1, round(seconds * self.game.tick_rate))
+
+    def poll(self):
+        """Queue the key presses of the pending SDL events."""
+
+        game = self.game
+        for event in sdl2.ext.get_events():
+            if event.type == sdl2.SDL_QUIT:
+                game.running = False
+            elif event.type == sdl2.SDL_KEYDOWN:
+                key = event.key.keysym.sym
+                if key not in KEYS or event.key.repeat:
+                    continue
+                game.press(key, event.key.timestamp)
+                if key in MOVES:
+                    if key in self.held:
+                        self.held.remove(key)
+                    self.held.append(key)
+                    self._next = game.clock.ticks + self._ticks(
+                        self.repeat_delay)
+            elif event.type == sdl2.SDL_KEYUP:
+                key = event.key.keysym.sym
+                if key in self.held:
+                    newest = key == self.held[-1]
+                    self.held.remove(key)
+                    if newest and self.held:
+                        self._next = game.clock.ticks + self._ticks(
+                            self.repeat_interval)
+
+    def repeat(self):
+        """Press the newest held move again if it is due."""
+
+        if not self.held:
+            return
+        game = self.game
+        ticks = game.clock.ticks
+        if ticks < self._next:
+            return
+        self._next = ticks + self._ticks(self.repeat_interval)
+        # Moves still waiting walk the player anyway.
+        if not game.player.controldata.actions:
+            game.press(self.held[-1])
@@ -1,16 +1,46 @@
 """Provides all entities of the game."""
 
+import itertools
+
 import sdl2.ext
 
 from boomber import components
+from boomber.animation import EXPLOSION
+
+_ids = itertools.count(1)
+
+
+class Entity(sdl2.ext.Entity):
+    """sdl2.ext.Entity numbered by a counter instead of a random UUID.
 
+    A UUID takes about a hundred bytes per entity and hashing it runs
+    Python code on every component lookup. Entities here hash by
+    identity instead, like any object that does not define equality.
+    """
 
-class Tile(sdl2.ext.Entity):
+    __hash__ = object.__hash__
+
+    def __new__(cls, world, *args, **kwargs):
+        if not isinstance(world, sdl2.ext.World):
+            raise TypeError("world must be a World")
+        entity = object.__new__(cls)
+        object.__setattr__(entity, "_id", next(_ids))
+        object.__setattr__(entity, "_world", world)
+        world.entities.add(entity)
+        return entity
+
+
+class Tile(Entity):
     def __init__(self, world, sprite, posx, posy):
         self.sprite = sprite
         self.sprite.position = posx, posy
 
 
+class Viewport(Entity):
+    def __init__(self, world, width, height):
+        self.camera = components.Camera(width, height)
+
+
 class Moveable(Tile):
     def __init__(self, world, sprite, posx, posy):
         super(Moveable, self).__init__(world, sprite, posx, posy)
@@ -27,14 +57,17 @@ class Player(Moveable):
 
         self.playerdata = components.PlayerData()
         self.controldata = components.ControlData()
+        self.controldata.entity = self
 
 
 class Enemy(Moveable):
-    def __init__(self, world, sprite, posx, posy):
+    def __init__(self, world, sprite, posx, posy, animationdata=None):
         super(Enemy, self).__init__(world, sprite, posx, posy)
 
         self.aidata = components.AIData()
-        self.animationdata = components.AnimationData()
+        if animationdata is None:
+            animationdata = components.AnimationData()
+        self.animationdata = animationdata
 
 
 class Block(Tile):
@@ -52,15 +85,31 @@ class Bomb(Tile):
 
         self.collisiondata = components.CollisionData(posx, posy)
         self.timer = components.Timer(2)
-        self.timer.callback = "explode"
         self.destroydata = components.DestroyData()
         self.destroydata.entity = self
 
+    def reset(self, posx, posy):
+        """Prepare a pooled bomb for planting at posx, posy."""
+
+        self.sprite.position = posx, posy
+        self.collisiondata.x_in_world = posx
+        self.collisiondata.y_in_world = posy
+        self.timer.handle = None
+        self.destroydata.is_alive = True
+
 
 class Explosion(Tile):
     def __init__(self, world, sprite, posx, posy):
         super(Explosion, self).__init__(world, sprite, posx, posy)
 
-        self.spriteanimationdata = components.SpriteAnimationData()
+        self.spriteanimationdata = components.SpriteAnimationData(EXPLOSION)
         self.destroydata = components.DestroyData()
         self.destroydata.entity = self
+
+    def reset(self, posx, posy):
+        """Prepare a pooled explosion for starting over at posx, posy."""
+
+        self.sprite.position = posx, posy
+        self.sprite.frame = None
+        self.spriteanimationdata.start = None
+        self.destroydata.is_alive = True
@@ -0,0 +1,135 @@
+"""Provide a flow field over the level tiles for steering enemies."""
+
+import array
+import collections
+
+
+class FlowField:
+    """Distance in steps from every free tile to the nearest of some
+    target tiles.
+
+    The field is shared by all enemies, so steering one costs a lookup
+    no matter how many there are. It is computed with a breadth first
+    search when a target moves or a tile was blocked. Opening a tile,
+    as when a block is destroyed, only repairs the distances around it.
+    Tiles are (column, row) pairs as returned by `Game.cell`.
+    """
+
+    directions = ((1, 0), (0, 1), (-1, 0), (0, -1))
+    """Steps to the neighbours of a tile, in order of preference."""
+
+    def __init__(self, columns, rows, blocked=()):
+        self.columns = columns
+        self.rows = rows
+        self.targets = ()
+        self.dirty = True
+        self.blocked = bytearray(columns * rows)
+        self.distance = array.array("i", [-1]) * (columns * rows)
+        for cell in blocked:
+            self.blocked[self._index(cell)] = 1
+
+    def _index(self, cell):
+        return cell[1] * self.columns + cell[0]
+
+    def _inside(self, cell):
+        return 0 <= cell[0] < self.columns and 0 <= cell[1] < self.rows
+
+    def _neighbours(self, index):
+        columns = self.columns
+        column = index % columns
+        if column + 1 < columns:
+            yield index + 1
+        if index + columns < len(self.blocked):
+            yield index + columns
+        if column > 0:
+            yield index - 1
+        if index >= columns:
+            yield index - columns
+
+    def update(self, *targets):
+        """Recompute the field if the targets or the blocked tiles
+        changed."""
+
+        if self.dirty or targets != self.targets:
+            self.compute(*targets)
+
+    def compute(self, *targets):
+        """Run the search from targets over all free tiles."""
+
+        distance = array.array("i", [-1]) * len(self.blocked)
+        self.distance = distance
+        self.targets = targets
+        self.dirty = False
+        starts = []
+        for target in targets:
+            if not self._inside(target):
+                continue
+            start = self._index(target)
+            if distance[start]:
+                distance[start] = 0
+                starts.append(start)
+        self._spread(starts)
+
+    def _spread(self, queue):
+        """Lower the distances reachable from the tiles in queue."""
+
+        distance = self.distance
+        blocked = self.blocked
+        queue = collections.deque(queue)
+        while queue:
+            index = queue.popleft()
+            d = distance[index] + 1
+            for n in self._neighbours(index):
+                if not blocked[n] and (distance[n] < 0 or distance[n] > d):
+                    distance[n] = d
+                    queue.append(n)
+
+    def open(self, cell):
+        """Make cell passable and repair the distances around it."""
+
+        if not self._inside(cell):
+            return
+        index = self._index(cell)
+        if not self.blocked[index]:
+            return
+        self.blocked[index] = 0
+        if self.dirty or not self.targets:
+            return
+        known = [self.distance[n] for n in self._neighbours(index)
+                 if self.distance[n] >= 0]
+        if known:
+            self.distance[index] = min(known) + 1
+            self._spread([index])
+
+    def close(self, cell):
+        """Make cell impassable, the field is recomputed on the next
+        update."""
+
+        if self._inside(cell) and not self.blocked[self._index(cell)]:
+            self.blocked[self._index(cell)] = 1
+            self.dirty = True
+
+    def direction(self, cell):
+        """Return the step from cell towards the nearest target, None at
+        a target or where none can be reached.
+
+        From a blocked tile, such as one a bomb was just planted on, the
+        step leads to the nearest free neighbour.
+        """
+
+        if not self._inside(cell):
+            return None
+        d = self.distance[self._index(cell)]
+        if d == 0:
+            return None
+        best = None
+        for dx, dy in self.directions:
+            n = cell[0] + dx, cell[1] + dy
+            if not self._inside(n):
+                continue
+            nd = self.distance[self._index(n)]
+            if nd >= 0 and (best is None or nd < best[0]):
+                best = nd, (dx, dy)
+        if best is None or (d > 0 and best[0] >= d):
+            return None
+        return best[1]
@@ -0,0 +1,77 @@
+"""Run the game without a window, for benchmarks and automation.
+
+Import this module before anything else initialises SDL, so the dummy
+video driver is picked up.
+"""
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import sdl2  # noqa: E402
+import sdl2.ext  # noqa: E402
+
+from sdl2.ext.common import SDLError  # noqa: E402
+
+from boomber import Game  # noqa: E402
+from boomber import levels  # noqa: E402
+from boomber import systems  # noqa: E402
+
+
+def offscreen_renderer(size=(1335, 900)):
+    """Return a software Renderer drawing into a new SDL_Surface."""
+
+    surface = sdl2.surface.SDL_CreateRGBSurfaceWithFormat(
+        0, size[0], size[1], 32, sdl2.pixels.SDL_PIXELFORMAT_RGBA32)
+    if not surface:
+        raise SDLError()
+    return sdl2.ext.Renderer(surface.contents)
+
+
+def create_game(level=1, render=False, store=False, ai="random", **kwargs):
+    """Return a Game with level loaded that has no window.
+
+    level is anything Game.create_map accepts. With render the full
+    system set draws into an offscreen software renderer, otherwise no
+    renderer and no textures are created at all. store selects the NumPy
+    component store and its vectorized systems, ai the enemy AI as in
+    create_systems. The remaining keyword arguments are passed to Game.
+    """
+
+    target = offscreen_renderer() if render else None
+    game = Game(systems=systems.create_systems(target, store=store, ai=ai),
+                store=store, **kwargs)
+    if not game.create_map(level):
+        raise ValueError("unknown level %r" % (level,))
+    return game
+
+
+def patrol_script(ticks, period=50):
+    """Return a script walking the player around and planting bombs.
+
+    A key is pressed every period ticks. The player plants a bomb next
+    to the top left corner, takes cover below the corner until the
+    flames are out and walks back, so at 100 ticks a second it survives
+    its own bombs.
+    """
+
+    keys = (sdl2.SDLK_RIGHT, sdl2.SDLK_SPACE, sdl2.SDLK_LEFT,
+            sdl2.SDLK_DOWN, None, None, sdl2.SDLK_UP, sdl2.SDLK_RIGHT,
+            sdl2.SDLK_RIGHT, sdl2.SDLK_LEFT, sdl2.SDLK_LEFT)
+    script = {}
+    for tick in range(0, ticks, period):
+        key = keys[(tick // period) % len(keys)]
+        if key is not None:
+            script[tick] = key
+    return script
+
+
+def stress_level(path, columns, rows, enemies, seed=0):
+    """Write a generated level of the given size as text to path.
+
+    See `levels.generate` for the layout.
+    """
+
+    with open(path, "w") as f:
+        f.write(levels.generate(columns, rows, enemies, seed).totext())
+    return path
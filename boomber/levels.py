@@ -0,0 +1,237 @@
+"""Provide parsing, compiling, caching and generation of levels.
+
+A level is a grid of one byte tile codes. The text format uses one line
+per row with the characters in `CHARACTERS`. Compiled levels store the
+same grid after a small header and are memory-mapped when loaded, so a
+cached level costs neither parsing nor a copy.
+"""
+
+import hashlib
+import mmap
+import os
+import random
+import struct
+
+EMPTY = 0
+WALL = 1
+BLOCK = 2
+PLAYER = 3
+ENEMY = 4
+"""Tile codes."""
+
+CHARACTERS = {" ": EMPTY, "x": WALL, "b": BLOCK, "p": PLAYER, "e": ENEMY}
+"""Character of the text format to tile code, unknown characters are
+empty."""
+
+ENEMY_VELOCITIES = ((3, 0), (0, 3))
+"""Start velocities handed out to the enemies of a level in turn."""
+
+LEVELS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      "resources", "levels")
+"""Directory of the numbered levels shipped with the game."""
+
+_HEADER = struct.Struct("<4sHII")
+_MAGIC = b"BMLV"
+_VERSION = 1
+_TABLE = bytes(CHARACTERS.get(chr(i), EMPTY) for i in range(256))
+
+
+class Level:
+    """Grid of columns × rows tile codes stored row by row in data.
+
+    data is any buffer with a `find` method, such as bytes, bytearray or
+    an mmap, and the grid starts at offset.
+    """
+
+    def __init__(self, columns, rows, data, offset=0):
+        if len(data) - offset < columns * rows:
+            raise ValueError("level data is too short for %d×%d tiles" %
+                             (columns, rows))
+        self.columns = columns
+        self.rows = rows
+        self.data = data
+        self.offset = offset
+
+    def __repr__(self):
+        return "Level(%d×%d)" % (self.columns, self.rows)
+
+    def __getitem__(self, cell):
+        column, row = cell
+        return self.data[self.offset + row * self.columns + column]
+
+    def cells(self, code):
+        """Yield the (column, row) of every tile holding code, row by
+        row."""
+
+        data = self.data
+        needle = bytes((code,))
+        start = self.offset
+        end = start + self.columns * self.rows
+        index = data.find(needle, start, end)
+        while index != -1:
+            row, column = divmod(index - start, self.columns)
+            yield column, row
+            index = data.find(needle, index + 1, end)
+
+    def tobytes(self):
+        return bytes(self.data[self.offset:
+                               self.offset + self.columns * self.rows])
+
+    def totext(self):
+        """Return the level in the text format."""
+
+        characters = {code: ch for ch, code in CHARACTERS.items()}
+        grid = self.tobytes()
+        return "".join(
+            "".join(characters[code]
+                    for code in grid[y * self.columns:(y + 1) * self.columns])
+            + "\n" for y in range(self.rows))
+
+
+def parse(text):
+    """Return the Level of text, short lines are padded with empty
+    tiles."""
+
+    lines = text.splitlines()
+    columns = max((len(line) for line in lines), default=0)
+    data = b"".join(line.ljust(columns).encode("latin-1", "replace")
+                    for line in lines)
+    return Level(columns, len(lines), data.translate(_TABLE))
+
+
+def save(level, path):
+    """Write level to path in the compiled format."""
+
+    header = _HEADER.pack(_MAGIC, _VERSION, level.columns, level.rows)
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(level.tobytes())
+    os.replace(tmp, path)
+
+
+def load(path):
+    """Return the Level of a compiled file, mapped into memory."""
+
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(data) < _HEADER.size:
+        raise ValueError("%s is not a compiled level" % path)
+    magic, version, columns, rows = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("%s is not a compiled level" % path)
+    return Level(columns, rows, data, _HEADER.size)
+
+
+def generate(columns, rows, enemies, seed=0, blocks=1 / 3):
+    """Return a walled level of the given size with a grid of pillars.
+
+    The player starts in the top left corner. enemies enemies and the
+    fraction blocks of the remaining free tiles of destructible blocks
+    are spread at random, the same seed gives the same level.
+    """
+
+    if columns < 3 or rows < 3:
+        raise ValueError("a level needs at least 3×3 tiles")
+    rng = random.Random(seed)
+    data = bytearray(columns * rows)
+    free = []
+    for y in range(rows):
+        for x in range(columns):
+            if (x in (0, columns - 1) or y in (0, rows - 1) or
+                    (x % 2 == 0 and y % 2 == 0)):
+                data[y * columns + x] = WALL
+            elif x + y > 4:
+                free.append(y * columns + x)
+    rng.shuffle(free)
+    enemies = min(enemies, len(free))
+    for index in free[:enemies]:
+        data[index] = ENEMY
+    for index in free[enemies:enemies + int((len(free) - enemies) * blocks)]:
+        data[index] = BLOCK
+    data[columns + 1] = PLAYER
+    return Level(columns, rows, data)
+
+
+def from_argument(text):
+    """Return the level a command line argument names.
+
+    text is a level number, generate:CxRxENEMIES for a generated level
+    or the path of a text level.
+    """
+
+    if text.isdigit():
+        return int(text)
+    if text.startswith("generate:"):
+        columns, rows, enemies = map(int, text[9:].split("x"))
+        return generate(columns, rows, enemies)
+    return text
+
+
+def cache_directory(name):
+    """Return the directory name in the `boomber` directory of the
+    user's cache."""
+
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "boomber", name)
+
+
+class LevelCache:
+    """Compile text levels once and keep them for fast switching.
+
+    Levels are kept in memory by source path and modification time.
+    Compiled files are written to directory, by default a `boomber`
+    directory in the user's cache, and reused by later runs as long as
+    the source did not change. Without a writable directory levels are
+    only cached in memory.
+    """
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = cache_directory("levels")
+        self.directory = directory
+        self._levels = {}
+
+    def __len__(self):
+        return len(self._levels)
+
+    def path(self, level):
+        """Return the path of a numbered level or level itself."""
+
+        if isinstance(level, int):
+            return os.path.join(LEVELS, str(level))
+        return level
+
+    def get(self, level):
+        """Return the Level for a level number or a text level path, or
+        None when it does not exist."""
+
+        path = os.path.abspath(self.path(level))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        cached = self._levels.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        compiled = os.path.join(
+            self.directory,
+            hashlib.sha1(repr(key).encode()).hexdigest() + ".lvl")
+        try:
+            result = load(compiled)
+        except (OSError, ValueError):
+            with open(path) as f:
+                result = parse(f.read())
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                save(result, compiled)
+            except OSError:
+                pass
+        self._levels[path] = (key, result)
+        return result
+
+    def clear(self):
+        self._levels.clear()
@@ -0,0 +1,813 @@
+"""Run a game as an authoritative server for players over UDP.
+
+The server plays the level headless on the fixed tick of its Game and
+takes the key presses of up to `MAX_PLAYERS` clients. Every few ticks a
+client gets a snapshot holding only what changed since the last one it
+acknowledged: players, enemies, bombs and explosions that appeared,
+moved or changed their frame, the ones that are gone and the blocks
+that were destroyed. The level itself is sent once, when a client
+joins, so a snapshot grows with what happens and not with the map.
+Clients keep the last snapshots and interpolate between them.
+
+    python -m boomber.net --clients 4 --ticks 2000
+
+plays a match against loopback clients in this process and reports the
+bandwidth and server time of every client, --serve waits for real
+ones instead.
+
+Packets start with their type. Positions are 32 bit pixels, cells are
+32 bit indices into the level and entities 32 bit ids.
+"""
+
+import argparse
+import bisect
+import collections
+import itertools
+import random
+import socket
+import statistics
+import struct
+import sys
+import time
+import zlib
+
+import sdl2
+
+from boomber.levels import BLOCK, Level, from_argument
+from boomber.profiling import RingBuffer, percentile
+from boomber.sprites import tile_size
+
+PROTOCOL = 2
+MAX_PLAYERS = 8
+
+HELLO = 1
+WELCOME = 2
+FULL = 3
+INPUT = 4
+SNAPSHOT = 5
+BYE = 6
+END = 7
+"""Packet types."""
+
+PLAYER = 0
+ENEMY = 1
+BOMB = 2
+EXPLOSION = 3
+"""Kinds of entities in a snapshot."""
+
+KEYS = (sdl2.SDLK_UP, sdl2.SDLK_DOWN, sdl2.SDLK_LEFT, sdl2.SDLK_RIGHT,
+        sdl2.SDLK_SPACE)
+"""Keys a client may press."""
+
+OUTCOMES = (None, "you won!", "game over!")
+"""Outcome of a game by the code of its END packet."""
+
+NO_TICK = 0xFFFFFFFF
+"""Acknowledged tick of a client that has no snapshot yet."""
+
+NO_FRAME = 0xFF
+"""Frame of an explosion that has not started."""
+
+_HELLO = struct.Struct("<BH")
+_WELCOME = struct.Struct("<BBIHIHHHH")
+_INPUT = struct.Struct("<BIB")
+_KEY = struct.Struct("<Ii")
+_SNAPSHOT = struct.Struct("<BIIIIIII")
+_END = struct.Struct("<BB")
+_SPAWNED = "IBiiB"
+_MOVED = "IbbB"
+
+_MAX_INPUTS = 8
+"""Key presses a client sends per packet, the oldest of those the
+server did not confirm yet. It keeps the rest for later packets."""
+
+_SAMPLES = 4096
+"""Tick and round trip times kept for the stats."""
+
+
+class Connection:
+    """A client of a Server, with what it sent and what it cost."""
+
+    def __init__(self, number, address, player, now):
+        self.number = number
+        self.address = address
+        self.player = player
+        self.seen = now
+        self.acked = None
+        """Newest snapshot tick the client confirmed, the baseline of
+        the next delta."""
+        self.inputs = collections.deque()
+        self.last_input = 0
+
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.packets_received = 0
+        self.bytes_received = 0
+        self.snapshots = 0
+        self.largest = 0
+        self.send_seconds = 0.0
+        self.round_trips = RingBuffer(_SAMPLES)
+        self._sent = {}
+
+    def stats(self, seconds):
+        """Return the traffic of the connection as a dict, rates per
+        second over seconds."""
+
+        snapshots = max(self.snapshots, 1)
+        return {
+            "client": self.number,
+            "snapshots": self.snapshots,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "snapshot_bytes": self.bytes_sent / snapshots,
+            "snapshot_bytes_max": self.largest,
+            "down_bytes_per_second": self.bytes_sent / seconds,
+            "up_bytes_per_second": self.bytes_received / seconds,
+            "send_us": self.send_seconds / snapshots * 1e6,
+            "rtt_ms": (statistics.mean(self.round_trips.values()) * 1000
+                       if self.round_trips.count else 0.0),
+        }
+
+
+class Server:
+    """Play game for the clients that join over UDP at address.
+
+    game is a headless Game with its map loaded. The first client takes
+    over the player of the level, every other one gets a player from
+    `Game.add_player`, up to max_players. A snapshot goes out every
+    send_every ticks and the last history of them are kept as
+    baselines. A client that sent nothing for timeout seconds is
+    dropped and its player removed.
+    """
+
+    def __init__(self, game, address=("127.0.0.1", 0),
+                 max_players=MAX_PLAYERS, send_every=5, history=32,
+                 timeout=5.0):
+        self.game = game
+        self.max_players = max_players
+        self.send_every = send_every
+        self.timeout = timeout
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(address)
+        self.socket.setblocking(False)
+        self.address = self.socket.getsockname()
+
+        self.clients = {}
+        self.departed = []
+        self.history = collections.OrderedDict()
+        self._history = history
+        self._numbers = 0
+        self._ids = {}
+        self._next_id = 0
+        # Tick every destroyed block went at by the index of its cell,
+        # which is bounded by the level.
+        self.destroyed = {}
+        self._tiles = len(game.tiles)
+        self._level = zlib.compress(game.level_data.tobytes())
+
+        self.started = time.perf_counter()
+        self.tick_seconds = RingBuffer(_SAMPLES)
+        self.broadcast_seconds = RingBuffer(_SAMPLES)
+        game.running = True
+
+    def _send(self, connection, data):
+        try:
+            self.socket.sendto(data, connection.address)
+        except OSError:
+            return
+        connection.packets_sent += 1
+        connection.bytes_sent += len(data)
+
+    def poll(self):
+        """Handle every packet that arrived."""
+
+        now = time.perf_counter()
+        while True:
+            try:
+                data, address = self.socket.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # A client went away, which some systems report here.
+                continue
+            if not data:
+                continue
+            kind = data[0]
+            connection = self.clients.get(address)
+            if kind == HELLO:
+                self._hello(data, address, now)
+                continue
+            if connection is None:
+                continue
+            connection.seen = now
+            connection.packets_received += 1
+            connection.bytes_received += len(data)
+            if kind == INPUT:
+                self._input(connection, data, now)
+            elif kind == BYE:
+                self.drop(connection)
+
+        for connection in list(self.clients.values()):
+            if now - connection.seen > self.timeout:
+                self.drop(connection)
+
+    def _hello(self, data, address, now):
+        if len(data) < _HELLO.size:
+            return
+        _, protocol = _HELLO.unpack_from(data)
+        if protocol != PROTOCOL:
+            return
+        connection = self.clients.get(address)
+        if connection is None:
+            game = self.game
+            claimed = {id(c.player) for c in self.clients.values()}
+            try:
+                if len(self.clients) >= self.max_players:
+                    raise ValueError("the game is full")
+                if game.player in game.players and \
+                        id(game.player) not in claimed:
+                    player = game.player
+                else:
+                    player = game.add_player()
+            except ValueError:
+                self.socket.sendto(bytes((FULL,)), address)
+                return
+            self._numbers += 1
+            connection = Connection(self._numbers, address, player, now)
+            self.clients[address] = connection
+
+        game = self.game
+        level = game.level_data
+        welcome = _WELCOME.pack(
+            WELCOME, connection.number, self._id(id(connection.player)),
+            game.tick_rate, game.clock.ticks, level.columns, level.rows,
+            game.origin, tile_size)
+        self._send(connection, welcome + self._level)
+
+    def _input(self, connection, data, now):
+        _, acked, count = _INPUT.unpack_from(data)
+        offset = _INPUT.size
+        for _ in range(count):
+            sequence, key = _KEY.unpack_from(data, offset)
+            offset += _KEY.size
+            # Presses are taken in order, one after a gap waits until
+            # the client sends the missing ones again.
+            if sequence == connection.last_input + 1:
+                if key in KEYS:
+                    connection.inputs.append(key)
+                connection.last_input = sequence
+        if acked == NO_TICK:
+            connection.acked = None
+        elif acked in self.history and (connection.acked is None or
+                                        acked > connection.acked):
+            connection.acked = acked
+            sent = connection._sent.pop(acked, None)
+            if sent is not None:
+                connection.round_trips.append(now - sent)
+            for tick in [t for t in connection._sent if t < acked]:
+                del connection._sent[tick]
+
+    def drop(self, connection):
+        """Forget connection and remove its player from the game."""
+
+        if self.clients.pop(connection.address, None) is not None:
+            self.departed.append(connection)
+        player = connection.player
+        if player in self.game.players:
+            self.game.entities_to_delete.add(player)
+
+    def step(self):
+        """Run one tick with the inputs received so far and send the
+        snapshots that are due. Return whether the game goes on."""
+
+        game = self.game
+        self.poll()
+        for connection in self.clients.values():
+            if connection.inputs and connection.player in game.players:
+                for key in connection.inputs:
+                    game.press(key, player=connection.player)
+                connection.inputs.clear()
+
+        start = time.perf_counter()
+        game.tick()
+        self.tick_seconds.append(time.perf_counter() - start)
+
+        if not game.running or game.clock.ticks % self.send_every == 0:
+            self.broadcast()
+        if not game.running:
+            end = _END.pack(END, OUTCOMES.index(game.outcome)
+                            if game.outcome in OUTCOMES else 0)
+            for connection in self.clients.values():
+                self._send(connection, end)
+        return game.running
+
+    def serve(self, ticks=None):
+        """Run the game in real time until it ends or ticks ran."""
+
+        clock = self.game.clock
+        end = None if ticks is None else clock.ticks + ticks
+        clock.start()
+        while self.game.running and (end is None or clock.ticks < end):
+            for _ in range(clock.advance()):
+                if not self.step() or clock.ticks == end:
+                    break
+            clock.wait()
+
+    def _id(self, key, ids=None):
+        """Return the id of the entity known by key in snapshots."""
+
+        number = self._ids.get(key)
+        if number is None:
+            self._next_id = (self._next_id + 1) & 0xFFFF
+            number = self._next_id
+            self._ids[key] = number
+        if ids is not None:
+            ids[key] = number
+        return number
+
+    def state(self):
+        """Return {id: (kind, x, y, frame)} of the players, enemies,
+        bombs and explosions in the game.
+
+        Players and enemies are known by the entity. Bombs and
+        explosions also by their position, a pooled one that comes back
+        elsewhere is a new entity to the clients. The frame of an enemy
+        is the direction it faces.
+        """
+
+        game = self.game
+        roster = game.roster
+        index = roster.index
+        parts = roster.parts
+        ids = {}
+        state = {}
+        for player in game.players:
+            sprite = player.sprite
+            state[self._id(id(player), ids)] = (PLAYER, sprite.x, sprite.y,
+                                                0)
+        for enemy in game.enemies:
+            sprite, _, _, textures = parts[index[id(enemy)]]
+            texture = sprite.texture
+            facing = 0
+            for i, candidate in enumerate(textures):
+                if texture is candidate:
+                    facing = i
+                    break
+            state[self._id(id(enemy), ids)] = (ENEMY, sprite.x, sprite.y,
+                                               facing)
+        for bomb in game.bombs:
+            x, y = bomb.sprite.position
+            state[self._id((id(bomb), x, y), ids)] = (BOMB, x, y, 0)
+        for explosion in game.explosion_area:
+            sprite = explosion.sprite
+            x, y = sprite.position
+            frame = NO_FRAME if sprite.frame is None else sprite.frame
+            state[self._id((id(explosion), x, y), ids)] = (EXPLOSION, x, y,
+                                                           frame)
+        self._ids = ids
+        return state
+
+    def _blocks(self, tick):
+        """Log the blocks destroyed since the last call."""
+
+        game = self.game
+        tiles = game.tiles
+        if len(tiles) == self._tiles:
+            return
+        self._tiles = len(tiles)
+        columns = game.level_data.columns
+        destroyed = self.destroyed
+        for cell, block in game.roster.blocks:
+            if tiles.get(cell) is not block:
+                destroyed.setdefault(cell[1] * columns + cell[0], tick)
+
+    def broadcast(self):
+        """Send every client the changes since its baseline."""
+
+        start = time.perf_counter()
+        tick = self.game.clock.ticks
+        self._blocks(tick)
+        state = self.state()
+        self.history[tick] = state
+        while len(self.history) > self._history:
+            self.history.popitem(last=False)
+        self.broadcast_seconds.append(time.perf_counter() - start)
+
+        # Clients on the same baseline get the same delta.
+        bodies = {}
+        for connection in self.clients.values():
+            mark = time.perf_counter()
+            baseline = connection.acked
+            if baseline not in self.history:
+                baseline = None
+            body = bodies.get(baseline)
+            if body is None:
+                body = bodies[baseline] = self._delta(state, baseline)
+            counts, payload = body
+            data = _SNAPSHOT.pack(
+                SNAPSHOT, tick, NO_TICK if baseline is None else baseline,
+                connection.last_input, *counts) + payload
+            self._send(connection, data)
+            connection._sent[tick] = mark
+            # Snapshots older than the history are never acknowledged.
+            if len(connection._sent) > self._history:
+                del connection._sent[next(iter(connection._sent))]
+            connection.snapshots += 1
+            connection.largest = max(connection.largest, len(data))
+            connection.send_seconds += time.perf_counter() - mark
+
+    def _delta(self, state, baseline):
+        """Return the counts and packed records of what changed in state
+        since the snapshot of tick baseline, everything without one."""
+
+        if baseline is None:
+            base = {}
+            cells = list(self.destroyed)
+        else:
+            base = self.history[baseline]
+            cells = [cell for cell, tick in self.destroyed.items()
+                     if tick > baseline]
+
+        spawned = []
+        moved = []
+        for number, now in state.items():
+            was = base.get(number)
+            if was == now:
+                continue
+            kind, x, y, frame = now
+            if was is not None and was[0] == kind:
+                dx, dy = x - was[1], y - was[2]
+                if -128 <= dx < 128 and -128 <= dy < 128:
+                    moved.extend((number, dx, dy, frame))
+                    continue
+            spawned.extend((number, kind, x, y, frame))
+        removed = [number for number in base if number not in state]
+
+        counts = (len(cells), len(removed), len(spawned) // 5,
+                  len(moved) // 4)
+        payload = b"".join((
+            struct.pack("<%dI" % len(cells), *cells),
+            struct.pack("<%dI" % len(removed), *removed),
+            struct.pack("<" + _SPAWNED * counts[2], *spawned),
+            struct.pack("<" + _MOVED * counts[3], *moved)))
+        return counts, payload
+
+    def stats(self):
+        """Return the tick times of the server and the traffic of every
+        client, also those that left, as a dict, times in
+        milliseconds."""
+
+        seconds = max(time.perf_counter() - self.started, 1e-9)
+        ticks = sorted(self.tick_seconds.values()) or [0.0]
+        broadcasts = self.broadcast_seconds.values()
+        return {
+            "ticks": self.tick_seconds.count,
+            "seconds": seconds,
+            "tick_ms": statistics.mean(ticks) * 1000,
+            "tick_p99_ms": percentile(ticks, 99) * 1000,
+            "broadcast_ms": (statistics.mean(broadcasts) * 1000
+                             if broadcasts else 0.0),
+            "clients": [c.stats(seconds) for c in
+                        self.departed + list(self.clients.values())],
+        }
+
+    def close(self):
+        self.socket.close()
+
+
+class Client:
+    """Join the Server at address and follow its snapshots.
+
+    `connect` says hello, `poll` handles what arrived and `press` sends
+    a key for the client's player. states holds the entities of the
+    last history snapshots by tick, as `Server.state` returns them, and
+    blocks the cells of the blocks still standing. With loss, that
+    share of the packets in either direction is dropped, which tests
+    how the deltas cope.
+    """
+
+    def __init__(self, address, history=32, loss=0.0, seed=None):
+        self.server = address
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.number = None
+        self.player = None
+        self.tick_rate = None
+        self.level = None
+        self.origin = 0
+        self.tile_size = 0
+        self.blocks = set()
+        self.states = collections.OrderedDict()
+        self.latest = None
+        self.received_at = None
+        self.full = False
+        self.outcome = None
+        self.ended = False
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+        self._history = history
+        self._acked = None
+        self._sequence = 0
+        self._pending = collections.deque()
+        self._loss = loss
+        self._rng = random.Random(seed)
+
+    @property
+    def joined(self):
+        return self.number is not None
+
+    def _send(self, data):
+        if self._loss and self._rng.random() < self._loss:
+            return
+        try:
+            self.socket.sendto(data, self.server)
+        except OSError:
+            return
+        self.bytes_sent += len(data)
+
+    def connect(self):
+        """Ask the server for a player, repeat until `joined`."""
+
+        self._send(_HELLO.pack(HELLO, PROTOCOL))
+
+    def press(self, key):
+        """Send key as pressed by the player on the server's next tick."""
+
+        self._sequence += 1
+        self._pending.append((self._sequence, key))
+        self._send_input()
+
+    def _send_input(self):
+        acked = NO_TICK if self._acked is None else self._acked
+        pending = list(itertools.islice(self._pending, _MAX_INPUTS))
+        data = [_INPUT.pack(INPUT, acked, len(pending))]
+        for sequence, key in pending:
+            data.append(_KEY.pack(sequence, key))
+        self._send(b"".join(data))
+
+    def poll(self):
+        """Handle every packet that arrived and return the ticks of the
+        snapshots decoded."""
+
+        decoded = []
+        while True:
+            try:
+                data, _ = self.socket.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                continue
+            if not data or (self._loss and
+                            self._rng.random() < self._loss):
+                continue
+            self.bytes_received += len(data)
+            kind = data[0]
+            if kind == WELCOME:
+                self._welcome(data)
+            elif kind == FULL:
+                self.full = True
+            elif kind == SNAPSHOT and self.joined:
+                tick = self._snapshot(data)
+                if tick is not None:
+                    decoded.append(tick)
+            elif kind == END:
+                self.ended = True
+                self.outcome = OUTCOMES[_END.unpack_from(data)[1]]
+        if decoded:
+            self._send_input()
+        return decoded
+
+    def _welcome(self, data):
+        (_, self.number, self.player, self.tick_rate, _, columns, rows,
+         self.origin, self.tile_size) = _WELCOME.unpack_from(data)
+        if self.level is None:
+            self.level = Level(columns, rows,
+                               zlib.decompress(data[_WELCOME.size:]))
+            self.blocks = set(self.level.cells(BLOCK))
+
+    def _snapshot(self, data):
+        (_, tick, baseline, last_input, cells, removed, spawned,
+         moved) = _SNAPSHOT.unpack_from(data)
+        if self.latest is not None and tick <= self.latest:
+            return None
+        if baseline == NO_TICK:
+            state = {}
+        elif baseline in self.states:
+            state = dict(self.states[baseline])
+        else:
+            # The baseline is gone, ask for everything again.
+            self._acked = None
+            return None
+
+        offset = _SNAPSHOT.size
+        columns = self.level.columns
+        for cell in struct.unpack_from("<%dI" % cells, data, offset):
+            self.blocks.discard((cell % columns, cell // columns))
+        offset += 4 * cells
+        for number in struct.unpack_from("<%dI" % removed, data, offset):
+            state.pop(number, None)
+        offset += 4 * removed
+        values = struct.unpack_from("<" + _SPAWNED * spawned, data, offset)
+        for i in range(0, len(values), 5):
+            state[values[i]] = values[i + 1:i + 5]
+        offset += struct.calcsize("<" + _SPAWNED) * spawned
+        values = struct.unpack_from("<" + _MOVED * moved, data, offset)
+        for i in range(0, len(values), 4):
+            number, dx, dy, frame = values[i:i + 4]
+            kind, x, y, _ = state[number]
+            state[number] = kind, x + dx, y + dy, frame
+
+        self.states[tick] = state
+        while len(self.states) > self._history:
+            self.states.popitem(last=False)
+        self.latest = tick
+        self.received_at = time.perf_counter()
+        self._acked = tick
+        while self._pending and self._pending[0][0] <= last_input:
+            self._pending.popleft()
+        return tick
+
+    def render_tick(self, delay=None):
+        """Return the server tick to draw now, delay ticks behind the
+        newest snapshot, by default two snapshots' worth."""
+
+        if self.latest is None:
+            return None
+        ticks = list(self.states)
+        if delay is None:
+            delay = 2 * (ticks[-1] - ticks[-2]) if len(ticks) > 1 else 0
+        elapsed = (time.perf_counter() - self.received_at) * self.tick_rate
+        return self.latest + min(elapsed, delay) - delay
+
+    def sample(self, tick):
+        """Return the entities at a fractional server tick, interpolated
+        between the snapshots around it.
+
+        Entities that only the later snapshot has are left out, frames
+        are those of the earlier one.
+        """
+
+        ticks = list(self.states)
+        if not ticks:
+            return {}
+        i = bisect.bisect_right(ticks, tick)
+        if i == 0:
+            return dict(self.states[ticks[0]])
+        if i == len(ticks):
+            return dict(self.states[ticks[-1]])
+        before, after = ticks[i - 1], ticks[i]
+        t = (tick - before) / (after - before)
+        old, new = self.states[before], self.states[after]
+        sampled = {}
+        for number, (kind, x, y, frame) in old.items():
+            then = new.get(number)
+            if then is not None and then[0] == kind:
+                x = round(x + (then[1] - x) * t)
+                y = round(y + (then[2] - y) * t)
+            sampled[number] = kind, x, y, frame
+        return sampled
+
+    def close(self):
+        """Leave the server."""
+
+        self._send(bytes((BYE,)))
+        self.socket.close()
+
+
+class _Bot:
+    """Client that walks in a random direction and plants bombs."""
+
+    def __init__(self, client, seed):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.key = None
+        self.mismatches = 0
+
+    def update(self, server):
+        client = self.client
+        if not client.joined:
+            client.connect()
+        for tick in client.poll():
+            if client.states[tick] != server.history.get(tick):
+                self.mismatches += 1
+        if client.joined:
+            if self.key is None or self.rng.random() < 0.05:
+                self.key = self.rng.choice(KEYS)
+            client.press(self.key)
+            if self.key == sdl2.SDLK_SPACE:
+                self.key = None
+
+
+def loopback(game, clients, ticks, send_every=5, fast=False, loss=0.0,
+             seed=0, immortal=False):
+    """Play game on a Server against clients bots on this machine.
+
+    Return the server stats with the mismatches of every client, the
+    snapshots it decoded that differ from what the server sent. With
+    immortal no player dies, which keeps a long measurement going.
+    """
+
+    server = Server(game, send_every=send_every)
+    bots = [_Bot(Client(server.address, loss=loss, seed=seed + i),
+                 seed + i) for i in range(clients)]
+    clock = game.clock
+    end = clock.ticks + ticks
+    clock.start()
+    try:
+        while game.running and clock.ticks < end:
+            for _ in range(1 if fast else clock.advance()):
+                for bot in bots:
+                    bot.update(server)
+                if immortal:
+                    for player in game.players:
+                        player.destroydata.is_destroyable = False
+                if not server.step() or clock.ticks == end:
+                    break
+            if not fast:
+                clock.wait()
+        for bot in bots:
+            bot.update(server)
+        stats = server.stats()
+    finally:
+        for bot in bots:
+            bot.client.close()
+        server.close()
+    mismatches = {bot.client.number: bot.mismatches for bot in bots}
+    for client in stats["clients"]:
+        client["mismatches"] = mismatches.get(client["client"], 0)
+    return stats
+
+
+def report(stats):
+    print("%d ticks in %.2fs, tick %.3f ms, p99 %.3f ms, state %.3f ms"
+          % (stats["ticks"], stats["seconds"], stats["tick_ms"],
+             stats["tick_p99_ms"], stats["broadcast_ms"]))
+    for client in stats["clients"]:
+        print("client %d: %d snapshots, %.0f B mean, %d B max, "
+              "%.0f B/s down, %.0f B/s up, send %.1f us, rtt %.2f ms%s"
+              % (client["client"], client["snapshots"],
+                 client["snapshot_bytes"], client["snapshot_bytes_max"],
+                 client["down_bytes_per_second"],
+                 client["up_bytes_per_second"], client["send_us"],
+                 client["rtt_ms"],
+                 ", %d mismatches" % client["mismatches"]
+                 if "mismatches" in client else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--level", type=from_argument, default=1,
+                        help="level number, path or generate:CxRxENEMIES")
+    parser.add_argument("--ai", choices=("random", "flow"), default="random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tick-rate", type=int, default=100)
+    parser.add_argument("--send-rate", type=int, default=20,
+                        help="snapshots per second")
+    parser.add_argument("--ticks", type=int,
+                        help="stop after this many ticks")
+    parser.add_argument("--serve", metavar="HOST:PORT",
+                        help="wait for clients at HOST:PORT instead of "
+                             "playing against loopback ones")
+    parser.add_argument("--clients", type=int, default=4,
+                        help="loopback clients to play against")
+    parser.add_argument("--fast", action="store_true",
+                        help="run the loopback match as fast as possible")
+    parser.add_argument("--loss", type=float, default=0.0,
+                        help="share of loopback packets to drop")
+    parser.add_argument("--immortal", action="store_true",
+                        help="loopback players cannot die, for long "
+                             "measurements")
+    args = parser.parse_args()
+
+    # Imported here, headless switches SDL to the dummy video driver.
+    from boomber import headless
+
+    game = headless.create_game(args.level, ai=args.ai, seed=args.seed,
+                                tick_rate=args.tick_rate, quiet=True)
+    send_every = max(1, args.tick_rate // args.send_rate)
+
+    if args.serve:
+        host, _, port = args.serve.rpartition(":")
+        server = Server(game, (host or "0.0.0.0", int(port)),
+                        send_every=send_every)
+        print("serving on %s:%d" % server.address, file=sys.stderr)
+        try:
+            server.serve(args.ticks)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        print(game.outcome or "stopped")
+        report(server.stats())
+        return 0
+
+    stats = loopback(game, args.clients, args.ticks or 2000, send_every,
+                     args.fast, args.loss, args.seed, args.immortal)
+    print(game.outcome or "timeout")
+    report(stats)
+    return 1 if any(c["mismatches"] for c in stats["clients"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Provide pools that recycle entities instead of rebuilding them."""
+
+
+class EntityPool:
+    """Park released entities with their components for later reuse.
+
+    A released entity is removed from the world, but its components,
+    sprite and texture references are kept, so acquiring it again only
+    puts them back. factory builds a new entity when the pool is empty.
+    At most limit entities are parked, the rest are dropped.
+    """
+
+    def __init__(self, world, factory, limit=None):
+        self.world = world
+        self.factory = factory
+        self.limit = limit
+
+        self.created = 0
+        self.reused = 0
+        self.active = 0
+        self.high_water = 0
+
+        self._parked = []
+        self._components = {}
+
+    def __len__(self):
+        return len(self._parked)
+
+    def warm(self, count):
+        """Build entities until count of them are parked."""
+
+        while len(self._parked) < count:
+            entity = self.factory()
+            self.created += 1
+            self.active += 1
+            self.release(entity)
+
+    def acquire(self):
+        """Return a parked entity back in the world, or a new one."""
+
+        if self._parked:
+            entity = self._parked.pop()
+            components = self.world.components
+            for ctype, component in self._components.pop(entity):
+                components[ctype][entity] = component
+            self.world.entities.add(entity)
+            self.reused += 1
+        else:
+            entity = self.factory()
+            self.created += 1
+        self.active += 1
+        self.high_water = max(self.high_water, self.active)
+        return entity
+
+    def release(self, entity):
+        """Take entity out of the world and park it."""
+
+        if entity in self._components:
+            return
+        self.active -= 1
+        if self.limit is not None and len(self._parked) >= self.limit:
+            self.world.delete(entity)
+            return
+        self._components[entity] = [
+            (ctype, components[entity])
+            for ctype, components in self.world.components.items()
+            if entity in components]
+        self.world.delete(entity)
+        self._parked.append(entity)
+
+    def stats(self):
+        """Return the pool counters as a dict."""
+
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "active": self.active,
+            "parked": len(self._parked),
+            "high_water": self.high_water,
+        }
@@ -0,0 +1,349 @@
+"""Provide low-overhead timing of the systems, frames and input latency.
+
+A Profiler keeps the last `capacity` samples of every series in ring
+buffers, so it can stay enabled while playing. Attach one to a Game to
+fill it, then ask for `summary`, `histogram` or `hitches`, `dump` it to
+CSV or Chrome trace JSON (chrome://tracing, Perfetto), or draw it with
+an Overlay.
+"""
+
+import array
+import bisect
+import csv
+import ctypes
+import json
+import time
+
+import sdl2
+
+from boomber.world import World
+
+
+class RingBuffer:
+    """Fixed size buffer of floats that overwrites its oldest values."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self._values = array.array("d", [0.0]) * capacity
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, value):
+        self._values[self.count % self.capacity] = value
+        self.count += 1
+
+    def last(self):
+        if not self.count:
+            return None
+        return self._values[(self.count - 1) % self.capacity]
+
+    def values(self):
+        """Return the stored values, oldest first."""
+
+        if self.count <= self.capacity:
+            return self._values[:self.count].tolist()
+        start = self.count % self.capacity
+        return (self._values[start:] + self._values[:start]).tolist()
+
+
+def percentile(ordered, p):
+    """Return the p-th percentile of a sorted list, None if it is
+    empty."""
+
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Profiler:
+    """Durations in milliseconds of named sections, per tick or frame.
+
+    Besides the sections, it records the entity count of every component
+    type once per tick, and as the "latency" section the time from an
+    input event to the presented frame that shows its effect. The
+    individual sections of the last `capacity` ticks are kept with their
+    start time for `hitches` and the trace dump.
+    """
+
+    def __init__(self, capacity=1024, timer=time.perf_counter):
+        self.capacity = capacity
+        self.timer = timer
+        self.series = {}
+        self.counts = {}
+        self.tick = 0
+
+        self._origin = timer()
+        self._names = []
+        self._index = {}
+        self._events = 0
+        # Room for 16 sections per tick.
+        size = 16 * capacity
+        self._event_name = array.array("H", [0]) * size
+        self._event_tick = array.array("L", [0]) * size
+        self._event_start = array.array("d", [0.0]) * size
+        self._event_duration = array.array("d", [0.0]) * size
+        self._inputs = []
+
+    def record(self, name, start, end):
+        """Add a section that ran from start to end, in timer seconds."""
+
+        duration = (end - start) * 1000
+        buffer = self.series.get(name)
+        if buffer is None:
+            buffer = self.series[name] = RingBuffer(self.capacity)
+            self._index[name] = len(self._names)
+            self._names.append(name)
+        buffer.append(duration)
+
+        slot = self._events % len(self._event_name)
+        self._event_name[slot] = self._index[name]
+        self._event_tick[slot] = self.tick
+        self._event_start[slot] = start - self._origin
+        self._event_duration[slot] = duration
+        self._events += 1
+
+    def count(self, world):
+        """Record how many entities have each component type."""
+
+        for ctype, components in world.components.items():
+            buffer = self.counts.get(ctype.__name__)
+            if buffer is None:
+                buffer = self.counts[ctype.__name__] = RingBuffer(
+                    self.capacity)
+            buffer.append(len(components))
+
+    def input(self, timestamp, tick=None):
+        """Note an input event with its SDL timestamp in milliseconds.
+
+        tick is the first tick whose frame shows what the input did,
+        without it the next presented frame does.
+        """
+
+        self._inputs.append((timestamp, tick))
+
+    def presented(self, tick=None):
+        """Record the latency of the pending inputs the frame just
+        presented shows, the frame of tick or any frame without it."""
+
+        if not self._inputs:
+            return
+        now = self.timer()
+        ticks = sdl2.SDL_GetTicks()
+        pending = []
+        for timestamp, shown in self._inputs:
+            if tick is None or shown is None or shown <= tick:
+                self.record("latency", now - (ticks - timestamp) / 1000, now)
+            else:
+                pending.append((timestamp, shown))
+        self._inputs = pending
+
+    def summary(self):
+        """Return count, mean, p50, p90, p99 and max of every series."""
+
+        result = {}
+        for name, buffer in self.series.items():
+            ordered = sorted(buffer.values())
+            if not ordered:
+                continue
+            result[name] = {
+                "count": len(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "p50": percentile(ordered, 50),
+                "p90": percentile(ordered, 90),
+                "p99": percentile(ordered, 99),
+                "max": ordered[-1],
+            }
+        return result
+
+    def histogram(self, name, edges=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25)):
+        """Return (upper edge, count) pairs of series name in ms, the
+        last bucket has an upper edge of None."""
+
+        buckets = [0] * (len(edges) + 1)
+        for value in self.series[name].values():
+            buckets[bisect.bisect_left(edges, value)] += 1
+        return list(zip(tuple(edges) + (None,), buckets))
+
+    def events(self):
+        """Return the kept sections as (tick, name, start, ms) tuples,
+        oldest first."""
+
+        size = len(self._event_name)
+        first = max(0, self._events - size)
+        return [(self._event_tick[i % size],
+                 self._names[self._event_name[i % size]],
+                 self._event_start[i % size],
+                 self._event_duration[i % size])
+                for i in range(first, self._events)]
+
+    def hitches(self, budget, section="tick"):
+        """Return the ticks whose section took longer than budget ms.
+
+        Each hitch is (tick, ms, name, ms) of the section and of the
+        slowest section that ran inside it.
+        """
+
+        per_tick = {}
+        for tick, name, start, duration in self.events():
+            per_tick.setdefault(tick, []).append((name, start, duration))
+        found = []
+        for tick, sections in per_tick.items():
+            outer = [(s, d) for n, s, d in sections if n == section]
+            if not outer or outer[0][1] <= budget:
+                continue
+            begin, total = outer[0]
+            end = begin + total / 1000
+            inner = [(d, n) for n, s, d in sections
+                     if n != section and begin <= s and s + d / 1000 <= end]
+            slowest, name = max(inner) if inner else (0.0, None)
+            found.append((tick, total, name, slowest))
+        return found
+
+    def dump(self, path):
+        """Write the kept sections to path, as Chrome trace JSON if it
+        ends with .json and as CSV otherwise."""
+
+        if path.endswith(".json"):
+            trace = [{"name": name, "ph": "X", "pid": 0,
+                      "tid": 1 if name == "latency" else 0,
+                      "ts": start * 1e6, "dur": duration * 1000,
+                      "args": {"tick": tick}}
+                     for tick, name, start, duration in self.events()]
+            with open(path, "w") as f:
+                json.dump({"traceEvents": trace,
+                           "displayTimeUnit": "ms"}, f)
+            return
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("tick", "section", "start_s", "ms"))
+            writer.writerows(self.events())
+
+
+class ProfiledWorld(World):
+    """World that records the time every system takes in a Profiler.
+
+    Systems are named by `names`, a dict of id(system) to name, and by
+    their class name otherwise.
+    """
+
+    def __init__(self, profiler):
+        super().__init__()
+        self.profiler = profiler
+        self.names = {}
+
+    def process(self):
+        profiler = self.profiler
+        timer = profiler.timer
+        components = self.components
+        for system in self._systems:
+            name = self.names.get(id(system))
+            if name is None:
+                name = self.names[id(system)] = type(system).__name__
+            start = timer()
+            if getattr(system, "is_applicator", False):
+                comps = self.combined_components(system.componenttypes)
+                system.process(self, comps)
+            else:
+                for ctype in system.componenttypes:
+                    system.process(self, components[ctype].values())
+            profiler.record(name, start, timer())
+
+
+_GLYPHS = {
+    "a": 0o25755, "b": 0o65656, "c": 0o34443, "d": 0o65556, "e": 0o74647,
+    "f": 0o74644, "g": 0o34553, "h": 0o55755, "i": 0o72227, "j": 0o11152,
+    "k": 0o55655, "l": 0o44447, "m": 0o57755, "n": 0o65555, "o": 0o25552,
+    "p": 0o65644, "q": 0o25563, "r": 0o65655, "s": 0o34216, "t": 0o72222,
+    "u": 0o55557, "v": 0o55552, "w": 0o55775, "x": 0o55255, "y": 0o55222,
+    "z": 0o71247, "0": 0o75557, "1": 0o26227, "2": 0o61247, "3": 0o61216,
+    "4": 0o55711, "5": 0o74616, "6": 0o34757, "7": 0o71222, "8": 0o75757,
+    "9": 0o75716, "_": 0o00007, "-": 0o00700,
+}
+"""3×5 pixel glyphs of the Overlay labels, a row per octal digit from
+the top, the highest bit of a row on the left."""
+
+
+def _label(text, x, y):
+    """Return an array of the SDL_Rects of the pixels of text drawn with
+    its top left corner at x, y."""
+
+    rects = []
+    for i, char in enumerate(text.lower()):
+        glyph = _GLYPHS.get(char, 0)
+        for row in range(5):
+            bits = glyph >> 3 * (4 - row)
+            for column in range(3):
+                if bits & (4 >> column):
+                    rects.append(sdl2.rect.SDL_Rect(x + 4 * i + column,
+                                                    y + row, 1, 1))
+    return (sdl2.rect.SDL_Rect * len(rects))(*rects)
+
+
+class Overlay:
+    """Draw a bar per section of a Profiler over the frame.
+
+    Bars grow to the right with the last duration of the section, one
+    budget ms spanning `width` pixels, and a tick marks the p99 of the
+    kept samples, refreshed every `refresh` frames. The bars keep the
+    order in which the sections were first recorded, the name of every
+    section is written right of its bar in the same color.
+    """
+
+    colors = ((230, 80, 60), (240, 170, 40), (90, 200, 90), (60, 160, 230),
+              (170, 110, 230), (230, 110, 190), (120, 220, 220))
+
+    def __init__(self, profiler, budget=10.0, width=200, bar=6,
+                 origin=(8, 8), refresh=30):
+        self.profiler = profiler
+        self.budget = budget
+        self.width = width
+        self.bar = bar
+        self.origin = origin
+        self.refresh = refresh
+        self._rect = sdl2.rect.SDL_Rect()
+        self._frames = 0
+        self._p99 = {}
+        self._labels = {}
+
+    def __call__(self, renderer):
+        series = self.profiler.series
+        if self._frames % self.refresh == 0:
+            self._p99 = {name: percentile(sorted(buffer.values()), 99)
+                         for name, buffer in series.items()}
+        self._frames += 1
+
+        previous = [ctypes.c_uint8() for _ in range(4)]
+        sdl2.render.SDL_GetRenderDrawColor(renderer,
+                                           *map(ctypes.byref, previous))
+        rect = self._rect
+        x, y = self.origin
+        scale = self.width / self.budget
+        fill = sdl2.render.SDL_RenderFillRect
+        color = sdl2.render.SDL_SetRenderDrawColor
+
+        labels = self._labels
+        text = x + self.width + 4
+        rect.x, rect.y = x - 4, y - 4
+        rect.w = self.width + 12 + 4 * max(map(len, series), default=0)
+        rect.h = len(series) * (self.bar + 2) + 6
+        color(renderer, 0, 0, 0, 255)
+        fill(renderer, rect)
+        for i, (name, buffer) in enumerate(series.items()):
+            rect.x, rect.y = x, y + i * (self.bar + 2)
+            rect.w = min(self.width, max(1, int(buffer.last() * scale)))
+            rect.h = self.bar
+            color(renderer, *self.colors[i % len(self.colors)], 255)
+            fill(renderer, rect)
+            label = labels.get((name, i))
+            if label is None:
+                label = labels[name, i] = _label(name, text, rect.y)
+            sdl2.render.SDL_RenderFillRects(renderer, label, len(label))
+            p99 = self._p99.get(name)
+            if p99 is not None:
+                rect.x = x + min(self.width, int(p99 * scale))
+                rect.w = 1
+                color(renderer, 255, 255, 255, 255)
+                fill(renderer, rect)
+        color(renderer, *(c.value for c in previous))
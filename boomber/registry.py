@@ -0,0 +1,44 @@
+"""Provide sets of entities with a stable iteration order."""
+
+
+class Registry:
+    """Insertion ordered set of entities of one kind.
+
+    Adding, removing and membership tests are O(1) and adding an entity
+    twice keeps it once. Iterating yields the entities in the order they
+    were first added; like a set, the registry must not change while it
+    is iterated.
+    """
+
+    def __init__(self, kind, entities=()):
+        self.kind = kind
+        self._entities = {}
+        for entity in entities:
+            self.add(entity)
+
+    def __repr__(self):
+        return "Registry(%s, %d entities)" % (self.kind.__name__,
+                                              len(self._entities))
+
+    def __len__(self):
+        return len(self._entities)
+
+    def __iter__(self):
+        return iter(self._entities)
+
+    def __contains__(self, entity):
+        return entity in self._entities
+
+    def add(self, entity):
+        if not isinstance(entity, self.kind):
+            raise TypeError("expected %s, got %r" % (self.kind.__name__,
+                                                     entity))
+        self._entities[entity] = None
+
+    def discard(self, entity):
+        """Remove entity if it is registered."""
+
+        self._entities.pop(entity, None)
+
+    def clear(self):
+        self._entities.clear()
@@ -0,0 +1,262 @@
+"""Record the inputs of a game and replay them headless at full speed.
+
+A recording holds the seed, tick rate, enemy AI, whether the component
+store was used and the level of a game followed by
+the keys applied on every tick that had some, plus a hash of the game
+state every `checkpoint` ticks. Replaying presses the keys again through
+`Game.tick` and compares the hashes, so a
+captured session doubles as a reproducible benchmark workload:
+
+    python -m boomber.replay session.bmr
+"""
+
+import argparse
+import hashlib
+import itertools
+import struct
+import sys
+import time
+import zlib
+
+from boomber.controls import due
+from boomber.levels import Level
+from boomber.systems import FlowAIController
+
+_MAGIC = b"BMRC"
+_VERSION = 2
+_HEADER = struct.Struct("<4sHHQIIBB")
+_HEADER_1 = struct.Struct("<4sHHQII")
+_LENGTH = struct.Struct("<I")
+_RECORD = struct.Struct("<BI")
+_KEY = struct.Struct("<i")
+
+INPUT = 1
+CHECKPOINT = 2
+END = 3
+"""Kinds of records following the header."""
+
+AIS = ("random", "flow")
+"""Enemy AIs by their code in the header."""
+
+
+def game_ai(game):
+    """Return the name of the enemy AI game runs, as create_systems
+    takes it."""
+
+    if isinstance(game.systems.get("ai_system"), FlowAIController):
+        return "flow"
+    return "random"
+
+
+def state_hash(game):
+    """Return 8 bytes summing up the positions and lives of the game."""
+
+    digest = hashlib.blake2b(digest_size=8)
+    pack = struct.Struct("<iiB").pack
+    if game.player is not None:
+        digest.update(pack(game.player.sprite.x, game.player.sprite.y,
+                           game.player.destroydata.is_alive))
+    for entities in (game.enemies, game.bombs, game.explosion_area):
+        digest.update(_LENGTH.pack(len(entities)))
+        for entity in entities:
+            digest.update(pack(entity.sprite.x, entity.sprite.y,
+                               entity.destroydata.is_alive))
+    digest.update(_LENGTH.pack(len(game.tiles)))
+    return digest.digest()
+
+
+class Recorder:
+    """Write the inputs of a Game to path.
+
+    Pass it to Game as recorder. The header is written on the first
+    tick, when the level is known; `close` ends the recording.
+    """
+
+    def __init__(self, path, checkpoint=100):
+        self.checkpoint = checkpoint
+        self.ticks = 0
+        self._file = open(path, "wb")
+        self._started = False
+
+    def tick(self, game):
+        """Log the keys the tick game is about to run applies."""
+
+        f = self._file
+        if not self._started:
+            level = game.level_data
+            grid = zlib.compress(level.tobytes())
+            f.write(_HEADER.pack(_MAGIC, _VERSION, game.tick_rate,
+                                 game.seed, level.columns, level.rows,
+                                 AIS.index(game_ai(game)),
+                                 game.store is not None))
+            f.write(_LENGTH.pack(len(grid)))
+            f.write(grid)
+            self._started = True
+
+        tick = game.clock.ticks
+        actions = game.player.controldata.actions
+        for key, _ in itertools.islice(actions, due(actions)):
+            f.write(_RECORD.pack(INPUT, tick))
+            f.write(_KEY.pack(key))
+        if tick % self.checkpoint == 0:
+            f.write(_RECORD.pack(CHECKPOINT, tick))
+            f.write(state_hash(game))
+        self.ticks = tick + 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write(_RECORD.pack(END, self.ticks))
+        self._file.close()
+
+
+class Recording:
+    """Contents of a recording file.
+
+    ai and store are None for recordings of the first version, which did
+    not keep them.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version = struct.unpack_from("<4sH", data)
+        if magic != _MAGIC or version not in (1, _VERSION):
+            raise ValueError("%s is not a recording" % path)
+        if version == 1:
+            header = _HEADER_1
+            (_, _, self.tick_rate, self.seed, columns,
+             rows) = header.unpack_from(data)
+            self.ai = self.store = None
+        else:
+            header = _HEADER
+            (_, _, self.tick_rate, self.seed, columns, rows, ai,
+             store) = header.unpack_from(data)
+            self.ai = AIS[ai]
+            self.store = bool(store)
+        offset = header.size
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        self.level = Level(columns, rows,
+                           zlib.decompress(data[offset:offset + length]))
+        offset += length
+
+        self.inputs = {}
+        self.checkpoints = {}
+        self.ticks = None
+        while offset < len(data):
+            kind, tick = _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            if kind == INPUT:
+                self.inputs.setdefault(tick, []).extend(
+                    _KEY.unpack_from(data, offset))
+                offset += _KEY.size
+            elif kind == CHECKPOINT:
+                self.checkpoints[tick] = data[offset:offset + 8]
+                offset += 8
+            elif kind == END:
+                self.ticks = tick
+                break
+            else:
+                raise ValueError("%s is corrupt at byte %d" % (path, offset))
+        if self.ticks is None:
+            # The game did not end cleanly, replay what was written.
+            self.ticks = max(list(self.inputs) + list(self.checkpoints),
+                             default=-1) + 1
+
+
+class Replayer:
+    """Stand in for a Recorder that plays a Recording back.
+
+    Every tick it presses the recorded keys and compares the state at
+    the checkpoints; the ticks that did not match end up in
+    `mismatches`.
+    """
+
+    def __init__(self, recording):
+        self.recording = recording
+        self.checked = 0
+        self.mismatches = []
+
+    def tick(self, game):
+        tick = game.clock.ticks
+        for key in self.recording.inputs.get(tick, ()):
+            game.press(key)
+        expected = self.recording.checkpoints.get(tick)
+        if expected is not None:
+            self.checked += 1
+            if state_hash(game) != expected:
+                self.mismatches.append(tick)
+
+
+def replay(path, render=False, store=None, ai=None, **kwargs):
+    """Replay the recording at path as fast as possible.
+
+    Return a dict with the ticks run, the time taken, the number of
+    checkpoints compared and the ticks whose state did not match. The
+    AI and store are those of the recording, passing others raises a
+    ValueError; they are only needed for recordings that do not say.
+    The other arguments are passed to headless.create_game and have to
+    match the recorded game.
+    """
+
+    # Imported here, headless switches SDL to the dummy video driver,
+    # which must not happen to a game that records.
+    from boomber import headless
+
+    recording = Recording(path)
+    for name, given, recorded in (("ai", ai, recording.ai),
+                                  ("store", store, recording.store)):
+        if given is not None and recorded is not None and given != recorded:
+            raise ValueError("%s was recorded with %s=%r, not %r"
+                             % (path, name, recorded, given))
+    if recording.ai is not None:
+        ai, store = recording.ai, recording.store
+    ai = ai or "random"
+    store = bool(store)
+    replayer = Replayer(recording)
+    game = headless.create_game(recording.level, render=render, store=store,
+                                ai=ai, seed=recording.seed,
+                                tick_rate=recording.tick_rate,
+                                recorder=replayer, **kwargs)
+    start = time.perf_counter()
+    ticks = game.simulate(recording.ticks, render=render)
+    elapsed = time.perf_counter() - start
+    return {
+        "ticks": ticks,
+        "seconds": elapsed,
+        "ticks_per_second": ticks / elapsed if elapsed else 0.0,
+        "checkpoints": replayer.checked,
+        "mismatches": replayer.mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording")
+    parser.add_argument("--render", action="store_true",
+                        help="also draw every tick offscreen")
+    parser.add_argument("--store", action="store_true", default=None,
+                        help="use the NumPy component store, only for "
+                             "recordings that do not say")
+    parser.add_argument("--ai", choices=AIS,
+                        help="enemy AI, only for recordings that do not "
+                             "say")
+    args = parser.parse_args()
+
+    try:
+        result = replay(args.recording, args.render, args.store, args.ai)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    print("%d ticks in %.2fs, %.0f ticks/s, %d checkpoints, %d mismatches"
+          % (result["ticks"], result["seconds"], result["ticks_per_second"],
+             result["checkpoints"], len(result["mismatches"])))
+    if result["mismatches"]:
+        print("first mismatch at tick %d" % result["mismatches"][0])
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Provide deadline scheduling of callbacks on the simulation clock."""
+
+import heapq
+import itertools
+
+
+class Timeout:
+    """Handle of a callback scheduled with `Scheduler.schedule`."""
+
+    def __init__(self, scheduler, callback, args):
+        self.scheduler = scheduler
+        self.callback = callback
+        self.args = args
+        self.deadline = None
+        self.remaining = None
+        self._seq = None
+
+    @property
+    def pending(self):
+        """Whether the callback is still going to run."""
+
+        return self._seq is not None or self.remaining is not None
+
+    def cancel(self):
+        """Drop the callback, it will not run."""
+
+        self._seq = None
+        self.remaining = None
+
+    def pause(self):
+        """Stop the countdown until `resume` is called."""
+
+        if self._seq is not None:
+            self.remaining = self.deadline - self.scheduler.time
+            self._seq = None
+
+    def resume(self):
+        """Continue a paused countdown where it stopped."""
+
+        if self.remaining is not None:
+            remaining, self.remaining = self.remaining, None
+            self.scheduler._push(self, self.scheduler.time + remaining)
+
+
+class Scheduler:
+    """Min-heap of deadlines on the simulation time of clock.
+
+    `run` calls every callback whose deadline has passed and only looks
+    at the due entries, so its cost does not depend on how many timers
+    are waiting. Cancelled and paused timeouts are dropped lazily when
+    they reach the top of the heap. While the scheduler is paused its
+    time stands still and nothing runs.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.time = 0.0
+        self.paused = False
+        self._last = None
+        self._heap = []
+        self._seq = itertools.count()
+
+    def __len__(self):
+        """Number of heap entries, including not yet dropped stale
+        ones."""
+
+        return len(self._heap)
+
+    def schedule(self, delay, callback, *args):
+        """Call callback(*args) delay seconds from now, return a
+        Timeout."""
+
+        timeout = Timeout(self, callback, args)
+        self._push(timeout, self.time + delay)
+        return timeout
+
+    def schedule_at(self, deadline, callback, *args):
+        """Call callback(*args) when the time reaches deadline, return a
+        Timeout."""
+
+        timeout = Timeout(self, callback, args)
+        self._push(timeout, deadline)
+        return timeout
+
+    def _push(self, timeout, deadline):
+        timeout.deadline = deadline
+        timeout._seq = next(self._seq)
+        heapq.heappush(self._heap, (timeout.deadline, timeout._seq, timeout))
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def run(self):
+        """Advance to the clock's time and run what is due, return the
+        number of callbacks run."""
+
+        now = self.clock.time
+        if self._last is not None and not self.paused:
+            self.time += now - self._last
+        self._last = now
+        if self.paused:
+            return 0
+
+        heap = self._heap
+        ran = 0
+        while heap and heap[0][0] <= self.time:
+            _, seq, timeout = heapq.heappop(heap)
+            if timeout._seq != seq:
+                continue
+            timeout._seq = None
+            timeout.callback(*timeout.args)
+            ran += 1
+        return ran
+
+    def pending(self):
+        """Return the timeouts counting down, in the order they run.
+
+        Paused timeouts are not among them.
+        """
+
+        return [timeout for _, seq, timeout in sorted(self._heap)
+                if timeout._seq == seq]
+
+    def state(self):
+        """Return the time of the scheduler, the clock time it last ran
+        at and whether it is paused, for `restore`."""
+
+        return self.time, self._last, self.paused
+
+    def restore(self, state):
+        """Put back the time returned by `state`.
+
+        The timeouts are not part of it, they are scheduled again by the
+        caller.
+        """
+
+        self.time, self._last, self.paused = state
+
+    def clear(self):
+        for _, _, timeout in self._heap:
+            timeout.cancel()
+        self._heap = []
@@ -0,0 +1,535 @@
+"""Save the state of a running game into a small binary blob and put it
+back.
+
+A snapshot holds what changes while a level is played: the player, the
+enemies, which blocks are left, the planted bombs and the explosions
+with their timers and frames, the random state and the clocks. What
+the level itself defines, like walls and the background, is only
+checked by a checksum. Only the local player is saved, so `take` refuses
+a game that still has players added with `Game.add_player`, like the
+one of a multiplayer Server. Snapshots are taken between ticks, so
+none of the entities are waiting for deletion:
+
+    data = snapshot.take(game)
+    ...
+    snapshot.restore(game, data)
+
+After a restore the game runs on exactly as it did after the snapshot
+was taken, so a snapshot serves for quick saves, crash recovery and
+rolling back to resimulate from an earlier tick.
+"""
+
+import array
+import math
+import os
+import struct
+import zlib
+
+import sdl2.ext
+
+from boomber.entities import Bomb
+from boomber.scheduler import Timeout
+from boomber.sprites import BLOCKS, STATIC
+from boomber.store import ENEMY, PLAYER
+
+_HEADER = struct.Struct("<4sHIIddBBB")
+_MAGIC = b"BMSN"
+_VERSION = 3
+_COUNT = struct.Struct("<I")
+_STATE = struct.Struct("<16s16sIQ")
+
+_PLAYER = 1
+_CAMERA = 2
+_STORE = 4
+"""Flags of the parts a snapshot contains."""
+
+_OUTCOMES = (None, "you won!", "game over!")
+
+_ENEMY_FIELDS = 13
+_POOLED_FIELDS = 5
+
+_BOMB = 0
+_EXPLOSION = 1
+"""Kinds of pooled entities."""
+
+_GRID_PLAYER = 0
+_GRID_ENEMY = 1
+_GRID_POOLED = 2
+
+
+class Roster:
+    """Entities and components a level was built with.
+
+    Game keeps one from `create_map`, so entities deleted since can be
+    brought back by a restore, with their components in the order the
+    world had them.
+    """
+
+    def __init__(self, game):
+        world = game.world
+        self.layout = {}
+        self.components = {}
+        for ctype, components in world.components.items():
+            self.layout[ctype] = list(components)
+            for entity, component in components.items():
+                self.components.setdefault(entity, {})[ctype] = component
+        self.tiles = list(game.tiles.items())
+        self.blocks = [(cell, tile) for cell, tile in self.tiles
+                       if tile.destroydata.is_destroyable]
+        self.enemies = list(game.enemies)
+        # Lookups while taking a snapshot go by id and the components
+        # of the enemies are kept at hand, which saves a world lookup
+        # per component every tick.
+        self.index = {id(enemy): i for i, enemy in enumerate(self.enemies)}
+        self.parts = [None] * len(self.enemies)
+        for enemy in self.enemies:
+            self.update(enemy)
+        self.player = game.player
+        self.checksum = zlib.crc32(game.level_data.tobytes())
+
+    def update(self, enemy):
+        """Pick up the components of enemy, after a store swapped them."""
+
+        animation = enemy.animationdata
+        self.parts[self.index[id(enemy)]] = (
+            enemy.sprite, enemy.velocity, enemy.aidata,
+            (animation.right, animation.down, animation.left, animation.up))
+
+
+def _ints(values):
+    data = array.array("i", values)
+    return _COUNT.pack(len(data)) + data.tobytes()
+
+
+def _doubles(values):
+    data = array.array("d", values)
+    return _COUNT.pack(len(data)) + data.tobytes()
+
+
+def _blob(data):
+    return _COUNT.pack(len(data)) + data
+
+
+def _optional(value):
+    return math.nan if value is None else value
+
+
+def _pooled(game):
+    """Return the planted bombs and the explosions in the order they
+    were taken from their pools, which is their order in the world."""
+
+    bombs = game.bombs
+    explosions = game.explosion_area
+    wanted = len(bombs) + len(explosions)
+    found = []
+    if wanted:
+        # Pooled entities are the last ones added, so the world's sprites
+        # are searched from the end.
+        for entity in reversed(game.world.components[sdl2.ext.Sprite]):
+            if entity in bombs or entity in explosions:
+                found.append(entity)
+                if len(found) == wanted:
+                    break
+    found.reverse()
+    return found
+
+
+def take(game):
+    """Return the state of game as bytes.
+
+    Raise ValueError if game has other players than the local one.
+    """
+
+    roster = game.roster
+    scheduler = game.scheduler
+    player = game.player
+    if any(other is not player for other in game.players):
+        raise ValueError("only games of a single player can be saved")
+    flags = 0
+    parts = []
+
+    version, state, gauss = game.rng.getstate()
+    parts.append(_ints((version,)))
+    parts.append(_blob(array.array("I", state).tobytes()))
+    parts.append(_doubles((_optional(gauss),)))
+
+    if player is not None and player in game.world.entities:
+        flags |= _PLAYER
+        sprite = player.sprite
+        collision = player.collisiondata
+        # The keys still queued follow, without their timestamps.
+        parts.append(_ints((
+            sprite.x, sprite.y,
+            getattr(collision, "x", sprite.x),
+            getattr(collision, "y", sprite.y),
+            player.velocity.vx, player.velocity.vy,
+            player.playerdata.max_bombs, player.playerdata.max_range) +
+            tuple(key for key, _ in player.controldata.actions)))
+
+    enemies = []
+    slots = {}
+    index = roster.index
+    components = roster.parts
+    for i, enemy in enumerate(game.enemies):
+        slots[id(enemy)] = i
+        number = index[id(enemy)]
+        sprite, velocity, aidata, textures = components[number]
+        collide = aidata.collide_with
+        waypoint = aidata.waypoint
+        texture = sprite.texture
+        facing = 0
+        for j, candidate in enumerate(textures):
+            if texture is candidate:
+                facing = j
+                break
+        enemies.extend((
+            number, sprite.x, sprite.y,
+            velocity.vx, velocity.vy,
+            bool(aidata.choose_direction),
+            collide is not None, *(collide or (0, 0)),
+            waypoint is not None, *(waypoint or (0, 0)),
+            facing))
+    parts.append(_ints(enemies))
+
+    # A block leaves the tiles when it is deleted.
+    tiles = game.tiles
+    parts.append(_blob(bytes(tiles.get(cell) is block
+                             for cell, block in roster.blocks)))
+
+    pooled = _pooled(game)
+    indices = {}
+    ints = []
+    doubles = []
+    bombs = [e for e in pooled if isinstance(e, Bomb)]
+    # Bombs are scheduled again in the order they go off, paused ones
+    # last.
+    order = {timeout: i for i, timeout in enumerate(scheduler.pending())}
+    rank = {e: i for i, e in enumerate(sorted(
+        bombs, key=lambda e: order.get(e.timer.handle, len(order))))}
+    for i, entity in enumerate(pooled):
+        indices[id(entity)] = i
+        sprite = entity.sprite
+        if isinstance(entity, Bomb):
+            handle = entity.timer.handle
+            paused = handle.remaining is not None
+            ints.extend((_BOMB, sprite.x, sprite.y, rank[entity], paused))
+            doubles.append(handle.remaining if paused else handle.deadline)
+        else:
+            start = entity.spriteanimationdata.start
+            frame = sprite.frame
+            ints.extend((_EXPLOSION, sprite.x, sprite.y,
+                         -1 if frame is None else frame,
+                         -1 if start is None else start))
+            # Explosions count in ticks and need no timing.
+            doubles.append(0.0)
+    parts.append(_ints(ints))
+    parts.append(_doubles(doubles))
+
+    grid = []
+    for entity, _ in game.grid._entries.values():
+        key = id(entity)
+        if entity is player:
+            grid.extend((_GRID_PLAYER, 0))
+        elif key in slots:
+            grid.extend((_GRID_ENEMY, slots[key]))
+        else:
+            grid.extend((_GRID_POOLED, indices[key]))
+    parts.append(_ints(grid))
+
+    if game.camera is not None:
+        flags |= _CAMERA
+        parts.append(_ints((game.camera.x, game.camera.y)))
+
+    store = game.store
+    if store is not None:
+        flags |= _STORE
+        rows = [-1 if entity is player else slots[id(entity)]
+                for entity in store.entities]
+        parts.append(_ints(rows))
+        bits = store.rng.bit_generator.state
+        parts.append(_STATE.pack(
+            bits["state"]["state"].to_bytes(16, "little"),
+            bits["state"]["inc"].to_bytes(16, "little"),
+            bits["has_uint32"], bits["uinteger"]))
+
+    time, last, paused = scheduler.state()
+    header = _HEADER.pack(
+        _MAGIC, _VERSION, roster.checksum, game.clock.ticks,
+        time, _optional(last), paused,
+        _OUTCOMES.index(game.outcome) if game.outcome in _OUTCOMES else 0,
+        flags)
+    return header + b"".join(parts)
+
+
+class _Reader:
+    def __init__(self, data, offset):
+        self.data = data
+        self.offset = offset
+
+    def blob(self):
+        (length,) = _COUNT.unpack_from(self.data, self.offset)
+        start = self.offset + _COUNT.size
+        self.offset = start + length
+        if self.offset > len(self.data):
+            raise ValueError("snapshot is truncated")
+        return self.data[start:self.offset]
+
+    def ints(self):
+        (length,) = _COUNT.unpack_from(self.data, self.offset)
+        return array.array("i", self._take(length * 4))
+
+    def doubles(self):
+        (length,) = _COUNT.unpack_from(self.data, self.offset)
+        return array.array("d", self._take(length * 8))
+
+    def _take(self, size):
+        start = self.offset + _COUNT.size
+        self.offset = start + size
+        if self.offset > len(self.data):
+            raise ValueError("snapshot is truncated")
+        return self.data[start:self.offset]
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+
+def _none(value):
+    return None if math.isnan(value) else value
+
+
+def restore(game, data):
+    """Put game back into the state data was taken from.
+
+    game has to play the level the snapshot was taken of.
+    """
+
+    if len(data) < _HEADER.size:
+        raise ValueError("not a snapshot")
+    (magic, version, checksum, ticks, time, last, paused, outcome,
+     flags) = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("not a snapshot")
+    roster = game.roster
+    if checksum != roster.checksum:
+        raise ValueError("snapshot of a different level")
+    reader = _Reader(data, _HEADER.size)
+
+    (rng_version,) = reader.ints()
+    state = tuple(array.array("I", reader.blob()))
+    (gauss,) = reader.doubles()
+    player = reader.ints() if flags & _PLAYER else None
+    enemies = reader.ints()
+    blocks = reader.blob()
+    pooled = reader.ints()
+    timings = reader.doubles()
+    grid = reader.ints()
+    camera = reader.ints() if flags & _CAMERA else None
+    if flags & _STORE:
+        rows = reader.ints()
+        bits = reader.unpack(_STATE)
+
+    world = game.world
+    store = game.store
+    scheduler = game.scheduler
+
+    # Bombs and explosions go back to their pools, the ones of the
+    # snapshot are taken out again below.
+    for entity in _pooled(game):
+        game.grid.remove(entity.sprite)
+        if isinstance(entity, Bomb):
+            entity.timer.handle.cancel()
+            game.bomb_pool.release(entity)
+        else:
+            game.explosion_pool.release(entity)
+    game.bombs.clear()
+    game.owners.clear()
+    game.explosion_area.clear()
+    game.bomb_cells.clear()
+    game.flames.clear()
+    game.entities_to_delete.clear()
+    scheduler.clear()
+    if store is not None:
+        for entity in reversed(list(store.entities)):
+            store.remove(entity)
+
+    # Level entities that were deleted since come back, those that are
+    # gone in the snapshot are deleted.
+    alive = {roster.enemies[enemies[i]]
+             for i in range(0, len(enemies), _ENEMY_FIELDS)}
+    alive.update(block for (_, block), left in zip(roster.blocks, blocks)
+                 if left)
+    if player is not None:
+        alive.add(roster.player)
+    removable = set(roster.enemies)
+    removable.update(block for _, block in roster.blocks)
+    removable.add(roster.player)
+    present = world.entities
+    revived = [e for e in removable if e in alive and e not in present]
+    removed = [e for e in removable if e not in alive and e in present]
+    for entity in removed:
+        game.grid.remove(entity.sprite)
+    world.delete_entities(removed)
+    if revived:
+        _revive(world, roster, revived, removable, alive)
+        for entity in revived:
+            entity.destroydata.is_alive = True
+    if revived or removed:
+        game.tiles = {cell: tile for cell, tile in roster.tiles
+                      if tile not in removable or tile in alive}
+
+    kinds = pooled[0::_POOLED_FIELDS]
+    entities = [game.bomb_pool.acquire() if kind == _BOMB
+                else game.explosion_pool.acquire() for kind in kinds]
+
+    game.clock.ticks = ticks
+    game.clock.time = ticks * game.clock.dt
+    scheduler.restore((time, _none(last), bool(paused)))
+    game.rng.setstate((rng_version, state, _none(gauss)))
+    game.outcome = _OUTCOMES[outcome]
+    game.running = game.outcome is None
+    game._previous = {}
+
+    # A dead player stays the game's player, as after a game over.
+    game.player = roster.player
+    game.players.clear()
+    if player is not None:
+        game.players.add(game.player)
+        (x, y, cx, cy, vx, vy, max_bombs, max_range) = player[:8]
+        sprite = game.player.sprite
+        sprite.x, sprite.y = x, y
+        game.player.velocity.vx, game.player.velocity.vy = vx, vy
+        actions = game.player.controldata.actions
+        actions.clear()
+        actions.extend((key, None) for key in player[8:])
+        game.player.playerdata.max_bombs = max_bombs
+        game.player.playerdata.max_range = max_range
+
+    order = []
+    game.enemies.clear()
+    for i in range(0, len(enemies), _ENEMY_FIELDS):
+        (index, x, y, vx, vy) = enemies[i:i + 5]
+        facing = enemies[i + _ENEMY_FIELDS - 1]
+        enemy = roster.enemies[index]
+        order.append(enemy)
+        game.enemies.add(enemy)
+        sprite, velocity, _, textures = roster.parts[index]
+        sprite.x, sprite.y = x, y
+        sprite.texture = textures[facing]
+        velocity.vx, velocity.vy = vx, vy
+
+    handles = {}
+    for i, entity in enumerate(entities):
+        (kind, x, y, a, b) = pooled[i * _POOLED_FIELDS:
+                                    (i + 1) * _POOLED_FIELDS]
+        cell = game.cell(x, y)
+        if kind == _BOMB:
+            entity.reset(x, y)
+            handles[a] = entity, bool(b), timings[i]
+            game.bombs.add(entity)
+            game.owners[entity] = game.player.playerdata
+            game.bomb_cells[cell] = entity
+        else:
+            entity.reset(x, y)
+            entity.sprite.frame = None if a < 0 else a
+            entity.spriteanimationdata.start = None if b < 0 else b
+            game.explosion_area.add(entity)
+            game.flames[cell] = entity
+    for _, (bomb, paused, value) in sorted(handles.items()):
+        timer = bomb.timer
+        if paused:
+            timer.handle = Timeout(scheduler, timer.callback, (bomb,))
+            timer.handle.remaining = value
+        else:
+            timer.handle = scheduler.schedule_at(value, timer.callback, bomb)
+
+    if store is not None:
+        for row in rows:
+            if row < 0:
+                store.add(game.player, PLAYER)
+            else:
+                store.add(order[row], ENEMY)
+                roster.update(order[row])
+        state, inc, has_uint32, uinteger = bits
+        store.rng.bit_generator.state = {
+            "bit_generator": store.rng.bit_generator.state["bit_generator"],
+            "state": {"state": int.from_bytes(state, "little"),
+                      "inc": int.from_bytes(inc, "little")},
+            "has_uint32": has_uint32, "uinteger": uinteger}
+
+    # These go through the components, which write into the store for
+    # stored entities, and the store gives enemies new AI components.
+    if player is not None:
+        game.player.collisiondata.x = player[2]
+        game.player.collisiondata.y = player[3]
+    for i in range(0, len(enemies), _ENEMY_FIELDS):
+        (index, _, _, _, _, choose, has_collide, cwx, cwy, has_waypoint,
+         wpx, wpy, _) = enemies[i:i + _ENEMY_FIELDS]
+        aidata = roster.parts[index][2]
+        aidata.choose_direction = bool(choose)
+        aidata.collide_with = (cwx, cwy) if has_collide else None
+        aidata.waypoint = (wpx, wpy) if has_waypoint else None
+
+    game.grid.clear()
+    for i in range(0, len(grid), 2):
+        kind, index = grid[i], grid[i + 1]
+        if kind == _GRID_PLAYER:
+            entity = game.player
+        elif kind == _GRID_ENEMY:
+            entity = order[index]
+        else:
+            entity = entities[index]
+        game.grid.insert(entity.sprite, entity)
+
+    game.flowfield = type(game.flowfield)(
+        game.flowfield.columns, game.flowfield.rows,
+        list(game.tiles) + list(game.bomb_cells))
+
+    if camera is not None and game.camera is not None:
+        game.camera.x, game.camera.y = camera
+    if game.scene is not None:
+        game.scene.clear()
+        for entity, sprite in world.components[sdl2.ext.Sprite].items():
+            game.scene.insert(sprite, entity)
+    if game.renderer is not None:
+        game.renderer.invalidate(STATIC)
+        game.renderer.invalidate(BLOCKS)
+
+
+def _revive(world, roster, revived, removable, alive):
+    """Put revived back into the world with the components they were
+    built with, in the order the world had them."""
+
+    ctypes = set()
+    for entity in revived:
+        ctypes.update(roster.components[entity])
+        world.entities.add(entity)
+    for ctype in ctypes:
+        components = world.components[ctype]
+        head = [(entity, components.get(entity,
+                                        roster.components[entity][ctype]))
+                for entity in roster.layout[ctype]
+                if entity not in removable or entity in alive]
+        known = set(roster.layout[ctype])
+        tail = [(entity, component)
+                for entity, component in components.items()
+                if entity not in known]
+        components.clear()
+        components.update(head + tail)
+
+
+def save(game, path):
+    """Write a snapshot of game to path, replacing it atomically."""
+
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(take(game))
+    os.replace(tmp, path)
+
+
+def load(game, path):
+    """Restore game from a snapshot written by `save`."""
+
+    with open(path, "rb") as f:
+        restore(game, f.read())
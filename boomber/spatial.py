@@ -0,0 +1,87 @@
+"""Provide a uniform grid index over sprite areas."""
+
+from boomber.sprites import tile_size
+
+
+class SpatialGrid:
+    """Map tile sized cells to the sprites whose area touches them.
+
+    Sprites are registered together with the entity they belong to and
+    have to be passed to `update` whenever they move. A query only looks
+    at the cells covered by the queried area, so its cost depends on the
+    local density instead of the total number of sprites.
+    """
+
+    def __init__(self, cell_size=tile_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, sprite):
+        return sprite in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def _cells(self, area):
+        left, top, right, bottom = area
+        size = self.cell_size
+        return tuple((cx, cy)
+                     for cx in range(left // size, (right - 1) // size + 1)
+                     for cy in range(top // size, (bottom - 1) // size + 1))
+
+    def insert(self, sprite, entity):
+        """Add sprite of entity at its current area."""
+
+        cells = self._cells(sprite.area)
+        self._entries[sprite] = entity, cells
+        for cell in cells:
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                bucket = self.cells[cell] = {}
+            bucket[sprite] = entity
+
+    def remove(self, sprite):
+        """Forget sprite, unknown sprites are ignored."""
+
+        entry = self._entries.pop(sprite, None)
+        if entry is None:
+            return
+        for cell in entry[1]:
+            bucket = self.cells[cell]
+            del bucket[sprite]
+            if not bucket:
+                del self.cells[cell]
+
+    def update(self, sprite):
+        """Move sprite to the cells of its current area."""
+
+        entry = self._entries.get(sprite)
+        if entry is None:
+            return
+        entity, cells = entry
+        if self._cells(sprite.area) != cells:
+            self.remove(sprite)
+            self.insert(sprite, entity)
+
+    def query(self, area):
+        """Return a dict of sprite: entity for all sprites near area.
+
+        The result holds every sprite sharing a cell with area, so it may
+        contain sprites that do not actually overlap it.
+        """
+
+        cells = self.cells
+        found = {}
+        for cell in self._cells(area):
+            bucket = cells.get(cell)
+            if bucket:
+                found.update(bucket)
+        return found
+
+    def clear(self):
+        self.cells.clear()
+        self._entries.clear()
@@ -1,9 +1,15 @@
 """Provide tools for sprites."""
 
+import collections
+import ctypes
+import time
+
 import sdl2.ext
 
 from sdl2.ext.common import SDLError
 
+from boomber.levels import BLOCK, ENEMY, PLAYER, WALL
+
 
 RESOURCES = sdl2.ext.Resources(__file__, "resources", "textures")
 
@@ -13,24 +19,61 @@ tile_size = 65
 step = tile_size
 """Size of step for Player."""
 
+DYNAMIC = 0
+STATIC = 1
+BLOCKS = 2
+"""Render layers: sprites that change every frame, the background with
+the walls, and the destructible blocks."""
+
 
 class MutableTextureSprite(sdl2.ext.Sprite):
-    def __init__(self, texture):
+    # What most sprites never change is kept here and shared by all of
+    # them; a sprite only gets its own value once it is assigned one.
+    _cache = None
+    frame = None
+    layer = DYNAMIC
+    angle = 0.0
+    flip = sdl2.render.SDL_FLIP_NONE
+    _size = tile_size, tile_size
+    _center = None
+
+    def __init__(self, texture, cache=None):
         super().__init__()
 
-        self.texture = texture
-        self.frame = None
-        self.angle = 0.0
-        self.flip = sdl2.render.SDL_FLIP_NONE
-        self._size = tile_size, tile_size
-        self._center = None
+        # The sprite takes over the reference the caller acquired from
+        # the cache, so it is not acquired a second time here.
+        if cache is not None:
+            self._cache = cache
+        self._texture = texture
 
     def __del__(self):
-        """Releases the bound SDL_Texture."""
+        """Releases the bound SDL_Texture.
 
-        if self.texture is not None:
-            sdl2.render.SDL_DestroyTexture(self.texture)
-        self.texture = None
+        Textures owned by a TextureCache only lose a reference, the cache
+        decides when they are destroyed.
+        """
+
+        if self._texture is not None:
+            if self._cache is not None:
+                self._cache.release(self._texture)
+            else:
+                sdl2.render.SDL_DestroyTexture(self._texture)
+        self._texture = None
+
+    @property
+    def texture(self):
+        return self._texture
+
+    @texture.setter
+    def texture(self, value):
+        if value is self._texture:
+            return
+        if self._cache is not None:
+            if value is not None:
+                self._cache.acquire(value)
+            if self._texture is not None:
+                self._cache.release(self._texture)
+        self._texture = value
 
     @property
     def size(self):
@@ -47,49 +90,253 @@ class MutableTextureSprite(sdl2.ext.Sprite):
 
 class SpriteFactory:
 
-    def __init__(self, renderer):
-        self.tfactory = TextureFactory(renderer)
+    textures = ("background.png", "block.png", "bomb.png", "down.png",
+                "explosion.png", "idle.png", "left.png", "right.png",
+                "up.png", "wall.png")
+    """Names of all textures the factory can hand out."""
+
+    moving = MutableTextureSprite
+    """Sprite class used for the player and enemies."""
+
+    background_size = (1235, 715)
+    """Size a background sprite covers at most, larger levels get several
+    of them."""
+
+    def __init__(self, renderer, max_bytes=None, assets=None):
+        # Without a renderer sprites carry no texture, which is enough
+        # for simulating the game without drawing it.
+        self.tfactory = None
+        if renderer is not None:
+            self.tfactory = TextureFactory(renderer, max_bytes, assets)
+
+    @classmethod
+    def textures_for(cls, level):
+        """Return the names of the textures a game of level shows."""
+
+        names = ["background.png", "bomb.png", "explosion.png"]
+        for code, needed in ((WALL, ("wall.png",)),
+                             (BLOCK, ("block.png",)),
+                             (PLAYER, ("idle.png",)),
+                             (ENEMY, ("right.png", "left.png",
+                                      "down.png", "up.png"))):
+            if next(level.cells(code), None) is not None:
+                names.extend(needed)
+        return names
+
+    def preload(self):
+        """Load every texture up front, so no sprite hits the disk later."""
+
+        if self.tfactory is not None:
+            self.tfactory.cache.preload(self.textures)
+
+    def texture(self, name):
+        """Return a shared texture by name, None without a renderer."""
+
+        if self.tfactory is None:
+            return None
+        return self.tfactory.get_texture(name)
+
+    def release(self, texture):
+        """Give back a texture returned by `texture`."""
+
+        if self.tfactory is not None and texture is not None:
+            self.tfactory.cache.release(texture)
+
+    def _sprite(self, name, cls=MutableTextureSprite):
+        if self.tfactory is None:
+            return cls(None)
+        t = self.tfactory.get_texture(name)
+        return cls(t, self.tfactory.cache)
 
     def bomb(self):
-        t = self.tfactory.get_texture("bomb.png")
-        return MutableTextureSprite(t)
+        return self._sprite("bomb.png")
 
     def explosion(self):
-        t = self.tfactory.get_texture("explosion.png")
-        return MutableTextureSprite(t)
+        return self._sprite("explosion.png")
 
     def wall(self):
-        t = self.tfactory.get_texture("wall.png")
-        return MutableTextureSprite(t)
+        return self._sprite("wall.png")
 
     def block(self):
-        t = self.tfactory.get_texture("block.png")
-        return MutableTextureSprite(t)
+        return self._sprite("block.png")
 
     def player(self):
-        t = self.tfactory.get_texture("idle.png")
-        return MutableTextureSprite(t)
+        return self._sprite("idle.png", self.moving)
 
     def enemy(self):
-        t = self.tfactory.get_texture("right.png")
-        return MutableTextureSprite(t)
-
-    def background(self):
-        t = self.tfactory.get_texture("background.png")
-        s = MutableTextureSprite(t)
-        # TODO: remove hardcode size...
-        s.size = (1235, 715)
+        return self._sprite("right.png", self.moving)
+
+    def background(self, size=None):
+        s = self._sprite("background.png")
+        s.size = size or self.background_size
+        s.depth = -1
         return s
 
 
+def _address(texture):
+    return ctypes.cast(texture, ctypes.c_void_p).value
+
+
+class TextureCache:
+    """Reference-counted SDL_Texture store keyed by image name.
+
+    Every name is decoded and uploaded once. `get` and `acquire` add a
+    reference, `release` drops one. Textures without references stay
+    resident and are evicted in least-recently-used order only when
+    max_bytes is set and the resident size exceeds it.
+    """
+
+    def __init__(self, loader, max_bytes=None):
+        self.loader = loader
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resident_bytes = 0
+
+        self._textures = {}
+        self._names = {}
+        self._refs = {}
+        self._sizes = {}
+        self._idle = collections.OrderedDict()
+
+    def __contains__(self, name):
+        return name in self._textures
+
+    def _load(self, name):
+        self.misses += 1
+        texture = self.loader(name)
+        self._textures[name] = texture
+        self._names[_address(texture)] = name
+        self._refs[name] = 0
+        self._sizes[name] = texture_size(texture)
+        self.resident_bytes += self._sizes[name]
+        return texture
+
+    def get(self, name):
+        """Return the texture for name and add a reference to it."""
+
+        texture = self._textures.get(name)
+        if texture is None:
+            texture = self._load(name)
+        else:
+            self.hits += 1
+        self._refs[name] += 1
+        self._idle.pop(name, None)
+        return texture
+
+    def name_of(self, texture):
+        """Return the name texture was loaded from, None if unknown."""
+
+        return self._names.get(_address(texture))
+
+    def acquire(self, texture):
+        """Add a reference to a texture previously returned by `get`."""
+
+        name = self._names.get(_address(texture))
+        if name is None:
+            return
+        self._refs[name] += 1
+        self._idle.pop(name, None)
+
+    def release(self, texture):
+        """Drop a reference, the texture becomes evictable at zero."""
+
+        name = self._names.get(_address(texture))
+        if name is None:
+            return
+        self._refs[name] -= 1
+        if self._refs[name] <= 0:
+            self._refs[name] = 0
+            self._idle[name] = texture
+            self._evict()
+
+    def preload(self, names):
+        """Load names without holding a reference to them."""
+
+        for name in names:
+            if name not in self._textures:
+                self._idle[name] = self._load(name)
+        self._evict()
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        while self.resident_bytes > self.max_bytes and self._idle:
+            name, texture = self._idle.popitem(last=False)
+            self._destroy(name, texture)
+            self.evictions += 1
+
+    def _destroy(self, name, texture):
+        del self._textures[name]
+        del self._names[_address(texture)]
+        del self._refs[name]
+        self.resident_bytes -= self._sizes.pop(name)
+        sdl2.render.SDL_DestroyTexture(texture)
+
+    def clear(self):
+        """Destroy every texture, referenced or not."""
+
+        for name, texture in list(self._textures.items()):
+            self._destroy(name, texture)
+        self._idle.clear()
+
+    def stats(self):
+        """Return the cache counters as a dict."""
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "textures": len(self._textures),
+            "referenced": len(self._textures) - len(self._idle),
+            "resident_bytes": self.resident_bytes,
+        }
+
+
+def texture_size(texture):
+    """Return the approximate memory used by texture in bytes."""
+
+    fmt = ctypes.c_uint32()
+    access = ctypes.c_int()
+    w, h = ctypes.c_int(), ctypes.c_int()
+    if sdl2.render.SDL_QueryTexture(texture, ctypes.byref(fmt),
+                                    ctypes.byref(access),
+                                    ctypes.byref(w), ctypes.byref(h)) != 0:
+        raise SDLError()
+    return w.value * h.value * sdl2.pixels.SDL_BYTESPERPIXEL(fmt.value)
+
+
 class TextureFactory(sdl2.ext.SpriteFactory):
+    """Load textures into a TextureCache.
+
+    With an AssetLoader as assets the images are taken from it, already
+    decoded, and only uploaded here. `uploaded` sums up the seconds
+    spent creating textures.
+    """
 
-    def __init__(self, renderer):
+    def __init__(self, renderer, max_bytes=None, assets=None):
         super().__init__(renderer=renderer)
+        self.assets = assets
+        self.uploaded = 0.0
+        self.cache = TextureCache(self.load_texture, max_bytes)
 
     def get_texture(self, name):
-        """Return SDL_Texture object by name."""
+        """Return shared SDL_Texture object by name.
+
+        The caller owns one reference and gives it back with
+        `cache.release`.
+        """
 
+        return self.cache.get(name)
+
+    def load_texture(self, name):
+        """Decode and upload a new SDL_Texture object by name."""
+
+        if self.assets is not None:
+            # The surface stays with the loader for later reloads.
+            return self._upload(self.assets.surface(name))
         path = RESOURCES.get_path(name)
         image = sdl2.ext.image.load_image(path)
 
@@ -98,12 +345,16 @@ class TextureFactory(sdl2.ext.SpriteFactory):
     def from_surface(self, tsurface):
         """Create a Texture from the passed SDL_Surface."""
 
-        renderer = self.default_args["renderer"]
+        texture = self._upload(tsurface)
+        sdl2.surface.SDL_FreeSurface(tsurface)
+        return texture
 
+    def _upload(self, surface):
+        start = time.perf_counter()
+        renderer = self.default_args["renderer"]
         texture = sdl2.render.SDL_CreateTextureFromSurface(
-            renderer.sdlrenderer, tsurface)
+            renderer.sdlrenderer, surface)
         if not texture:
             raise SDLError()
-
-        sdl2.surface.SDL_FreeSurface(tsurface)
+        self.uploaded += time.perf_counter() - start
         return texture
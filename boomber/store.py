@@ -0,0 +1,344 @@
+"""Provide structure-of-arrays storage for the components of movable
+entities.
+
+The store needs NumPy, which is optional; `numpy` is None when it is not
+installed.
+"""
+
+import operator
+
+from boomber import components
+from boomber.entities import Entity
+from boomber.sprites import MutableTextureSprite
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+PLAYER = 1
+ENEMY = 2
+"""Kinds of rows in a ComponentStore."""
+
+
+_COLUMNS = {}
+"""Array name to the cache attribute, column and conversion of every
+_Column backed by it, for `ComponentStore.refresh`."""
+
+
+class _Column(property):
+    """Attribute backed by one row or one cell of a store array.
+
+    The value is also kept as a plain Python value in the instance, which
+    is what reads return, so the renderer and the AI read stored
+    components as cheaply as plain ones. While the owner is bound to a
+    store, assignments are written through to the array. Code that
+    writes the arrays directly hands the rows it changed to
+    `ComponentStore.refresh`.
+    """
+
+    def __init__(self, array, column=None, convert=int):
+        self.array = array
+        self.column = column
+        self.convert = convert
+        if column is None:
+            self.cache = "_%s" % array
+        else:
+            self.cache = "_%s_%d" % (array, column)
+        super().__init__(operator.attrgetter(self.cache), self._set)
+
+    def __set_name__(self, owner, name):
+        # Unset values read as None, like before the owner is bound.
+        setattr(owner, self.cache, None)
+        columns = _COLUMNS.setdefault(self.array, [])
+        if (self.cache, self.column, self.convert) not in columns:
+            columns.append((self.cache, self.column, self.convert))
+
+    def _set(self, obj, value):
+        store = obj._store
+        if store is None:
+            setattr(obj, self.cache, value)
+        elif value is not None:
+            array = getattr(store, self.array)
+            if self.column is None:
+                array[obj._slot] = value
+            else:
+                array[obj._slot, self.column] = value
+            setattr(obj, self.cache, self.convert(value))
+
+
+def _pair(row):
+    return int(row[0]), int(row[1])
+
+
+def _bind(view, store, slot, values):
+    view._store = store
+    view._slot = slot
+    for name, value in values.items():
+        setattr(view, name, value)
+
+
+def _unbind(view):
+    # The cached values stay as the plain values of the view.
+    view._store = None
+    view._slot = None
+
+
+class StoredSprite(MutableTextureSprite):
+    _store = None
+    _slot = None
+    x = _Column("position", 0)
+    y = _Column("position", 1)
+
+
+class StoredVelocity(components.Velocity):
+    _store = None
+    _slot = None
+    vx = _Column("velocity", 0)
+    vy = _Column("velocity", 1)
+
+
+class StoredCollisionData(components.CollisionData):
+    _store = None
+    _slot = None
+    x = _Column("previous", 0)
+    y = _Column("previous", 1)
+
+
+class StoredAIData(components.AIData):
+    _store = None
+    _slot = None
+    choose_direction = _Column("choose", convert=bool)
+    collide_with = _Column("collide", convert=_pair)
+
+
+class ComponentStore:
+    """Contiguous arrays with the position, velocity and box of every
+    player and enemy.
+
+    Rows are packed: removing an entity moves the last row into the hole
+    and rebinds the components of the moved entity, so `count` rows are
+    always in use and `entities[i]` owns row i.
+    """
+
+    directions = ((3, 0), (0, 3), (-3, 0), (0, -3))
+    """Directions an enemy picks from after hitting something."""
+
+    def __init__(self, capacity=64, seed=None):
+        if numpy is None:
+            raise RuntimeError("the component store requires numpy")
+        self.count = 0
+        self.entities = []
+        self.index = {}
+        self.rng = numpy.random.default_rng(seed)
+        self._views = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        def grow(old, shape, dtype):
+            new = numpy.zeros(shape, dtype)
+            if old is not None:
+                new[:self.count] = old[:self.count]
+            return new
+
+        self.capacity = capacity
+        self.position = grow(getattr(self, "position", None),
+                             (capacity, 2), numpy.int64)
+        self.velocity = grow(getattr(self, "velocity", None),
+                             (capacity, 2), numpy.int64)
+        self.size = grow(getattr(self, "size", None),
+                         (capacity, 2), numpy.int64)
+        self.previous = grow(getattr(self, "previous", None),
+                             (capacity, 2), numpy.int64)
+        self.collide = grow(getattr(self, "collide", None),
+                            (capacity, 2), numpy.int64)
+        self.choose = grow(getattr(self, "choose", None),
+                           capacity, numpy.bool_)
+        self.kind = grow(getattr(self, "kind", None),
+                         capacity, numpy.int8)
+
+    def __contains__(self, entity):
+        return entity in self.index
+
+    def __len__(self):
+        return self.count
+
+    def add(self, entity, kind):
+        """Move the components of a Player or Enemy into the store.
+
+        The entity's sprite has to be a StoredSprite; its velocity,
+        collision and AI components are replaced by stored ones.
+        """
+
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        slot = self.count
+        self.count += 1
+        self.entities.append(entity)
+        self.index[entity] = slot
+        self.kind[slot] = kind
+        self.size[slot] = entity.sprite.size
+
+        views = {}
+        sprite = entity.sprite
+        _bind(sprite, self, slot, {"x": sprite.x, "y": sprite.y})
+        views["position"] = sprite
+
+        velocity = StoredVelocity()
+        _bind(velocity, self, slot, {"vx": entity.velocity.vx,
+                                     "vy": entity.velocity.vy})
+        entity.velocity = velocity
+        views["velocity"] = velocity
+
+        old = entity.collisiondata
+        collisiondata = StoredCollisionData(old.x_in_world, old.y_in_world)
+        _bind(collisiondata, self, slot, {"x": sprite.x, "y": sprite.y})
+        entity.collisiondata = collisiondata
+        views["previous"] = collisiondata
+
+        if kind == ENEMY:
+            aidata = StoredAIData()
+            _bind(aidata, self, slot, {"choose_direction": False,
+                                       "collide_with": (0, 0)})
+            entity.aidata = aidata
+            views["choose"] = views["collide"] = aidata
+
+        self._views.append(views)
+        return slot
+
+    def remove(self, entity):
+        """Drop entity from the store, unknown entities are ignored."""
+
+        slot = self.index.pop(entity, None)
+        if slot is None:
+            return
+        for view in self._views[slot].values():
+            _unbind(view)
+
+        last = self.count - 1
+        if slot != last:
+            for array in (self.position, self.velocity, self.size,
+                          self.previous, self.collide, self.choose,
+                          self.kind):
+                array[slot] = array[last]
+            moved = self.entities[last]
+            self.entities[slot] = moved
+            self.index[moved] = slot
+            self._views[slot] = self._views[last]
+            for view in self._views[slot].values():
+                view._slot = slot
+        self.entities.pop()
+        self._views.pop()
+        self.count = last
+
+    def rows(self, kind):
+        """Return the indices of all rows of kind."""
+
+        return numpy.flatnonzero(self.kind[:self.count] == kind)
+
+    def refresh(self, name, rows):
+        """Copy the values of rows of the array called name, which were
+        written directly, into the components bound to them."""
+
+        columns = _COLUMNS[name]
+        views = self._views
+        values = getattr(self, name)[rows].tolist()
+        if len(columns) == 2 and all(
+                convert is int for _, _, convert in columns):
+            # Both columns of a position or velocity, tolist already
+            # made them ints.
+            (first, a, _), (second, b, _) = columns
+            for slot, value in zip(rows.tolist(), values):
+                view = views[slot][name]
+                setattr(view, first, value[a])
+                setattr(view, second, value[b])
+            return
+        for slot, value in zip(rows.tolist(), values):
+            view = views[slot][name]
+            for cache, column, convert in columns:
+                setattr(view, cache, convert(
+                    value if column is None else value[column]))
+
+    def boxes(self):
+        """Return the left, top, right, bottom of every row as an (n, 4)
+        array."""
+
+        n = self.count
+        boxes = numpy.empty((n, 4), numpy.int64)
+        boxes[:, :2] = self.position[:n]
+        boxes[:, 2:] = self.position[:n] + self.size[:n]
+        return boxes
+
+    def overlaps(self, areas, own=None):
+        """Return the areas and rows that overlap, see `overlapping`.
+
+        own optionally holds for every area the row of the same entity,
+        which is never reported, or -1.
+        """
+
+        found, rows = overlapping(areas, self.boxes())
+        if own is not None:
+            other = rows != own[found]
+            found, rows = found[other], rows[other]
+        return found, rows
+
+
+def overlapping(areas, boxes):
+    """Return the pairs of areas and boxes that overlap as two arrays of
+    indices, ordered by area and then box.
+
+    areas and boxes are (n, 4) arrays of left, top, right, bottom. The
+    boxes are binned into bands as high as the tallest box by their top
+    edge and sorted by band and left edge. An area is only tested
+    against the boxes of the bands it reaches into whose left edge lies
+    between its own left, less the widest box, and its right, so the
+    cost grows with the boxes near an area instead of with all of them.
+    """
+
+    empty = numpy.zeros(0, numpy.intp)
+    if not len(areas) or not len(boxes):
+        return empty, empty
+    widest = int((boxes[:, 2] - boxes[:, 0]).max())
+    tallest = max(int((boxes[:, 3] - boxes[:, 1]).max()), 1)
+    # Keys of band and left edge, the lefts of a band below stride.
+    low = min(int(boxes[:, 0].min()), int(areas[:, 0].min()) - widest)
+    stride = max(int(boxes[:, 0].max()), int(areas[:, 2].max())) - low + 1
+    keys = (boxes[:, 1] // tallest) * stride + boxes[:, 0] - low
+    order = numpy.argsort(keys, kind="stable")
+    keys = keys[order]
+
+    # A box reaching into an area has its top above the area's bottom
+    # and less than its height above the area's top.
+    top = (areas[:, 1] - tallest + 1) // tallest
+    bottom = (areas[:, 3] - 1) // tallest
+    found, box = [], []
+    for band in range(int((bottom - top).max()) + 1):
+        rows = top + band
+        first = numpy.searchsorted(keys, rows * stride + areas[:, 0] -
+                                   widest - low, "right")
+        last = numpy.searchsorted(keys, rows * stride + areas[:, 2] - low,
+                                  "left")
+        counts = numpy.where(rows <= bottom, numpy.maximum(last - first, 0),
+                             0)
+        # The candidates of an area are a run of the sorted boxes
+        # starting at first, laid out one run after the other.
+        runs = numpy.cumsum(counts) - counts
+        found.append(numpy.repeat(numpy.arange(len(areas)), counts))
+        box.append(order[numpy.arange(int(counts.sum())) +
+                         numpy.repeat(first - runs, counts)])
+    found, box = numpy.concatenate(found), numpy.concatenate(box)
+
+    area, other = areas[found], boxes[box]
+    hit = ((other[:, 0] < area[:, 2]) & (other[:, 2] > area[:, 0]) &
+           (other[:, 1] < area[:, 3]) & (other[:, 3] > area[:, 1]))
+    found, box = found[hit], box[hit]
+    ordered = numpy.lexsort((box, found))
+    return found[ordered], box[ordered]
+
+
+class StoreHolder(Entity):
+    """Entity carrying the ComponentStore, so systems can ask for it."""
+
+    def __init__(self, world, store):
+        self.componentstore = store
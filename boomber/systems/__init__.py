@@ -1,15 +1,17 @@
 """Provides all systems of the game."""
 
-import random
-import time
+import ctypes
+import struct
 
 import sdl2
 import sdl2.ext
 
-from boomber import Game
+from sdl2.ext.common import SDLError
+
 from boomber.components import (
     AIData,
     AnimationData,
+    Camera,
     CollisionData,
     ControlData,
     DestroyData,
@@ -18,43 +20,481 @@ from boomber.components import (
     Timer,
     Velocity,
 )
-from boomber.entities import Enemy
-from boomber.sprites import MutableTextureSprite, step, tile_size
+from boomber.controls import due
+from boomber.sprites import (
+    BLOCKS,
+    DYNAMIC,
+    STATIC,
+    MutableTextureSprite,
+    step,
+    tile_size,
+)
+from boomber.store import ENEMY, PLAYER, ComponentStore, numpy, overlapping
+
+
+def create_systems(target=None, store=False, ai="random"):
+    """Return the named systems of the game in processing order.
+
+    target is passed to TextureRenderer, without it no renderer is made.
+    With store, movement and AI run vectorized over the ComponentStore
+    of a Game created with store=True. ai is "random" for enemies that
+    turn at random when they bump into something, or "flow" for enemies
+    that follow the game's flow field to the player.
+
+    The systems reach the game they run in through their game attribute,
+    which is set by the Game they are passed to.
+    """
+
+    systems = {}
+    systems["timer_system"] = TimerCallbackSystem()
+    if store:
+        systems["movement_system"] = ArrayMovementSystem()
+    else:
+        systems["movement_system"] = MovementSystem()
+    systems["collision_system"] = CollisionSystem(static=ai != "flow")
+    systems["control_system"] = ControlSystem()
+    systems["animation_system"] = AnimationSystem()
+    systems["spriteanimation_system"] = SpriteAnimationSystem()
+    if ai == "flow":
+        systems["ai_system"] = FlowAIController()
+    elif store:
+        systems["ai_system"] = ArrayAIController()
+    else:
+        systems["ai_system"] = AIController()
+    systems["destroy_system"] = DestroySystem()
+    if target is not None:
+        systems["camera_system"] = CameraSystem()
+        systems["spriterenderer"] = TextureRenderer(target)
+    return systems
+
 
+class TextureRenderer(sdl2.ext.TextureSpriteRenderSystem):
+    """Common renderer system, that supports spritesheet animation.
 
-game = Game()
+    Once an atlas is attached with `use_atlas`, every sprite is drawn from
+    the atlas texture in batches of equal blend mode, a batch in one
+    SDL_RenderGeometry call with SDL 2.0.18 or newer.
 
+    With `use_layers` the sprites of the STATIC and BLOCKS layers are
+    drawn once into an opaque render target texture the size of the
+    level, the background, and only the DYNAMIC sprites are drawn every
+    frame over the part of it in view.
 
-class TextureRenderer(sdl2.ext.TextureSpriteRenderSystem):
-    """Common renderer system, that supports spritesheet animation."""
+    Sprites are drawn offset by `offset`, the world position shown in the
+    top left corner, which Game sets from its camera. `overlay`, if set,
+    is called with the SDL renderer before every frame is presented.
+    """
 
     def __init__(self, window):
         super().__init__(window)
         self.componenttypes = (MutableTextureSprite,)
+        # Layers are drawn in order below everything else, so caching
+        # them does not change what is on top.
+        self.sortfunc = lambda sprite: (_layer_order[sprite.layer],
+                                        sprite.depth)
+        self.atlas = None
+        self.cache = None
+        self.layers = None
+        self.dirty_rects = False
+        self.offset = (0, 0)
+        self.overlay = None
+        self._world = None
+        self._background = None
+        self._bounds = None
+        self._stale = []
+        self._layer_offset = None
+        self._drawn = None
+        self._names = {}
+        self._src = sdl2.rect.SDL_Rect()
+        self._dst = sdl2.rect.SDL_Rect()
+        self._vertices = bytearray()
+        self._indices = None
+
+    def use_atlas(self, atlas, cache):
+        """Draw from atlas, cache maps sprite textures to atlas names."""
+
+        self.atlas = atlas
+        self.cache = cache
+        self._names = {}
+
+    def use_layers(self, dirty_rects=False):
+        """Cache the static layers in a render target texture.
+
+        With dirty_rects a frame only restores the areas dynamic sprites
+        left or entered instead of copying the whole view. That relies on
+        the renderer keeping the previous frame, as the software renderer
+        does. Return False if the renderer has no render targets.
+        """
+
+        if not sdl2.render.SDL_RenderTargetSupported(self.sdlrenderer):
+            return False
+        self.layers = (STATIC, BLOCKS)
+        self.dirty_rects = dirty_rects
+        self._drawn = None
+        return True
+
+    def invalidate(self, layer, area=None):
+        """Redraw the cached layer on the next frame, only within area,
+        a left, top, right, bottom in the world, if given."""
+
+        if self.layers is None or layer not in self.layers or \
+                self._background is None:
+            return
+        if area is not None:
+            self._stale.append(area)
+            return
+        sdl2.render.SDL_DestroyTexture(self._background)
+        self._background = None
+        self._stale = []
+
+    def output_size(self):
+        """Return the width and height of the render target."""
+
+        w, h = ctypes.c_int(), ctypes.c_int()
+        sdl2.render.SDL_GetRendererOutputSize(self.sdlrenderer,
+                                              ctypes.byref(w),
+                                              ctypes.byref(h))
+        return w.value, h.value
+
+    def process(self, world, components):
+        # Game passes only the sprites in view of its camera, the
+        # background is drawn from all of the world.
+        self._world = world
+        super().process(world, components)
 
     def render(self, sprites):
-        self._renderer.clear()
+        if self.layers is not None:
+            self._render_layers(sprites)
+        else:
+            self._renderer.clear()
+            self._draw(sprites)
+        if self.overlay is not None:
+            self.overlay(self.sdlrenderer)
+        sdl2.render.SDL_RenderPresent(self.sdlrenderer)
+
+    def _draw(self, sprites):
+        if self.atlas is not None:
+            self._draw_atlas(sprites)
+        else:
+            self._draw_textures(sprites)
+
+    def _draw_textures(self, sprites):
         rcopy = sdl2.render.SDL_RenderCopyEx
         renderer = self.sdlrenderer
+        src, dst = self._src, self._dst
+        ox, oy = self.offset
         for sprite in sprites:
             if sprite.frame is not None:
                 sdl2.render.SDL_SetTextureBlendMode(sprite.texture,
                                                     sdl2.blendmode.SDL_BLENDMODE_ADD)
-                rcopy(renderer, sprite.texture,
-                      sdl2.rect.SDL_Rect(sprite.frame * tile_size, 0,
-                                         tile_size, tile_size),
-                      sdl2.rect.SDL_Rect(sprite.x, sprite.y,
-                                         tile_size, tile_size),
+                src.x, src.y = sprite.frame * tile_size, 0
+                src.w = src.h = tile_size
+                dst.x, dst.y = sprite.x - ox, sprite.y - oy
+                dst.w = dst.h = tile_size
+                rcopy(renderer, sprite.texture, src, dst,
                       sprite.angle, sprite.center, sprite.flip)
             else:
-                r = sdl2.rect.SDL_Rect(0, 0, 0, 0)
-                r.x = sprite.x
-                r.y = sprite.y
-                r.w, r.h = sprite.size
+                dst.x, dst.y = sprite.x - ox, sprite.y - oy
+                dst.w, dst.h = sprite.size
                 rcopy(renderer, sprite.texture,
-                      None, r, sprite.angle,
+                      None, dst, sprite.angle,
                       sprite.center, sprite.flip)
-        sdl2.render.SDL_RenderPresent(self.sdlrenderer)
+
+    def _target_format(self):
+        """Return the pixel format the renderer draws in, so copying the
+        background needs no conversion."""
+
+        target = getattr(self._renderer, "rendertarget", None)
+        if isinstance(target, sdl2.surface.SDL_Surface):
+            return target.format.contents.format
+        if isinstance(target, sdl2.ext.Window):
+            target = target.window
+        if isinstance(target, sdl2.video.SDL_Window):
+            return sdl2.video.SDL_GetWindowPixelFormat(target)
+        return sdl2.pixels.SDL_PIXELFORMAT_ARGB8888
+
+    def _cached(self, sprites):
+        """Return the sprites of the cached layers in drawing order."""
+
+        if self._world is not None:
+            sprites = sorted(
+                self._world.get_components(MutableTextureSprite),
+                key=self.sortfunc)
+        return [s for s in sprites if s.layer in self.layers]
+
+    def _build_background(self, sprites):
+        """Draw the sprites of the cached layers into a new texture that
+        just holds them, return it and its left, top, width and height
+        in the world."""
+
+        cached = self._cached(sprites)
+        left = top = right = bottom = 0
+        if cached:
+            left = min(s.x for s in cached)
+            top = min(s.y for s in cached)
+            right = max(s.x + _sprite_size(s)[0] for s in cached)
+            bottom = max(s.y + _sprite_size(s)[1] for s in cached)
+        width, height = max(right - left, 1), max(bottom - top, 1)
+
+        renderer = self.sdlrenderer
+        texture = sdl2.render.SDL_CreateTexture(
+            renderer, self._target_format(),
+            sdl2.render.SDL_TEXTUREACCESS_TARGET, width, height)
+        if not texture:
+            raise SDLError()
+        # Cleared to the colour of the frame the background is opaque,
+        # so it is copied without blending.
+        sdl2.render.SDL_SetTextureBlendMode(texture,
+                                            sdl2.blendmode.SDL_BLENDMODE_NONE)
+        sdl2.render.SDL_SetRenderTarget(renderer, texture)
+        sdl2.render.SDL_RenderClear(renderer)
+        offset = self.offset
+        self.offset = left, top
+        try:
+            self._draw(cached)
+        finally:
+            self.offset = offset
+            sdl2.render.SDL_SetRenderTarget(renderer, None)
+        return texture, (left, top, width, height)
+
+    def _redraw(self, sprites, areas):
+        """Draw the background again within areas of the world, which
+        is cheaper than drawing all of a large level."""
+
+        renderer = self.sdlrenderer
+        left, top = self._bounds[:2]
+        cached = self._cached(sprites)
+        rect = sdl2.rect.SDL_Rect()
+        mode = sdl2.blendmode.SDL_BlendMode()
+        sdl2.render.SDL_GetRenderDrawBlendMode(renderer, ctypes.byref(mode))
+        sdl2.render.SDL_SetRenderDrawBlendMode(
+            renderer, sdl2.blendmode.SDL_BLENDMODE_NONE)
+        sdl2.render.SDL_SetRenderTarget(renderer, self._background)
+        offset = self.offset
+        self.offset = left, top
+        try:
+            for x0, y0, x1, y1 in areas:
+                rect.x, rect.y = x0 - left, y0 - top
+                rect.w, rect.h = x1 - x0, y1 - y0
+                # Sprites reaching into the area are only drawn in it.
+                sdl2.render.SDL_RenderSetClipRect(renderer, rect)
+                sdl2.render.SDL_RenderFillRect(renderer, rect)
+                self._draw([s for s in cached
+                            if s.x < x1 and s.y < y1 and
+                            s.x + _sprite_size(s)[0] > x0 and
+                            s.y + _sprite_size(s)[1] > y0])
+        finally:
+            self.offset = offset
+            sdl2.render.SDL_RenderSetClipRect(renderer, None)
+            sdl2.render.SDL_SetRenderTarget(renderer, None)
+            sdl2.render.SDL_SetRenderDrawBlendMode(renderer, mode)
+
+    def _restore(self, x, y, w, h, width, height):
+        """Copy the background under the area x, y, w, h of the frame,
+        which is width by height, cut to both of them."""
+
+        left, top, bw, bh = self._bounds
+        ox, oy = self.offset
+        # SDL cuts a source rect to the texture but not the target rect,
+        # which would stretch what is left of it.
+        x0 = max(x, 0, left - ox)
+        y0 = max(y, 0, top - oy)
+        x1 = min(x + w, width, left + bw - ox)
+        y1 = min(y + h, height, top + bh - oy)
+        if x1 <= x0 or y1 <= y0:
+            return
+        src, dst = self._src, self._dst
+        src.x, src.y = x0 + ox - left, y0 + oy - top
+        dst.x, dst.y = x0, y0
+        src.w = dst.w = x1 - x0
+        src.h = dst.h = y1 - y0
+        sdl2.render.SDL_RenderCopy(self.sdlrenderer, self._background,
+                                   src, dst)
+
+    def _render_layers(self, sprites):
+        full = self._drawn is None or not self.dirty_rects
+        if self._background is None:
+            self._background, self._bounds = self._build_background(
+                sprites)
+            full = True
+        elif self._stale:
+            self._redraw(sprites, self._stale)
+            self._stale = []
+            full = True
+        if self.offset != self._layer_offset:
+            # The dirty areas of the last frame were at the old offset.
+            self._layer_offset = self.offset
+            full = True
+
+        dynamic = [s for s in sprites if s.layer == DYNAMIC]
+        ox, oy = self.offset
+        rects = [(s.x - ox, s.y - oy) + _sprite_size(s) for s in dynamic]
+
+        width, height = self.output_size()
+        if full:
+            left, top, bw, bh = self._bounds
+            if left > ox or top > oy or left + bw < ox + width or \
+                    top + bh < oy + height:
+                self._renderer.clear()
+            self._restore(0, 0, width, height, width, height)
+        else:
+            for rect in self._drawn + rects:
+                self._restore(*rect, width, height)
+        self._draw(dynamic)
+        self._drawn = rects
+
+    def _region(self, sprite):
+        texture = sprite.texture
+        known = self._names.get(id(texture))
+        if known is None or known[0] is not texture:
+            known = self._names[id(texture)] = (texture,
+                                                self.cache.name_of(texture))
+        return self.atlas.frames[known[1]][sprite.frame or 0]
+
+    def _draw_atlas(self, sprites):
+        add = sdl2.blendmode.SDL_BLENDMODE_ADD
+        blend = sdl2.blendmode.SDL_BLENDMODE_BLEND
+
+        batch = []
+        mode = None
+        for sprite in sprites:
+            if sprite.texture is None:
+                continue
+            smode = add if sprite.frame is not None else blend
+            if smode != mode:
+                self._flush(batch, mode)
+                batch = []
+                mode = smode
+            batch.append(sprite)
+        self._flush(batch, mode)
+
+    def _flush(self, batch, mode):
+        if not batch:
+            return
+        texture = self.atlas.texture
+        sdl2.render.SDL_SetTextureBlendMode(texture, mode)
+        if _render_geometry is not None and not any(
+                s.angle or s.flip for s in batch):
+            self._draw_geometry(batch)
+            return
+
+        rcopy = sdl2.render.SDL_RenderCopyEx
+        renderer = self.sdlrenderer
+        src, dst = self._src, self._dst
+        ox, oy = self.offset
+        for sprite in batch:
+            src.x, src.y, src.w, src.h = self._region(sprite)
+            dst.x, dst.y = sprite.x - ox, sprite.y - oy
+            if sprite.frame is not None:
+                dst.w = dst.h = tile_size
+            else:
+                dst.w, dst.h = sprite.size
+            rcopy(renderer, texture, src, dst,
+                  sprite.angle, sprite.center, sprite.flip)
+
+    def _draw_geometry(self, batch):
+        count = len(batch)
+        size = 4 * count * _vertex.size
+        if len(self._vertices) < size:
+            self._vertices = bytearray(size)
+        if self._indices is None or len(self._indices) < 6 * count:
+            self._indices = (ctypes.c_int * (6 * count))(*(
+                4 * (i // 6) + (0, 1, 2, 2, 3, 0)[i % 6]
+                for i in range(6 * count)))
+
+        aw, ah = self.atlas.size
+        vertices = self._vertices
+        pack = _vertex.pack_into
+        ox, oy = self.offset
+        offset = 0
+        for sprite in batch:
+            x, y, w, h = self._region(sprite)
+            if sprite.frame is not None:
+                dw = dh = tile_size
+            else:
+                dw, dh = sprite.size
+            left, top = sprite.x - ox, sprite.y - oy
+            right, bottom = left + dw, top + dh
+            u0, v0 = x / aw, y / ah
+            u1, v1 = (x + w) / aw, (y + h) / ah
+            for vx, vy, u, v in ((left, top, u0, v0), (right, top, u1, v0),
+                                 (right, bottom, u1, v1),
+                                 (left, bottom, u0, v1)):
+                pack(vertices, offset, vx, vy, 255, 255, 255, 255, u, v)
+                offset += _vertex.size
+
+        varray = (SDL_Vertex * (4 * count)).from_buffer(vertices)
+        _render_geometry(self.sdlrenderer, self.atlas.texture,
+                         varray, 4 * count, self._indices, 6 * count)
+
+
+_layer_order = {STATIC: 0, BLOCKS: 1, DYNAMIC: 2}
+"""Drawing order of the render layers."""
+
+
+def _sprite_size(sprite):
+    """Return the width and height sprite is drawn with."""
+
+    if sprite.frame is not None:
+        return tile_size, tile_size
+    return sprite.size
+
+
+class SDL_Vertex(ctypes.Structure):
+    """Vertex of SDL_RenderGeometry, which PySDL2 0.9.9 lacks."""
+
+    _fields_ = [("position", sdl2.rect.SDL_FPoint),
+                ("color", sdl2.pixels.SDL_Color),
+                ("tex_coord", sdl2.rect.SDL_FPoint)]
+
+
+def _bind_render_geometry():
+    """Return SDL_RenderGeometry, bound from the SDL library if PySDL2
+    does not provide it, None if SDL is older than 2.0.18."""
+
+    function = getattr(sdl2.render, "SDL_RenderGeometry", None)
+    if function is not None:
+        return function
+    version = sdl2.version.SDL_version()
+    sdl2.version.SDL_GetVersion(ctypes.byref(version))
+    if (version.major, version.minor, version.patch) < (2, 0, 18):
+        return None
+    return sdl2.dll.dll.bind_function(
+        "SDL_RenderGeometry",
+        [ctypes.POINTER(sdl2.render.SDL_Renderer),
+         ctypes.POINTER(sdl2.render.SDL_Texture),
+         ctypes.POINTER(SDL_Vertex), ctypes.c_int,
+         ctypes.POINTER(ctypes.c_int), ctypes.c_int],
+        ctypes.c_int)
+
+
+_render_geometry = _bind_render_geometry()
+"""SDL_RenderGeometry, None if the SDL library is older than 2.0.18."""
+
+_vertex = struct.Struct("=ff4Bff")
+"""Memory layout of an SDL_Vertex: position, color, texture coordinate."""
+
+
+class CameraSystem(sdl2.ext.System):
+    """Keep cameras centred on their target within their bounds."""
+
+    def __init__(self):
+        super().__init__()
+        self.componenttypes = (Camera,)
+
+    def process(self, world, components):
+        for camera in components:
+            target = camera.target
+            if target is None:
+                continue
+            w, h = target.sprite.size
+            x = target.sprite.x + w // 2 - camera.width // 2
+            y = target.sprite.y + h // 2 - camera.height // 2
+            if camera.bounds is not None:
+                left, top, right, bottom = camera.bounds
+                x = max(left, min(x, right - camera.width))
+                y = max(top, min(y, bottom - camera.height))
+            camera.x, camera.y = x, y
 
 
 class MovementSystem(sdl2.ext.Applicator):
@@ -64,21 +504,50 @@ class MovementSystem(sdl2.ext.Applicator):
                                PlayerData, sdl2.ext.Sprite,)
 
     def process(self, world, componentsets):
+        game = self.game
         for velocity, collisiondata, playerdata, sprite in componentsets:
             collisiondata.x = sprite.x
             collisiondata.y = sprite.y
 
             sprite.x += velocity.vx
             sprite.y += velocity.vy
+            game.grid.update(sprite)
 
             velocity.vx = 0
             velocity.vy = 0
 
 
-class CollisionSystem(sdl2.ext.Applicator):
+class ArrayMovementSystem(sdl2.ext.System):
+    """MovementSystem for the players in a ComponentStore."""
+
     def __init__(self):
+        super().__init__()
+        self.componenttypes = (ComponentStore,)
+
+    def process(self, world, stores):
+        for store in stores:
+            rows = store.rows(PLAYER)
+            store.previous[rows] = store.position[rows]
+            store.position[rows] += store.velocity[rows]
+            store.velocity[rows] = 0
+            for name in ("previous", "position", "velocity"):
+                store.refresh(name, rows)
+
+
+class CollisionSystem(sdl2.ext.Applicator):
+    """Resolve the overlaps of collidable entities with the players,
+    enemies and explosions.
+
+    Without static, walls, blocks and bombs are not checked. Only the
+    players and enemies are, and the players are kept off occupied
+    tiles through the game's tile maps. That suits enemies that never
+    walk into tiles, as with FlowAIController.
+    """
+
+    def __init__(self, static=True):
         super().__init__()
         self.componenttypes = CollisionData, DestroyData, sdl2.ext.Sprite
+        self.static = static
 
     def _overlap(self, sprite, items):
         left, top, right, bottom = sprite.area
@@ -97,39 +566,128 @@ class CollisionSystem(sdl2.ext.Applicator):
                 break
         return collision, subject
 
-    def process(self, world, componentsets):
-        for pos, destroydata, sprite in componentsets:
-
-            collision, _ = self._overlap(sprite, [game.player])
-            if collision:
-                if isinstance(destroydata.entity, Enemy):
-                    game.player.destroydata.is_alive = False
-                game.player.sprite.x = game.player.collisiondata.x
-                game.player.sprite.y = game.player.collisiondata.y
+    def _moving(self):
+        """Yield the componentsets of the players and the enemies, and
+        push a player back if it stepped onto a tile or bomb."""
+
+        game = self.game
+        for player in list(game.players):
+            cell = game.cell(player.sprite.x, player.sprite.y)
+            came_from = game.cell(player.collisiondata.x,
+                                  player.collisiondata.y)
+            onto_bomb = cell in game.bomb_cells and cell != came_from
+            if cell in game.tiles or onto_bomb:
+                player.sprite.x = player.collisiondata.x
+                player.sprite.y = player.collisiondata.y
+                game.grid.update(player.sprite)
+            yield player.collisiondata, player.destroydata, player.sprite
+        for enemy in game.enemies:
+            yield enemy.collisiondata, enemy.destroydata, enemy.sprite
+
+    def _stored_hits(self, store, componentsets):
+        """Yield the componentsets that may hit something, with the
+        first stored player and enemy they hit.
+
+        In one pass over arrays, `ComponentStore.overlaps` finds the
+        overlaps with the stored players and enemies, and `overlapping`
+        those with the sprites in the grid. Componentsets that hit
+        neither, most of the walls, are skipped. Players are always
+        yielded while the grid holds anything, a player pushed back
+        during the pass may land on it.
+        """
+
+        componentsets = list(componentsets)
+        if not componentsets:
+            return
+        areas = numpy.array([sprite.area for _, _, sprite in componentsets],
+                            numpy.int64).reshape(-1, 4)
+        index = store.index
+        own = numpy.array([index.get(destroydata.entity, -1)
+                           for _, destroydata, _ in componentsets])
+        found, rows = store.overlaps(areas, own)
+        near = [found]
+        grid = self.game.grid
+        if grid:
+            near.append(overlapping(areas, numpy.array(
+                [sprite.area for sprite in grid], numpy.int64))[0])
+            near.append(numpy.flatnonzero(
+                (own >= 0) & (store.kind[own] == PLAYER)))
+
+        hits = {}
+        entities = store.entities
+        kinds = store.kind[rows].tolist()
+        for i, j, kind in zip(found.tolist(), rows.tolist(), kinds):
+            first = hits.setdefault(i, [None, None])
+            slot = 0 if kind == PLAYER else 1
+            if first[slot] is None:
+                first[slot] = entities[j]
+
+        for i in numpy.unique(numpy.concatenate(near)).tolist():
+            hit_player, enemy = hits.get(i, (None, None))
+            yield componentsets[i], hit_player, enemy
 
-            collision, _ = self._overlap(sprite, game.explosion_area)
-            if collision:
+    def process(self, world, componentsets):
+        game = self.game
+        # Players are told apart by id, which is cheaper than hashing an
+        # entity.
+        players = {id(player) for player in game.players}
+        grid = game.grid
+        enemies = game.enemies
+        explosions = game.explosion_area
+        if not self.static:
+            componentsets = self._moving()
+        if game.store is not None:
+            checked = self._stored_hits(game.store, componentsets)
+        else:
+            checked = ((c, None, None) for c in componentsets)
+
+        for (pos, destroydata, sprite), hit_player, enemy in checked:
+            left, top, right, bottom = area = sprite.area
+            hit_explosion = False
+
+            nearby = grid.query(area).items() if grid else ()
+            for subject, entity in nearby:
+                if subject is sprite:
+                    continue
+                pleft, ptop, pright, pbottom = subject.area
+                if not (pleft < right and pright > left and
+                        ptop < bottom and pbottom > top):
+                    continue
+                if id(entity) in players:
+                    if hit_player is None:
+                        hit_player = entity
+                elif entity in explosions:
+                    hit_explosion = True
+                elif enemy is None and entity in enemies:
+                    enemy = entity
+
+            if hit_player is not None:
+                if destroydata.entity in enemies:
+                    hit_player.destroydata.is_alive = False
+                hit_player.sprite.x = hit_player.collisiondata.x
+                hit_player.sprite.y = hit_player.collisiondata.y
+                game.grid.update(hit_player.sprite)
+
+            if hit_explosion:
                 destroydata.is_alive = False
 
-            collision, enemy = self._overlap(sprite, game.enemies)
-            if collision:
-                if isinstance(destroydata.entity, Enemy):
+            if enemy is not None:
+                if destroydata.entity in enemies:
                     continue
                 enemy.aidata.choose_direction = True
                 enemy.aidata.collide_with = (sprite.x, sprite.y)
 
 
-class TimerCallbackSystem(sdl2.ext.Applicator):
+class TimerCallbackSystem(sdl2.ext.System):
+    """Run the timer callbacks that are due through the game's
+    Scheduler."""
+
     def __init__(self):
         super().__init__()
-        self.componenttypes = Timer, DestroyData, sdl2.ext.Sprite
+        self.componenttypes = (Timer,)
 
-    def process(self, world, componentsets):
-        for timer, destroydata, sprite in componentsets:
-            if time.time() - timer.start > timer.delta:
-                if timer.callback == "explode":
-                    game.explode(sprite.x, sprite.y)
-                    destroydata.is_alive = False
+    def process(self, world, components):
+        self.game.scheduler.run()
 
 
 class DestroySystem(sdl2.ext.Applicator):
@@ -138,35 +696,49 @@ class DestroySystem(sdl2.ext.Applicator):
         self.componenttypes = DestroyData, sdl2.ext.Sprite
 
     def process(self, world, componentsets):
+        game = self.game
         for destroydata, sprite in componentsets:
             if not destroydata.is_alive and destroydata.is_destroyable:
-                game.entities_to_delete.append(destroydata.entity)
+                game.entities_to_delete.add(destroydata.entity)
 
 
 class ControlSystem(sdl2.ext.Applicator):
+    """Apply the queued key presses that are due, see `controls.due`.
+
+    A bomb is planted right away and shows on the frame after this
+    tick, a move sets the velocity the MovementSystem applies on the
+    next one. The profiler learns on which tick every timed press shows.
+    """
+
     def __init__(self):
         super().__init__()
         self.componenttypes = ControlData, Velocity, sdl2.ext.Sprite
 
     def process(self, world, componentsets):
+        game = self.game
+        profiler = game.profiler
         for controldata, velocity, sprite in componentsets:
-            if not controldata.event:
-                break
-            if controldata.event == sdl2.SDLK_UP:
-                velocity.vy = -step
-                controldata.event = None
-            elif controldata.event == sdl2.SDLK_DOWN:
-                velocity.vy = step
-                controldata.event = None
-            elif controldata.event == sdl2.SDLK_LEFT:
-                velocity.vx = -step
-                controldata.event = None
-            elif controldata.event == sdl2.SDLK_RIGHT:
-                velocity.vx = step
-                controldata.event = None
-            elif controldata.event == sdl2.SDLK_SPACE:
-                game.plant_bomb(sprite.x, sprite.y)
-                controldata.event = None
+            actions = controldata.actions
+            if not actions:
+                continue
+            for _ in range(due(actions)):
+                key, timestamp = actions.popleft()
+                shown = 1
+                if key == sdl2.SDLK_UP:
+                    velocity.vy = -step
+                elif key == sdl2.SDLK_DOWN:
+                    velocity.vy = step
+                elif key == sdl2.SDLK_LEFT:
+                    velocity.vx = -step
+                elif key == sdl2.SDLK_RIGHT:
+                    velocity.vx = step
+                elif key == sdl2.SDLK_SPACE:
+                    game.plant_bomb(sprite.x, sprite.y, controldata.entity)
+                    shown = 0
+                else:
+                    continue
+                if timestamp is not None and profiler is not None:
+                    profiler.input(timestamp, game.clock.ticks + shown)
 
 
 class AnimationSystem(sdl2.ext.Applicator):
@@ -176,35 +748,54 @@ class AnimationSystem(sdl2.ext.Applicator):
 
     def process(self, world, componentsets):
         for velocity, sprite, animdata in componentsets:
-            if velocity.vx > 0:
-                sprite.texture = animdata.right
-            if velocity.vx < 0:
-                sprite.texture = animdata.left
-            if velocity.vy > 0:
-                sprite.texture = animdata.down
-            if velocity.vy < 0:
-                sprite.texture = animdata.up
+            # Vertical movement wins, a sprite at rest keeps its texture.
+            if velocity.vy:
+                texture = animdata.down if velocity.vy > 0 else animdata.up
+            elif velocity.vx:
+                texture = animdata.right if velocity.vx > 0 else animdata.left
+            else:
+                continue
+            if texture is not sprite.texture:
+                sprite.texture = texture
 
 
 class SpriteAnimationSystem(sdl2.ext.Applicator):
+    """Show the frame of its Animation every animated sprite is at.
+
+    The frame is looked up by the ticks since the animation started, so
+    the clock is read once per tick instead of once per sprite and no
+    sprite keeps a timer of its own.
+    """
+
     def __init__(self):
         super().__init__()
         self.componenttypes = sdl2.ext.Sprite, SpriteAnimationData, DestroyData
 
     def process(self, world, componentsets):
+        clock = self.game.clock
+        now = clock.ticks
+        dt = clock.dt
+        # Sprites mostly share their Animation, its table is only looked
+        # up again when the next sprite plays another one.
+        animation = None
         for sprite, animdata, destroydata in componentsets:
-            if animdata.previous_tick is None:
-                animdata.previous_tick = sdl2.SDL_GetTicks()
-                sprite.frame = animdata.current_frame
-            elif animdata.current_frame == 11:
-                destroydata.is_alive = False
-                animdata.current_frame = 0
+            start = animdata.start
+            if start is None:
+                start = animdata.start = now
+            if animdata.animation is not animation:
+                animation = animdata.animation
+                table = animation.table(dt)
+                length = len(table)
+            elapsed = now - start
+            if elapsed < length:
+                sprite.frame = table[elapsed]
+            elif animation.loop:
+                sprite.frame = table[elapsed % length]
             else:
-                ticks = sdl2.SDL_GetTicks()
-                if (ticks - animdata.previous_tick) > animdata.delta:
-                    animdata.current_frame += 1
-                    animdata.previous_tick = ticks
-                sprite.frame = animdata.current_frame
+                # Played once; it starts over if the entity stays around.
+                animdata.start = None
+                if animation.on_finish is not None:
+                    animation.on_finish(destroydata)
 
 
 class AIController(sdl2.ext.Applicator):
@@ -214,6 +805,7 @@ class AIController(sdl2.ext.Applicator):
             AIData, CollisionData
 
     def process(self, world, componentsets):
+        game = self.game
         for velocity, sprite, aidata, collisiondata in componentsets:
 
             if aidata.choose_direction:
@@ -227,10 +819,107 @@ class AIController(sdl2.ext.Applicator):
                 if velocity.vy < 0:
                     sprite.y = collide_y + step
 
-                vx, vy = random.choice(aidata.available_directions)
+                vx, vy = game.rng.choice(aidata.available_directions)
                 velocity.vx = vx
                 velocity.vy = vy
                 aidata.choose_direction = False
 
             sprite.x += velocity.vx
             sprite.y += velocity.vy
+            game.grid.update(sprite)
+
+
+class FlowAIController(sdl2.ext.Applicator):
+    """Walk enemies from tile to tile along the game's flow field.
+
+    The field leads to the nearest player and is brought up to date
+    once per tick. An enemy only looks at it when it reaches the tile it
+    was heading for, so enemies never run into walls and need no
+    collision checks against them. One heading for a tile a bomb was
+    planted on turns back to the tile it came from.
+    """
+
+    speed = 3
+    """Pixels an enemy moves per tick."""
+
+    def __init__(self):
+        super().__init__()
+        self.componenttypes = Velocity, sdl2.ext.Sprite, AIData
+
+    def process(self, world, componentsets):
+        game = self.game
+        field = game.flowfield
+        if field is None or not game.players:
+            return
+        field.update(*[game.cell(player.sprite.x, player.sprite.y)
+                       for player in game.players])
+
+        speed = self.speed
+        origin = game.origin
+        bomb_cells = game.bomb_cells
+        for velocity, sprite, aidata in componentsets:
+            aidata.choose_direction = False
+            x, y = sprite.x, sprite.y
+            if aidata.waypoint is None:
+                column, row = game.cell(x, y)
+                aidata.waypoint = (origin + column * tile_size,
+                                   origin + row * tile_size)
+            tx, ty = aidata.waypoint
+            if bomb_cells and (x != tx or y != ty) and \
+                    game.cell(tx, ty) in bomb_cells:
+                tx -= ((tx > x) - (tx < x)) * tile_size
+                ty -= ((ty > y) - (ty < y)) * tile_size
+                if game.cell(tx, ty) in bomb_cells:
+                    # Bombs on both sides, the enemy waits.
+                    velocity.vx = velocity.vy = 0
+                    continue
+                aidata.waypoint = tx, ty
+            if x == tx and y == ty:
+                direction = field.direction(game.cell(x, y))
+                if direction is None:
+                    velocity.vx = velocity.vy = 0
+                    continue
+                tx += direction[0] * tile_size
+                ty += direction[1] * tile_size
+                aidata.waypoint = tx, ty
+
+            velocity.vx = max(-speed, min(speed, tx - x))
+            velocity.vy = max(-speed, min(speed, ty - y))
+            sprite.x = x + velocity.vx
+            sprite.y = y + velocity.vy
+            game.grid.update(sprite)
+
+
+class ArrayAIController(sdl2.ext.System):
+    """AIController for the enemies in a ComponentStore."""
+
+    def __init__(self):
+        super().__init__()
+        self.componenttypes = (ComponentStore,)
+
+    def process(self, world, stores):
+        for store in stores:
+            rows = store.rows(ENEMY)
+            turning = rows[store.choose[rows]]
+            if len(turning):
+                position = store.position[turning]
+                velocity = store.velocity[turning]
+                collide = store.collide[turning]
+                for axis in (0, 1):
+                    moving = velocity[:, axis]
+                    position[:, axis] = numpy.where(
+                        moving > 0, collide[:, axis] - step,
+                        numpy.where(moving < 0, collide[:, axis] + step,
+                                    position[:, axis]))
+                store.position[turning] = position
+
+                directions = numpy.array(store.directions)
+                picked = store.rng.integers(len(directions),
+                                            size=len(turning))
+                store.velocity[turning] = directions[picked]
+                store.choose[turning] = False
+                store.refresh("velocity", turning)
+                store.refresh("choose", turning)
+
+            store.position[rows] += store.velocity[rows]
+            store.refresh("position", rows)
@@ -0,0 +1,159 @@
+"""Provide the World the game runs its systems in."""
+
+import sdl2.ext
+
+
+class Query:
+    """Combined components of some types, as World hands them to an
+    applicator.
+
+    The tuples are kept by entity and updated when an entity gets or
+    loses a component of one of the types, so a change only costs work
+    for that entity. The list applicators iterate is copied from them
+    on the next read after a change.
+    """
+
+    __slots__ = ("valsets", "_entries", "_combined")
+
+    def __init__(self, valsets):
+        self.valsets = valsets
+        self._entries = None
+        self._combined = None
+
+    def added(self, entity):
+        """Note that entity got or replaced a component."""
+
+        entries = self._entries
+        if entries is None:
+            return
+        try:
+            entries[entity] = tuple([values[entity]
+                                     for values in self.valsets])
+        except KeyError:
+            return
+        self._combined = None
+
+    def removed(self, entity):
+        """Note that entity lost a component."""
+
+        entries = self._entries
+        if entries is not None and entries.pop(entity, None) is not None:
+            self._combined = None
+
+    def reset(self):
+        """Build the tuples again on the next read."""
+
+        self._entries = None
+        self._combined = None
+
+    def get(self):
+        """Return the list of the combined components."""
+
+        combined = self._combined
+        if combined is None:
+            entries = self._entries
+            if entries is None:
+                # Walking the smallest set keeps the cost of the base
+                # class.
+                valsets = self.valsets
+                smallest = min(valsets, key=len)
+                entries = self._entries = {
+                    entity: tuple([values[entity] for values in valsets])
+                    for entity in smallest
+                    if all(entity in values for values in valsets)}
+            combined = self._combined = list(entries.values())
+        return combined
+
+
+class ComponentDict(dict):
+    """Components of one type by entity that keep the queries over
+    their type up to date."""
+
+    __slots__ = ("queries",)
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    def __setitem__(self, entity, component):
+        super().__setitem__(entity, component)
+        for query in self.queries:
+            query.added(entity)
+
+    def __delitem__(self, entity):
+        super().__delitem__(entity)
+        for query in self.queries:
+            query.removed(entity)
+
+    def pop(self, entity, *default):
+        if entity not in self:
+            return super().pop(entity, *default)
+        component = super().pop(entity)
+        for query in self.queries:
+            query.removed(entity)
+        return component
+
+    def popitem(self):
+        entity, component = super().popitem()
+        for query in self.queries:
+            query.removed(entity)
+        return entity, component
+
+    def setdefault(self, entity, default=None):
+        if entity not in self:
+            self[entity] = default
+        return self[entity]
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        for query in self.queries:
+            query.reset()
+
+    def clear(self):
+        super().clear()
+        for query in self.queries:
+            query.reset()
+
+
+class World(sdl2.ext.World):
+    """sdl2.ext.World that hands out components in a stable order.
+
+    The base class combines components through a set of entities, which
+    are hashed by address, so the order applicators see them in changes
+    from run to run. Here they come in the order the entities got all
+    of the combined component types, which makes a run repeatable.
+
+    The combined components of every set of types are kept as a Query,
+    which entities join and leave as their components are set and
+    removed, so spawning an explosion costs a tuple per query over its
+    types instead of rebuilding them, and while no entity comes or goes
+    an applicator iterates a ready list.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._queries = {}
+
+    def add_componenttype(self, classtype):
+        if classtype in self.components:
+            return
+        self.components[classtype] = ComponentDict()
+        self._componenttypes[classtype.__name__.lower()] = classtype
+
+    def delete_entities(self, entities):
+        # The base class builds new dicts, which would lose the queries.
+        entities = set(entities)
+        for components in self.components.values():
+            for entity in entities:
+                components.pop(entity, None)
+        self.entities -= entities
+
+    def combined_components(self, comptypes):
+        key = tuple(comptypes)
+        query = self._queries.get(key)
+        if query is None:
+            valsets = [self.components[ctype] for ctype in key]
+            query = self._queries[key] = Query(valsets)
+            for values in valsets:
+                values.queries.append(query)
+        return query.get()
@@ -1,30 +1,127 @@
+import argparse
 import sys
+import time
 
 import sdl2
 import sdl2.ext
 
 from boomber import Game
 from boomber import systems
+from boomber.assets import AssetLoader
+from boomber.levels import LevelCache
+from boomber.profiling import Profiler
+from boomber.replay import Recorder
+from boomber.sprites import SpriteFactory
+
+
+def window_size(text):
+    width, _, height = text.partition("x")
+    try:
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected WxH, got %r" % text)
 
 
 def run():
+    started = time.perf_counter()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atlas", action="store_true",
+                        help="draw every sprite from one texture atlas")
+    parser.add_argument("--tick-rate", type=int, default=100,
+                        help="simulation ticks per second")
+    parser.add_argument("--frame-rate", type=int, default=None,
+                        help="frames per second, one per tick by default")
+    parser.add_argument("--interpolate", action="store_true",
+                        help="interpolate moving sprites between ticks")
+    parser.add_argument("--layers", action="store_true",
+                        help="cache the background, walls and blocks")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="with --layers, only redraw changed areas")
+    parser.add_argument("--camera", action="store_true",
+                        help="follow the player and draw only what is seen")
+    parser.add_argument("--size", type=window_size, default=(1335, 900),
+                        metavar="WxH", help="window size in pixels")
+    parser.add_argument("--ai", choices=("random", "flow"), default="random",
+                        help="enemies turn at random or chase the player")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write system timings to PATH on exit, as "
+                             "Chrome trace JSON if it ends with .json, "
+                             "CSV otherwise")
+    parser.add_argument("--overlay", action="store_true",
+                        help="draw the system timings over the game")
+    parser.add_argument("--latency", action="store_true",
+                        help="print percentiles of the time from a key "
+                             "press to the frame showing it on exit")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record the inputs for replaying them with "
+                             "python -m boomber.replay PATH")
+    parser.add_argument("--seed", type=int,
+                        help="seed of the game's random choices")
+    parser.add_argument("--autosave", metavar="PATH",
+                        help="write a snapshot of the game to PATH every "
+                             "second")
+    parser.add_argument("--resume", metavar="PATH",
+                        help="continue from a snapshot written by "
+                             "--autosave")
+    parser.add_argument("--startup", action="store_true",
+                        help="print how long every phase of the startup "
+                             "took")
+    args = parser.parse_args()
+
+    # The images are decoded while SDL and the window come up.
+    assets = AssetLoader(SpriteFactory.textures_for(LevelCache().get(1)))
+
+    mark = time.perf_counter()
     sdl2.ext.init()
 
-    window = sdl2.ext.Window("Boomber", size=(1335, 900))
-
-    game_systems = {}
-    game_systems["timer_system"] = systems.TimerCallbackSystem()
-    game_systems["movement_system"] = systems.MovementSystem()
-    game_systems["collision_system"] = systems.CollisionSystem()
-    game_systems["control_system"] = systems.ControlSystem()
-    game_systems["animation_system"] = systems.AnimationSystem()
-    game_systems["spriteanimation_system"] = systems.SpriteAnimationSystem()
-    game_systems["ai_system"] = systems.AIController()
-    game_systems["destroy_system"] = systems.DestroySystem()
-    game_systems["spriterenderer"] = systems.TextureRenderer(window)
-
-    game = Game(window=window, systems=game_systems)
-    game.start()
+    window = sdl2.ext.Window("Boomber", size=args.size)
+    window_ms = (time.perf_counter() - mark) * 1000
+
+    mark = time.perf_counter()
+    game_systems = systems.create_systems(window, ai=args.ai)
+    systems_ms = (time.perf_counter() - mark) * 1000
+    profiler = None
+    if args.profile or args.overlay or args.latency:
+        profiler = Profiler()
+    recorder = None
+    if args.record:
+        recorder = Recorder(args.record)
+    resume = None
+    if args.resume:
+        with open(args.resume, "rb") as f:
+            resume = f.read()
+
+    game = Game(window=window, systems=game_systems, atlas=args.atlas,
+                tick_rate=args.tick_rate, frame_rate=args.frame_rate,
+                interpolate=args.interpolate, layers=args.layers,
+                dirty_rects=args.dirty_rects, window_size=args.size,
+                camera=args.camera, profiler=profiler,
+                overlay=args.overlay, seed=args.seed, recorder=recorder,
+                assets=assets, autosave=args.autosave)
+    game.start(resume)
+    assets.close()
+    if recorder is not None:
+        recorder.close()
+    if args.profile:
+        profiler.dump(args.profile)
+    if args.latency:
+        latency = profiler.summary().get("latency")
+        if latency is None:
+            print("no key presses")
+        else:
+            print("%d key presses, latency p50 %.1f ms, p90 %.1f ms, "
+                  "p99 %.1f ms, max %.1f ms" % (
+                      latency["count"], latency["p50"], latency["p90"],
+                      latency["p99"], latency["max"]))
+    if args.startup:
+        startup = dict(window=window_ms, renderer=systems_ms,
+                       **game.startup)
+        startup["total"] += (game.created - started) * 1000
+        for name, ms in startup.items():
+            print("%-12s %8.2f ms" % (name, ms))
+        for name, ms in sorted(assets.decoded.items()):
+            print("  %-18s %8.2f ms%s" % (
+                name, ms, " cached" if name in assets.cached else ""))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,17 @@
+from boomber import batch
+from boomber import levels
+
+
+def test_patrol_survives_its_own_bombs():
+    result = batch.play(batch.Job(1, 0, ticks=600, script="patrol"))
+    assert result["outcome"] == "timeout"
+
+
+def test_patrol_outcomes_depend_on_the_seed():
+    crowded = levels.generate(15, 11, 12, seed=0)
+    results = {(result["outcome"], result["ticks"])
+               for result in (batch.play(batch.Job(crowded, seed,
+                                                   ticks=600,
+                                                   script="patrol"))
+                              for seed in range(6))}
+    assert len(results) > 1
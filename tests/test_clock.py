@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from boomber.clock import Clock
+
+
+class FakeTimer:
+    """Timer that moves by the time slept and a microsecond per read,
+    like a real one that is never read twice at the same instant."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1e-6
+        return self.now
+
+    def sleep(self, seconds):
+        # time.sleep(0) yields, which still has to move time forward.
+        self.now += max(seconds, 1e-4)
+
+
+def play(monkeypatch, seconds, **kwargs):
+    """Run the loop of Game.start for seconds of fake time, return the
+    ticks and frames."""
+
+    timer = FakeTimer()
+    monkeypatch.setattr(time, "sleep", timer.sleep)
+    clock = Clock(timer=timer, **kwargs)
+    clock.start()
+    frames = 0
+    while timer.now < seconds:
+        for _ in range(clock.advance()):
+            clock.step()
+        if clock.frame():
+            frames += 1
+        clock.wait()
+    return clock.ticks, frames
+
+
+@pytest.mark.parametrize("frame_rate", [30, 60, 144])
+def test_frame_rate(monkeypatch, frame_rate):
+    ticks, frames = play(monkeypatch, 10.0, tick_rate=100,
+                         frame_rate=frame_rate)
+    assert abs(ticks - 1000) <= 2
+    assert abs(frames - 10 * frame_rate) <= 2
+
+
+def test_one_frame_per_tick(monkeypatch):
+    ticks, frames = play(monkeypatch, 10.0, tick_rate=100)
+    assert abs(ticks - 1000) <= 2
+    assert abs(frames - ticks) <= 2
+
+
+def test_missed_frames_are_dropped():
+    timer = FakeTimer()
+    clock = Clock(timer=timer, frame_rate=50)
+    clock.start()
+    assert clock.frame()
+    timer.now = 1.0
+    assert clock.frame()
+    assert not clock.frame()
+    timer.now += 0.02
+    assert clock.frame()
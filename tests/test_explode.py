@@ -0,0 +1,30 @@
+from boomber import headless
+from boomber import levels
+from boomber.sprites import tile_size
+
+ROW = """\
+xxxxxxxxxxxxx
+xp          x
+xxxxxxxxxxxxx
+"""
+
+
+def test_chained_bombs_blast_with_their_owners_range():
+    game = headless.create_game(levels.parse(ROW), seed=0, quiet=True)
+    first = game.player
+    second = game.add_player()
+    first.playerdata.max_range = 1
+    second.playerdata.max_range = 6
+
+    def at(column):
+        return game.origin + column * tile_size, game.origin + tile_size
+
+    game.plant_bomb(*at(2), player=first)
+    game.plant_bomb(*at(3), player=second)
+    (bomb,) = [b for b in game.bombs
+               if game.owners[b] is first.playerdata]
+    game.detonate(bomb)
+    # The range 1 blast reaches the other bomb, whose range 6 blast
+    # burns up to the wall.
+    burning = sorted(column for column, row in game.flames if row == 1)
+    assert burning == list(range(1, 10))
@@ -0,0 +1,28 @@
+from boomber import headless
+from boomber import levels
+from boomber.sprites import tile_size
+
+CORRIDOR = """\
+xxxxxxxxx
+xp     ex
+xxxxxxxxx
+"""
+
+
+def test_flow_enemy_turns_at_a_bomb():
+    game = headless.create_game(levels.parse(CORRIDOR), ai="flow", seed=0,
+                                quiet=True)
+    (enemy,) = game.enemies
+    start = enemy.sprite.x
+    game.simulate(5)
+    # On its way to the next tile towards the player.
+    assert start - tile_size < enemy.sprite.x < start
+
+    planted = enemy.sprite.x
+    game.plant_bomb(start - tile_size, enemy.sprite.y)
+    (bomb,) = game.bombs
+    for _ in range(150):
+        game.simulate(1)
+        assert bomb in game.bombs
+        assert enemy.sprite.x >= planted
+    assert enemy.sprite.x == start
@@ -0,0 +1,47 @@
+import ctypes
+
+import sdl2
+
+from boomber import headless
+from boomber import levels
+from boomber.sprites import tile_size
+
+
+def pixels(game):
+    w, h = game.renderer.output_size()
+    data = ctypes.create_string_buffer(w * h * 4)
+    assert sdl2.render.SDL_RenderReadPixels(
+        game.renderer.sdlrenderer, None, sdl2.pixels.SDL_PIXELFORMAT_RGBA32,
+        data, w * 4) == 0
+    return data.raw
+
+
+def create_game(level, **kwargs):
+    """Return a game of level with bombs all over it."""
+
+    game = headless.create_game(level, render=True, seed=0, quiet=True,
+                                **kwargs)
+    player = game.player
+    player.destroydata.is_destroyable = False
+    player.playerdata.max_bombs = 1000
+    player.playerdata.max_range = 100
+    for x, y in level.cells(levels.EMPTY):
+        if (x + y) % 4 == 0:
+            game.plant_bomb(game.origin + x * tile_size,
+                            game.origin + y * tile_size)
+    return game
+
+
+def test_layers_draw_what_plain_draws_as_blocks_break():
+    level = levels.generate(19, 11, 0, 3)
+    plain = create_game(level)
+    layered = create_game(level, layers=True, dirty_rects=True)
+    blocks = len(layered.tiles)
+    script = headless.patrol_script(300)
+    for tick in range(300):
+        for game in (plain, layered):
+            game.simulate(1, script)
+            game.render()
+        if tick % 10 == 0:
+            assert pixels(layered) == pixels(plain), tick
+    assert len(layered.tiles) < blocks
@@ -0,0 +1,53 @@
+import gc
+
+import pytest
+
+from boomber import headless
+from boomber import levels
+
+
+def counts(game):
+    return (len(game.world.entities), len(game.tiles), len(game.enemies),
+            len(game.players))
+
+
+@pytest.mark.parametrize("store", [False, True])
+def test_switching_levels_of_different_sizes(store):
+    big = levels.generate(61, 41, 20, seed=3)
+    game = headless.create_game(1, store=store, seed=0, quiet=True)
+    small = counts(game)
+    game.simulate(300)
+
+    assert game.create_map(big)
+    assert counts(game) == counts(
+        headless.create_game(big, store=store, seed=0, quiet=True))
+    game.simulate(300)
+
+    assert game.create_map(1)
+    assert counts(game) == small
+    assert not game.bombs and not game.flames and not game.bomb_cells
+    assert game.flowfield.columns == game.level_data.columns
+    game.simulate(300)
+
+
+def test_reloading_a_level_does_not_add_to_it():
+    game = headless.create_game(1, seed=0, quiet=True)
+    loaded = counts(game)
+    assert game.create_map(1)
+    assert counts(game) == loaded
+
+
+def test_unknown_level_keeps_the_loaded_one():
+    game = headless.create_game(1, seed=0, quiet=True)
+    loaded = counts(game)
+    assert not game.create_map(999)
+    assert counts(game) == loaded
+
+
+def test_reloading_a_level_gives_back_its_textures():
+    game = headless.create_game(1, render=True, seed=0, quiet=True)
+    cache = game.sfactory.tfactory.cache
+    loaded = dict(cache._refs)
+    assert game.create_map(1)
+    gc.collect()
+    assert cache._refs == loaded
@@ -0,0 +1,37 @@
+from boomber import headless
+from boomber import levels
+from boomber import net
+
+
+def test_snapshots_carry_large_levels():
+    game = headless.create_game(levels.generate(9, 7, 0), seed=0,
+                                quiet=True)
+    server = net.Server(game)
+    client = net.Client(server.address)
+    try:
+        # A block and entities past what 16 bits hold, as on a level of
+        # 300×300 tiles.
+        client.level = levels.generate(300, 300, 0)
+        client.blocks = {(299, 299), (1, 1)}
+        server.destroyed = {300 * 300 - 1: 1}
+        states = {
+            5: {70000: (net.ENEMY, 40000, 50000, 2),
+                3: (net.PLAYER, -70000, 19435, 0)},
+            10: {70000: (net.ENEMY, 40003, 49990, 1),
+                 70001: (net.BOMB, 19435, 19435, 0)},
+        }
+        baseline = None
+        for tick, state in states.items():
+            counts, payload = server._delta(state, baseline)
+            server.history[tick] = state
+            data = net._SNAPSHOT.pack(
+                net.SNAPSHOT, tick,
+                net.NO_TICK if baseline is None else baseline, 0,
+                *counts) + payload
+            assert client._snapshot(data) == tick
+            assert client.states[tick] == state
+            baseline = tick
+        assert client.blocks == {(1, 1)}
+    finally:
+        client.close()
+        server.close()
@@ -0,0 +1,32 @@
+import pytest
+
+from boomber.store import overlapping
+
+numpy = pytest.importorskip("numpy")
+
+
+def boxes(rng, count, largest):
+    corners = rng.integers(-300, 700, (count, 2))
+    sizes = rng.integers(0, largest, (count, 2))
+    return numpy.hstack([corners, corners + sizes])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_overlapping_finds_what_a_dense_test_finds(seed):
+    rng = numpy.random.default_rng(seed)
+    areas = boxes(rng, int(rng.integers(1, 80)), 300)
+    others = boxes(rng, int(rng.integers(1, 80)), 90)
+    dense = ((others[None, :, 0] < areas[:, 2, None]) &
+             (others[None, :, 2] > areas[:, 0, None]) &
+             (others[None, :, 1] < areas[:, 3, None]) &
+             (others[None, :, 3] > areas[:, 1, None]))
+    found, rows = overlapping(areas, others)
+    expected = numpy.nonzero(dense)
+    assert found.tolist() == expected[0].tolist()
+    assert rows.tolist() == expected[1].tolist()
+
+
+def test_overlapping_nothing():
+    empty = numpy.zeros((0, 4), numpy.int64)
+    found, rows = overlapping(empty, numpy.array([[0, 0, 1, 1]]))
+    assert not len(found) and not len(rows)